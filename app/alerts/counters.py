@@ -0,0 +1,136 @@
+"""Alert statistics: SQL aggregation and incrementally maintained counters."""
+import logging
+from collections import Counter
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.schemas import Alert, AlertCounter, AlertDailyCount, Preference
+
+
+logger = logging.getLogger(__name__)
+
+
+def alert_stats_queries(dialect: str, user_id: Optional[str] = None):
+    """Build the totals and per-day queries behind /alerts/stats.
+
+    Args:
+        dialect: Dialect name of the session's bind
+        user_id: Restrict to one user's alerts
+
+    Returns:
+        (totals query, per-day query)
+    """
+    if dialect == "postgresql":
+        day = func.date_trunc("day", Alert.created_at)
+    else:
+        day = func.date(Alert.created_at)
+
+    totals = select(
+        func.count(Alert.id),
+        func.count(Alert.id).filter(Alert.viewed_at.is_(None))
+    )
+    by_day = select(day.label("day"), func.count(Alert.id)).group_by(day).order_by(day)
+
+    if user_id:
+        totals = totals.join(Preference, Preference.id == Alert.preference_id).where(
+            Preference.user_id == user_id
+        )
+        by_day = by_day.join(Preference, Preference.id == Alert.preference_id).where(
+            Preference.user_id == user_id
+        )
+    return totals, by_day
+
+
+def format_day(value: Any) -> str:
+    """ISO day for a date_trunc timestamp, a date, or SQLite's date() string."""
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+def record_new_alerts(db: Session, preference_ids: List[str], created_at: datetime) -> None:
+    """Add newly inserted alerts to the per-user counters.
+
+    No-op unless ALERT_STATS_COUNTERS is enabled. The caller commits, in the
+    same transaction as the alerts.
+
+    Args:
+        db: Database session
+        preference_ids: Preference of each new alert (repeated per alert)
+        created_at: created_at of the new alerts
+    """
+    if not settings.alert_stats_counters or not preference_ids:
+        return
+
+    owners = dict(
+        db.query(Preference.id, Preference.user_id).filter(
+            Preference.id.in_(set(preference_ids))
+        ).all()
+    )
+    per_user = Counter(owners[preference_id] for preference_id in preference_ids)
+    day = created_at.date()
+
+    insert = postgresql_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+
+    stmt = insert(AlertCounter).values([
+        {"user_id": user_id, "total_alerts": count, "unseen_alerts": count}
+        for user_id, count in per_user.items()
+    ])
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[AlertCounter.user_id],
+        set_={
+            "total_alerts": AlertCounter.total_alerts + stmt.excluded.total_alerts,
+            "unseen_alerts": AlertCounter.unseen_alerts + stmt.excluded.unseen_alerts
+        }
+    ))
+
+    stmt = insert(AlertDailyCount).values([
+        {"user_id": user_id, "day": day, "alerts": count}
+        for user_id, count in per_user.items()
+    ])
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[AlertDailyCount.user_id, AlertDailyCount.day],
+        set_={"alerts": AlertDailyCount.alerts + stmt.excluded.alerts}
+    ))
+
+
+def alert_viewed_statement(preference_id: str):
+    """UPDATE that takes one alert of a preference off its owner's unseen count."""
+    owner = select(Preference.user_id).where(Preference.id == preference_id).scalar_subquery()
+    return update(AlertCounter).where(
+        AlertCounter.user_id == owner,
+        AlertCounter.unseen_alerts > 0
+    ).values(unseen_alerts=AlertCounter.unseen_alerts - 1)
+
+
+def counter_stats_queries(user_id: str):
+    """Queries reading one user's stats from the counters tables.
+
+    Returns:
+        (totals query, per-day query)
+    """
+    totals = select(AlertCounter.total_alerts, AlertCounter.unseen_alerts).where(
+        AlertCounter.user_id == user_id
+    )
+    by_day = select(AlertDailyCount.day, AlertDailyCount.alerts).where(
+        AlertDailyCount.user_id == user_id
+    ).order_by(AlertDailyCount.day)
+    return totals, by_day
+
+
+def stats_response(totals: Optional[Any], by_day: List[Any]) -> Dict[str, Any]:
+    """Shape totals and per-day rows into the /alerts/stats response."""
+    total_alerts, unseen_alerts = totals if totals else (0, 0)
+    return {
+        "total_alerts": total_alerts or 0,
+        "unseen_alerts": unseen_alerts or 0,
+        "alerts_by_day": {format_day(day): count for day, count in by_day}
+    }
@@ -1,17 +1,21 @@
 """Alert routes for fetching user alerts."""
+import base64
 import logging
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from uuid import UUID
 from datetime import datetime
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
+from sqlalchemy import and_, or_, select
 from pydantic import BaseModel
 
+from app.alerts.counters import (
+    alert_stats_queries, alert_viewed_statement, counter_stats_queries, stats_response
+)
+from app.config import settings
 from app.database import get_db
-from app.models.schemas import Alert, Preference, Listing, User
+from app.models.schemas import Alert, AlertType, Preference, Listing, User
 
 
 logger = logging.getLogger(__name__)
@@ -48,71 +52,123 @@ class AlertResponse(BaseModel):
     id: str
     listing: ListingInfo
     similarity_score: float
+    alert_type: AlertType = AlertType.MATCH
     created_at: datetime
     viewed_at: Optional[datetime] = None
 
 
+def encode_cursor(created_at: datetime, alert_id: str) -> str:
+    """Opaque feed cursor pointing just past an alert."""
+    raw = f"{created_at.isoformat()}|{alert_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Parse a cursor produced by encode_cursor.
+
+    Raises:
+        HTTPException: 400 if the cursor is malformed
+    """
+    try:
+        created_at, alert_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        return datetime.fromisoformat(created_at), alert_id
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
 @router.get("/feed", response_model=List[AlertResponse])
 async def get_alerts_feed(
+    response: Response,
     user_id: Optional[UUID] = Query(None, description="User ID to filter alerts"),
     limit: int = Query(50, ge=1, le=200),
-    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
     only_unseen: bool = Query(False, description="Only return unseen alerts"),
     db: AsyncSession = Depends(get_db)
 ) -> List[AlertResponse]:
-    """Get alerts feed for a user."""
-    # Build query
-    query = select(Alert).join(
-        Preference
+    """Get alerts feed for a user, newest first.
+    
+    Pages are keyed on (created_at, id) rather than OFFSET, so deep pages
+    cost the same as the first. The cursor for the next page is returned in
+    the X-Next-Cursor header (absent on the last page). Only the listing
+    fields shown in the feed are read from the attrs JSON.
+    """
+    attrs = Listing.attrs
+    query = select(
+        Alert.id,
+        Alert.similarity_score,
+        Alert.alert_type,
+        Alert.created_at,
+        Alert.viewed_at,
+        Listing.vin,
+        attrs["make"].as_string().label("make"),
+        attrs["model"].as_string().label("model"),
+        attrs["year"].as_integer().label("year"),
+        attrs["trim"].as_string().label("trim"),
+        attrs["price"].as_float().label("price"),
+        attrs["mileage"].as_integer().label("mileage"),
+        attrs["exterior_color"].as_string().label("exterior_color"),
+        attrs["listing_url"].as_string().label("listing_url"),
+        attrs["photos"].label("photos"),
+        attrs["dealer"].label("dealer")
     ).join(
-        Listing
-    ).options(
-        selectinload(Alert.listing),
-        selectinload(Alert.preference)
+        Listing, Listing.vin == Alert.vin
     ).order_by(
-        Alert.created_at.desc()
+        Alert.created_at.desc(),
+        Alert.id.desc()
     )
     
     # Filter by user if provided
     if user_id:
-        query = query.filter(Preference.user_id == user_id)
+        query = query.join(Preference, Preference.id == Alert.preference_id).filter(
+            Preference.user_id == str(user_id)
+        )
     
     # Filter by unseen if requested
     if only_unseen:
         query = query.filter(Alert.viewed_at.is_(None))
     
-    # Apply pagination
-    query = query.limit(limit).offset(offset)
+    # Resume after the last alert of the previous page
+    if cursor:
+        created_at, alert_id = decode_cursor(cursor)
+        query = query.filter(
+            or_(
+                Alert.created_at < created_at,
+                and_(Alert.created_at == created_at, Alert.id < alert_id)
+            )
+        )
     
-    # Execute query
-    result = await db.execute(query)
-    alerts = result.scalars().all()
+    # Fetch one extra row to know whether another page exists
+    result = await db.execute(query.limit(limit + 1))
+    rows = result.all()
+    
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(rows[-1].created_at, rows[-1].id)
     
     # Transform to response format
     response_alerts = []
-    for alert in alerts:
-        listing_attrs = alert.listing.attrs
-        
+    for row in rows:
         listing_info = ListingInfo(
-            vin=alert.listing.vin,
-            make=listing_attrs.get("make"),
-            model=listing_attrs.get("model"),
-            year=listing_attrs.get("year"),
-            trim=listing_attrs.get("trim"),
-            price=listing_attrs.get("price"),
-            mileage=listing_attrs.get("mileage"),
-            exterior_color=listing_attrs.get("exterior_color"),
-            listing_url=listing_attrs.get("listing_url"),
-            photos=listing_attrs.get("photos", []),
-            dealer=DealerInfo(**listing_attrs.get("dealer", {}))
+            vin=row.vin,
+            make=row.make,
+            model=row.model,
+            year=row.year,
+            trim=row.trim,
+            price=row.price,
+            mileage=row.mileage,
+            exterior_color=row.exterior_color,
+            listing_url=row.listing_url,
+            photos=row.photos or [],
+            dealer=DealerInfo(**(row.dealer or {}))
         )
         
         response_alerts.append(AlertResponse(
-            id=str(alert.id),
+            id=str(row.id),
             listing=listing_info,
-            similarity_score=alert.similarity_score,
-            created_at=alert.created_at,
-            viewed_at=alert.viewed_at
+            similarity_score=row.similarity_score,
+            alert_type=row.alert_type,
+            created_at=row.created_at,
+            viewed_at=row.viewed_at
         ))
     
     return response_alerts
@@ -125,13 +181,16 @@ async def mark_alert_viewed(
 ) -> dict:
     """Mark an alert as viewed."""
     result = await db.execute(
-        select(Alert).where(Alert.id == alert_id)
+        select(Alert).where(Alert.id == str(alert_id))
     )
     alert = result.scalar_one_or_none()
     
     if not alert:
         raise HTTPException(status_code=404, detail="Alert not found")
     
+    if alert.viewed_at is None and settings.alert_stats_counters:
+        await db.execute(alert_viewed_statement(alert.preference_id))
+    
     alert.viewed_at = datetime.utcnow()
     await db.commit()
     
@@ -143,28 +202,19 @@ async def get_alert_stats(
     user_id: Optional[UUID] = Query(None, description="User ID to filter stats"),
     db: AsyncSession = Depends(get_db)
 ) -> dict:
-    """Get alert statistics for a user."""
-    # Base query
-    query = select(Alert).join(Preference)
+    """Get alert statistics for a user.
     
-    if user_id:
-        query = query.filter(Preference.user_id == user_id)
-    
-    result = await db.execute(query)
-    alerts = result.scalars().all()
-    
-    # Calculate stats
-    total_alerts = len(alerts)
-    unseen_alerts = sum(1 for a in alerts if a.viewed_at is None)
+    Counted in the database; with ALERT_STATS_COUNTERS enabled a user's
+    stats are read from the incrementally maintained counters instead.
+    """
+    if user_id and settings.alert_stats_counters:
+        totals_query, by_day_query = counter_stats_queries(str(user_id))
+    else:
+        totals_query, by_day_query = alert_stats_queries(
+            db.get_bind().dialect.name, str(user_id) if user_id else None
+        )
     
-    # Get alerts by day
-    alerts_by_day = {}
-    for alert in alerts:
-        day = alert.created_at.date().isoformat()
-        alerts_by_day[day] = alerts_by_day.get(day, 0) + 1
+    totals = (await db.execute(totals_query)).first()
+    by_day = (await db.execute(by_day_query)).all()
     
-    return {
-        "total_alerts": total_alerts,
-        "unseen_alerts": unseen_alerts,
-        "alerts_by_day": alerts_by_day
-    } 
\ No newline at end of file
+    return stats_response(totals, by_day)
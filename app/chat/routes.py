@@ -18,6 +18,7 @@ from app.database import get_db
 from app.models.schemas import User, Conversation, Message, Preference, CarPreference
 from app.chat.extract import extract_preferences
 from app.chat.system_prompt import SYSTEM_PROMPT
+from app.tasks.celery_app import embed_preference
 
 
 logger = logging.getLogger(__name__)
@@ -216,6 +217,12 @@ async def stream_openai_response(
                 db.add(preference)
                 await db.commit()
                 
+                # Embed in the background so the preference can be matched
+                try:
+                    embed_preference.delay(str(preference.id))
+                except Exception as e:
+                    logger.error(f"Error queueing preference embedding: {e}")
+                
                 # Send confirmation
                 confirmation = "\n\n✅ I've saved your preferences! You'll start receiving alerts for matching vehicles."
                 full_response += confirmation
@@ -19,9 +19,20 @@ class Settings(BaseSettings):
     openai_api_key: str
     openai_model: str = "gpt-4o"
     openai_temperature: float = 0.7
+    embedding_model: str = "text-embedding-ada-002"
+    embedding_storage_dtype: str = "float32"  # float32, float16 or int8 (non-Postgres blob format)
     
     # Database
     database_url: str
+    db_pool_mode: str = "queue"  # queue, or null to open a connection per session (pgbouncer)
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout_seconds: float = 30.0  # wait for a free connection before erroring
+    db_pool_recycle_seconds: int = 1800  # replace connections older than this
+    db_pool_pre_ping: bool = False  # round-trip on every checkout; recycle usually suffices
+    worker_db_pool_size: int = 4  # sync engine used by Celery workers
+    worker_db_max_overflow: int = 4
+    worker_pool_metrics_log_seconds: int = 300  # how often workers log their pool metrics; 0 disables
     
     # Redis
     redis_url: str
@@ -31,6 +42,75 @@ class Settings(BaseSettings):
     autodev_api_key: Optional[str] = None
     vinanalytics_key: Optional[str] = None
     
+    # Ingestion
+    ingest_http2: bool = True
+    ingest_max_connections: int = 20  # per source
+    ingest_max_keepalive_connections: int = 10  # per source
+    ingest_request_timeout_seconds: float = 30.0
+    ingest_source_concurrency: int = 4  # in-flight requests per source
+    ingest_source_timeout_seconds: float = 300.0  # whole-source budget per ingest
+    ingest_page_size: int = 100
+    ingest_max_results_per_source: int = 5000
+    ingest_rate_limits: dict[str, float] = {"marketcheck": 5.0, "autodev": 5.0}  # requests/s per source and API key
+    ingest_rate_burst: int = 10
+    ingest_max_retries: int = 4  # on 429, 5xx and transport errors
+    ingest_backoff_base_seconds: float = 0.5
+    ingest_backoff_max_seconds: float = 30.0
+    ingest_breaker_threshold: int = 5  # failures within the window that open the circuit
+    ingest_breaker_window_seconds: float = 60.0
+    ingest_breaker_cooldown_seconds: float = 30.0  # open time before a probe request is let through
+    ingest_guard_backend: str = "redis"  # redis (shared by all workers) or local
+    ingest_full_fetch_interval_seconds: int = 24 * 3600  # between fetches that ignore the watermark
+    
+    # Scheduled ingest sweep (Celery beat)
+    ingest_sweep_interval_seconds: int = 900  # how often due tiles are queued
+    ingest_tile_radius_miles: int = 50
+    ingest_tiles_per_sweep: int = 100
+    ingest_tile_min_interval_seconds: int = 3600  # re-fetch interval of the highest-churn tiles
+    ingest_tile_max_interval_seconds: int = 6 * 3600  # ... and of tiles that return nothing new
+    ingest_dedupe_window_seconds: int = 3600  # VINs fetched by one tile are skipped by others this long
+    zip_centroids_path: Optional[str] = None  # Census ZCTA gazetteer, for users without coordinates
+    
+    # Listing lifecycle
+    listing_expiry_full_fetches: int = 3  # full-fetch intervals a listing can go unseen before it expires
+    listing_expiry_interval_seconds: int = 3600  # how often the expiry sweep runs (Celery beat)
+    
+    # Alerts
+    alert_stats_counters: bool = False  # serve /alerts/stats from incrementally kept counters
+    
+    # Enrichment
+    enrichment_batch_size: int = 100  # VINs per enrich_and_match_batch task
+    backfill_max_alerts: int = 100  # existing listings matched to a new preference
+    
+    # Similarity scoring
+    matching_quantized: bool = False  # int8 pre-scoring with exact float32 re-ranking
+    
+    # Vector search (pgvector)
+    vector_search_limit: int = 250  # first page of nearest candidates; doubled while pages come back full
+    
+    # Celery task rate limits, per worker (Celery's rate_limit syntax)
+    openai_rate_limit: Optional[str] = "300/m"  # enrichment and preference embedding tasks
+    listing_api_rate_limit: Optional[str] = "30/m"  # ingest tasks (MarketCheck, Auto.dev)
+    notification_rate_limit: Optional[str] = "20/s"  # send_alerts
+    
+    # Preference change feed to matcher workers
+    preference_change_stream: Optional[str] = "preferences:changes"  # Redis stream; unset to poll only
+    preference_poll_seconds: float = 30.0  # watermark poll interval when no change is announced
+    preference_resync_seconds: float = 600.0  # full reconcile interval (catches deletes)
+    
+    # Local ANN index for preference matching (SQLite deployments)
+    ann_index_path: Optional[str] = None  # directory; unset means brute-force matching
+    ann_n_lists: int = 256
+    ann_nprobe: int = 16
+    ann_save_interval_seconds: int = 60  # how often the rebuild_ann_index beat task saves it
+    
+    # Embedding cache
+    embedding_cache_backend: str = "redis"  # redis, disk or none
+    embedding_cache_path: str = ".cache/embeddings.sqlite3"
+    embedding_cache_ttl_seconds: int = 30 * 24 * 3600
+    embedding_cache_max_entries: int = 500_000
+    embedding_cache_stats_log_seconds: int = 300  # how often each process logs its hit rate; 0 disables
+    
     # Supabase
     supabase_url: Optional[str] = None
     supabase_service_role_key: Optional[str] = None
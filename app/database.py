@@ -1,5 +1,7 @@
 """Database configuration and session management."""
-from typing import AsyncGenerator
+from typing import Any, AsyncGenerator, Dict, Optional
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.pool import NullPool
@@ -7,14 +9,146 @@ from sqlalchemy.pool import NullPool
 from app.config import settings
 
 
+# Synchronous drivers for the async drivers DATABASE_URL may name
+SYNC_DRIVERS = {
+    "postgresql+asyncpg": "postgresql+psycopg",
+    "sqlite+aiosqlite": "sqlite",
+}
+
+
+class PoolMetrics:
+    """Connection pool counters for an engine, updated from pool events."""
+
+    def __init__(self, engine: Engine):
+        """Start counting events on an engine's pool.
+
+        Args:
+            engine: Sync engine (``AsyncEngine.sync_engine`` for async engines)
+        """
+        self.engine = engine
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+        event.listen(engine, "invalidate", self._on_invalidate)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Counters plus the pool's current occupancy.
+
+        Returns:
+            Dictionary of pool metrics
+        """
+        pool = self.engine.pool
+        metrics: Dict[str, Any] = {
+            "pool": type(pool).__name__,
+            "connects": self.connects,
+            "checkouts": self.checkouts,
+            "checkins": self.checkins,
+            "invalidations": self.invalidations,
+        }
+        # Queue pools expose their occupancy; NullPool and friends do not
+        for name in ("size", "checkedin", "checkedout", "overflow"):
+            if hasattr(pool, name):
+                metrics[name] = getattr(pool, name)()
+        return metrics
+
+    def _on_connect(self, dbapi_connection, connection_record) -> None:
+        self.connects += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy) -> None:
+        self.checkouts += 1
+
+    def _on_checkin(self, dbapi_connection, connection_record) -> None:
+        self.checkins += 1
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception) -> None:
+        self.invalidations += 1
+
+
+def pool_options(url: str, pool_size: int, max_overflow: int) -> Dict[str, Any]:
+    """Engine keyword arguments for the configured pooling mode.
+
+    Args:
+        url: Database URL
+        pool_size: Connections kept open
+        max_overflow: Extra connections allowed under load
+
+    Returns:
+        Keyword arguments for create_engine / create_async_engine
+    """
+    if settings.db_pool_mode == "null":
+        # Let an external pooler (pgbouncer) own the connections
+        return {"poolclass": NullPool}
+
+    options: Dict[str, Any] = {
+        "pool_pre_ping": settings.db_pool_pre_ping,
+        "pool_recycle": settings.db_pool_recycle_seconds,
+    }
+    # SQLite picks its own pool class, which may not take size arguments
+    if make_url(url).get_backend_name() != "sqlite":
+        options.update(
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=settings.db_pool_timeout_seconds,
+        )
+    return options
+
+
+def sync_database_url(url: Optional[str] = None) -> str:
+    """DATABASE_URL with its async driver swapped for a synchronous one.
+
+    Args:
+        url: Database URL; defaults to settings.database_url
+
+    Returns:
+        URL usable with create_engine
+    """
+    parsed = make_url(url or settings.database_url)
+    driver = SYNC_DRIVERS.get(parsed.drivername)
+    if driver:
+        parsed = parsed.set(drivername=driver)
+    return parsed.render_as_string(hide_password=False)
+
+
+def create_sync_engine(
+    url: Optional[str] = None,
+    pool_size: Optional[int] = None,
+    max_overflow: Optional[int] = None
+) -> Engine:
+    """Create a pooled synchronous engine, e.g. for Celery workers.
+
+    Args:
+        url: Database URL; defaults to settings.database_url
+        pool_size: Connections kept open; defaults to settings.worker_db_pool_size
+        max_overflow: Extra connections; defaults to settings.worker_db_max_overflow
+
+    Returns:
+        Synchronous engine
+    """
+    url = sync_database_url(url)
+    return create_engine(
+        url,
+        **pool_options(
+            url,
+            settings.worker_db_pool_size if pool_size is None else pool_size,
+            settings.worker_db_max_overflow if max_overflow is None else max_overflow,
+        )
+    )
+
+
 # Create async engine
 engine = create_async_engine(
     settings.database_url,
     echo=settings.app_env == "development",
-    pool_pre_ping=True,
-    poolclass=NullPool,  # Use NullPool for async connections
+    **pool_options(settings.database_url, settings.db_pool_size, settings.db_max_overflow),
 )
 
+pool_metrics = PoolMetrics(engine.sync_engine)
+
 # Create async session factory
 async_session_maker = async_sessionmaker(
     engine,
@@ -42,4 +176,9 @@ async def init_db() -> None:
     async with engine.begin() as conn:
         # Import models to register them
         from app.models import schemas  # noqa
-        await conn.run_sync(Base.metadata.create_all) 
\ No newline at end of file
+        
+        # Embedding columns and their HNSW indexes need pgvector on Postgres
+        if conn.dialect.name == "postgresql":
+            await conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+        
+        await conn.run_sync(Base.metadata.create_all)
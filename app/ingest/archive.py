@@ -0,0 +1,144 @@
+"""Compressed archive of raw provider payloads, kept out of Listing.attrs."""
+import json
+import logging
+import zlib
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.models.schemas import ListingRawArchive
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstd is optional; gzip is always available
+    zstandard = None
+
+
+logger = logging.getLogger(__name__)
+
+# Key of the provider payload in transformed listings
+RAW_DATA_FIELD = "raw_data"
+
+# Rows per INSERT statement
+ARCHIVE_CHUNK_SIZE = 500
+
+
+def compress_payload(payload: Dict[str, Any]) -> Tuple[str, bytes]:
+    """Serialize and compress a payload, with zstd when available.
+
+    Returns:
+        (codec name, compressed bytes)
+    """
+    encoded = json.dumps(payload, separators=(",", ":"), default=str).encode("utf-8")
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=3).compress(encoded)
+    return "gzip", zlib.compress(encoded, 6)
+
+
+def decompress_payload(codec: str, blob: bytes) -> Dict[str, Any]:
+    """Inverse of compress_payload."""
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd-compressed payloads")
+        encoded = zstandard.ZstdDecompressor().decompress(blob)
+    elif codec == "gzip":
+        encoded = zlib.decompress(blob)
+    else:
+        raise ValueError(f"Unknown payload codec: {codec}")
+    return json.loads(encoded)
+
+
+def split_raw_data(
+    listing_data: Dict[str, Any]
+) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+    """Separate the provider payload from the normalized listing fields.
+
+    Returns:
+        (normalized fields, raw payload or None)
+    """
+    if RAW_DATA_FIELD not in listing_data:
+        return listing_data, None
+    attrs = {k: v for k, v in listing_data.items() if k != RAW_DATA_FIELD}
+    return attrs, listing_data[RAW_DATA_FIELD]
+
+
+def archive_raw_listings(db: Session, listings: List[Dict[str, Any]]) -> int:
+    """Store the raw payloads of transformed listings, keyed by VIN and fetch time.
+
+    A fetch that is already archived is skipped. The caller commits.
+
+    Args:
+        db: Database session
+        listings: Transformed listings that still carry ``raw_data``
+
+    Returns:
+        Number of payloads written
+    """
+    rows = []
+    for listing_data in listings:
+        raw = listing_data.get(RAW_DATA_FIELD)
+        if not raw or not listing_data.get("vin"):
+            continue
+        codec, payload = compress_payload(raw)
+        rows.append({
+            "vin": listing_data["vin"],
+            "fetched_at": _fetched_at(listing_data),
+            "source": listing_data.get("source", "unknown"),
+            "codec": codec,
+            "payload": payload
+        })
+    if not rows:
+        return 0
+
+    dialect = db.get_bind().dialect.name
+    for start in range(0, len(rows), ARCHIVE_CHUNK_SIZE):
+        chunk = rows[start:start + ARCHIVE_CHUNK_SIZE]
+        if dialect in ("postgresql", "sqlite"):
+            insert = postgresql_insert if dialect == "postgresql" else sqlite_insert
+            db.execute(insert(ListingRawArchive).values(chunk).on_conflict_do_nothing())
+        else:
+            for row in chunk:
+                db.merge(ListingRawArchive(**row))
+    return len(rows)
+
+
+def load_raw_listing(
+    db: Session,
+    vin: str,
+    fetched_at: Optional[datetime] = None
+) -> Optional[Dict[str, Any]]:
+    """Rehydrate a listing's raw provider payload.
+
+    Args:
+        db: Database session
+        vin: Vehicle Identification Number
+        fetched_at: Specific fetch to load; defaults to the latest
+
+    Returns:
+        Provider payload, or None if nothing is archived
+    """
+    query = db.query(ListingRawArchive.codec, ListingRawArchive.payload).filter(
+        ListingRawArchive.vin == vin
+    )
+    if fetched_at is not None:
+        query = query.filter(ListingRawArchive.fetched_at == fetched_at)
+    row = query.order_by(ListingRawArchive.fetched_at.desc()).first()
+    if row is None:
+        return None
+    return decompress_payload(row.codec, row.payload)
+
+
+def _fetched_at(listing_data: Dict[str, Any]) -> datetime:
+    """Fetch time of a transformed listing, falling back to now."""
+    value = listing_data.get("fetched_at")
+    if isinstance(value, datetime):
+        return value
+    if value:
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            logger.warning(f"Unparseable fetched_at {value!r} for {listing_data.get('vin')}")
+    return datetime.utcnow()
@@ -1,10 +1,13 @@
 """Auto.dev API client for fetching car listings."""
 import logging
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, AsyncIterator
 from datetime import datetime
 import httpx
 
 from app.config import settings
+from app.ingest.guard import send_with_retries
+from app.ingest.http import get_source_pool
+from app.ingest.pagination import ListingPage, iter_pages
 
 
 logger = logging.getLogger(__name__)
@@ -13,7 +16,10 @@ logger = logging.getLogger(__name__)
 class AutoDevClient:
     """Client for Auto.dev API."""
     
+    SOURCE = "autodev"
     BASE_URL = "https://auto.dev/api/v2"
+    # The listings search has no changed-since filter; always fetched in full
+    SUPPORTS_CHANGED_SINCE = False
     
     def __init__(self, api_key: Optional[str] = None):
         """Initialize client with API key."""
@@ -51,6 +57,64 @@ class AutoDevClient:
             logger.error("Auto.dev API key not configured")
             return []
         
+        try:
+            page = await self._fetch_page(zip_code, radius, limit, offset, **filters)
+            return page.listings
+            
+        except httpx.HTTPError as e:
+            logger.error(f"Auto.dev API error: {e}")
+            return []
+        except Exception as e:
+            logger.error(f"Unexpected error fetching Auto.dev listings: {e}")
+            return []
+    
+    async def iter_listings(
+        self,
+        zip_code: str,
+        radius: int = 50,
+        page_size: int = 100,
+        max_results: Optional[int] = None,
+        **filters
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream every listing for a ZIP code and radius, page by page.
+        
+        The next page is prefetched while the current one is consumed.
+        Errors propagate to the caller instead of ending the stream silently.
+        
+        Args:
+            zip_code: ZIP code to search around
+            radius: Search radius in miles
+            page_size: Results per request
+            max_results: Stop after this many results
+            **filters: Additional filters (year_min, price_max, etc.)
+        
+        Yields:
+            Listing dictionaries
+        """
+        if not self.api_key:
+            logger.error("Auto.dev API key not configured")
+            return
+        
+        async def fetch_page(limit: int, offset: int) -> ListingPage:
+            return await self._fetch_page(zip_code, radius, limit, offset, **filters)
+        
+        async for page in iter_pages(fetch_page, page_size, max_results):
+            for listing in page.listings:
+                yield listing
+    
+    async def _fetch_page(
+        self,
+        zip_code: str,
+        radius: int,
+        limit: int,
+        offset: int,
+        **filters
+    ) -> ListingPage:
+        """Fetch and transform one page of search results.
+        
+        Raises:
+            httpx.HTTPError: If the request fails
+        """
         # Build request payload
         payload = {
             "location": {
@@ -74,35 +138,31 @@ class AutoDevClient:
         if "make" in filters:
             payload["filters"]["makes"] = [filters["make"]]
         
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
+        pool = get_source_pool(self.SOURCE)
+        
+        async def send() -> httpx.Response:
+            async with pool.semaphore:
+                return await pool.client.post(
                     f"{self.BASE_URL}/listings/search",
                     headers=self.headers,
-                    json=payload,
-                    timeout=30.0
+                    json=payload
                 )
-                response.raise_for_status()
-                
-                data = response.json()
-                listings = data.get("results", [])
-                
-                # Transform to our standard format
-                transformed_listings = []
-                for listing in listings:
-                    transformed = self._transform_listing(listing)
-                    if transformed:
-                        transformed_listings.append(transformed)
-                
-                logger.info(f"Retrieved {len(transformed_listings)} listings from Auto.dev")
-                return transformed_listings
-                
-        except httpx.HTTPError as e:
-            logger.error(f"Auto.dev API error: {e}")
-            return []
-        except Exception as e:
-            logger.error(f"Unexpected error fetching Auto.dev listings: {e}")
-            return []
+        
+        response = await send_with_retries(self.SOURCE, self.api_key, send)
+        response.raise_for_status()
+        
+        data = response.json()
+        listings = data.get("results", [])
+        
+        # Transform to our standard format
+        transformed_listings = []
+        for listing in listings:
+            transformed = self._transform_listing(listing)
+            if transformed:
+                transformed_listings.append(transformed)
+        
+        logger.info(f"Retrieved {len(transformed_listings)} listings from Auto.dev (offset {offset})")
+        return ListingPage(transformed_listings, len(listings), data.get("total"))
     
     def _transform_listing(self, raw_listing: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Transform Auto.dev listing to our standard format.
@@ -175,16 +235,20 @@ class AutoDevClient:
             return None
         
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.BASE_URL}/vin/{vin}",
-                    headers=self.headers,
-                    timeout=30.0
-                )
-                response.raise_for_status()
-                
-                return response.json()
-                
+            pool = get_source_pool(self.SOURCE)
+            
+            async def send() -> httpx.Response:
+                async with pool.semaphore:
+                    return await pool.client.get(
+                        f"{self.BASE_URL}/vin/{vin}",
+                        headers=self.headers
+                    )
+            
+            response = await send_with_retries(self.SOURCE, self.api_key, send)
+            response.raise_for_status()
+            
+            return response.json()
+            
         except httpx.HTTPError as e:
             logger.error(f"Auto.dev VIN lookup error: {e}")
             return None
@@ -206,4 +270,19 @@ async def get_listings(zip_code: str, radius: int = 50, **kwargs) -> List[Dict[s
         List of listing dictionaries
     """
     client = AutoDevClient()
-    return await client.get_listings(zip_code, radius, **kwargs) 
\ No newline at end of file
+    return await client.get_listings(zip_code, radius, **kwargs)
+
+
+def iter_listings(zip_code: str, radius: int = 50, **kwargs) -> AsyncIterator[Dict[str, Any]]:
+    """Stream all listings from Auto.dev API.
+    
+    Args:
+        zip_code: ZIP code to search around
+        radius: Search radius in miles
+        **kwargs: Additional parameters
+        
+    Returns:
+        Async iterator of listing dictionaries
+    """
+    client = AutoDevClient()
+    return client.iter_listings(zip_code, radius, **kwargs)
\ No newline at end of file
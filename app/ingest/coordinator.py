@@ -0,0 +1,272 @@
+"""Concurrent ingestion across all registered listing sources."""
+import asyncio
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from app.config import settings
+from app.ingest.autodev import AutoDevClient
+from app.ingest.http import close_source_pools
+from app.ingest.marketcheck import MarketCheckClient
+from app.ingest.upsert import UpsertResult
+
+
+logger = logging.getLogger(__name__)
+
+# Source name -> client factory; clients expose iter_listings(zip_code, radius, ...)
+# and, with SUPPORTS_CHANGED_SINCE, accept a changed_since cut-off
+_SOURCES: Dict[str, Callable[[], Any]] = {}
+
+# Persists a batch of listings
+SaveListings = Callable[[List[Dict[str, Any]]], UpsertResult]
+
+
+@dataclass
+class SourceCounts:
+    """Listings fetched from one source, by what saving them did."""
+    fetched: int = 0
+    new: int = 0
+    changed: int = 0
+    unchanged: int = 0
+
+    def add(self, batch_size: int, result: UpsertResult) -> None:
+        self.fetched += batch_size
+        self.new += len(result.new_vins)
+        self.changed += len(result.updated_vins)
+        self.unchanged += len(result.unchanged_vins)
+
+
+def register_source(name: str, factory: Callable[[], Any]) -> None:
+    """Register a listing source with the coordinator.
+
+    Args:
+        name: Source name, used as the key in ingest results
+        factory: Callable returning a client for the source
+    """
+    _SOURCES[name] = factory
+
+
+def source_names() -> List[str]:
+    """Names of the registered listing sources."""
+    return list(_SOURCES)
+
+
+register_source("marketcheck", MarketCheckClient)
+register_source("autodev", AutoDevClient)
+
+
+class IngestCoordinator:
+    """Fan out an ingest to every registered source at once.
+
+    All sources are fetched concurrently on one long-lived event loop that
+    runs in a background thread, so the pooled HTTP clients bound to that
+    loop are reused across ingests. Total wall time is that of the slowest
+    source rather than the sum. Each source is paged through (in full, or
+    down to its changed-since cut-off) and saved page by page, so memory
+    stays bounded.
+    """
+
+    def __init__(self):
+        """Initialize coordinator; the loop is started on first use."""
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def run(
+        self,
+        zip_code: str,
+        radius: int,
+        save: SaveListings,
+        since: Optional[Dict[str, Optional[datetime]]] = None
+    ) -> Dict[str, Any]:
+        """Run an ingest and block until every source has finished.
+
+        Args:
+            zip_code: ZIP code to search around
+            radius: Search radius in miles
+            save: Persists a list of listings and returns the upsert result
+            since: Source -> changed-since cut-off; missing or None fetches in full
+
+        Returns:
+            Dictionary with per-source counts, listing counts, complete sources and errors
+        """
+        future = asyncio.run_coroutine_threadsafe(
+            self.ingest(zip_code, radius, save, since),
+            self._get_loop()
+        )
+        return future.result()
+
+    async def ingest(
+        self,
+        zip_code: str,
+        radius: int,
+        save: SaveListings,
+        since: Optional[Dict[str, Optional[datetime]]] = None
+    ) -> Dict[str, Any]:
+        """Fetch from all sources concurrently and save what they return.
+
+        Args:
+            zip_code: ZIP code to search around
+            radius: Search radius in miles
+            save: Persists a list of listings and returns the upsert result
+            since: Source -> changed-since cut-off; missing or None fetches in full
+
+        Returns:
+            Dictionary with per-source counts, listing counts, complete sources and errors.
+            ``complete_sources`` lists the sources that finished without error, and
+            ``full_sources`` those of them that were fetched without a cut-off.
+        """
+        since = since or {}
+        results: Dict[str, Any] = {name: 0 for name in _SOURCES}
+        results.update(new_listings=0, changed_listings=0, unchanged_listings=0)
+        results["complete_sources"] = []
+        results["full_sources"] = []
+        results["errors"] = []
+
+        outcomes = await asyncio.gather(
+            *(
+                self._ingest_source(name, zip_code, radius, save, since.get(name))
+                for name in _SOURCES
+            ),
+            return_exceptions=True
+        )
+
+        for name, outcome in zip(_SOURCES, outcomes):
+            if isinstance(outcome, BaseException):
+                logger.error(f"{name} ingestion error: {outcome}")
+                results["errors"].append(f"{name}: {outcome}")
+                continue
+            counts, incremental, error = outcome
+            results[name] = counts.fetched
+            results["new_listings"] += counts.new
+            results["changed_listings"] += counts.changed
+            results["unchanged_listings"] += counts.unchanged
+            if error:
+                results["errors"].append(f"{name}: {error}")
+                continue
+            results["complete_sources"].append(name)
+            if not incremental:
+                results["full_sources"].append(name)
+
+        return results
+
+    async def _ingest_source(
+        self,
+        name: str,
+        zip_code: str,
+        radius: int,
+        save: SaveListings,
+        changed_since: Optional[datetime]
+    ) -> tuple[SourceCounts, bool, Optional[str]]:
+        """Stream one source within its timeout and save it page by page.
+
+        Returns:
+            Tuple of (listing counts, whether the fetch was incremental, timeout error)
+        """
+        client = _SOURCES[name]()
+        if not getattr(client, "SUPPORTS_CHANGED_SINCE", False):
+            changed_since = None
+        counts = SourceCounts()
+        try:
+            await asyncio.wait_for(
+                self._stream_source(client, zip_code, radius, save, counts, changed_since),
+                timeout=settings.ingest_source_timeout_seconds
+            )
+        except asyncio.TimeoutError:
+            # Keep what was saved before the budget ran out
+            error = f"timed out after {settings.ingest_source_timeout_seconds}s"
+        except Exception as e:
+            # Pages saved before the failure are committed; report them too
+            error = str(e) or type(e).__name__
+        else:
+            return counts, changed_since is not None, None
+        logger.error(f"{name} ingestion error: {error} ({counts.fetched} listings saved)")
+        return counts, changed_since is not None, error
+
+    async def _stream_source(
+        self,
+        client: Any,
+        zip_code: str,
+        radius: int,
+        save: SaveListings,
+        counts: SourceCounts,
+        changed_since: Optional[datetime]
+    ) -> None:
+        """Save a source's listings in page-sized batches as they arrive."""
+        loop = asyncio.get_running_loop()
+        batch_size = settings.ingest_page_size
+        batch: List[Dict[str, Any]] = []
+
+        options: Dict[str, Any] = {}
+        if changed_since is not None:
+            options["changed_since"] = changed_since
+
+        async for listing in client.iter_listings(
+            zip_code,
+            radius,
+            page_size=batch_size,
+            max_results=settings.ingest_max_results_per_source,
+            **options
+        ):
+            batch.append(listing)
+            if len(batch) >= batch_size:
+                # Database writes are blocking; the next page is prefetched meanwhile
+                await self._save_batch(loop, save, batch, counts)
+                batch = []
+
+        if batch:
+            await self._save_batch(loop, save, batch, counts)
+
+    @staticmethod
+    async def _save_batch(
+        loop: asyncio.AbstractEventLoop,
+        save: SaveListings,
+        batch: List[Dict[str, Any]],
+        counts: SourceCounts
+    ) -> None:
+        """Save a batch in the executor and count it.
+
+        Cancelling (on timeout) cannot stop the executor thread, so a save
+        already under way is awaited to completion and counted before the
+        cancellation propagates.
+        """
+        future = loop.run_in_executor(None, save, batch)
+        try:
+            result = await asyncio.shield(future)
+        except asyncio.CancelledError:
+            counts.add(len(batch), await future)
+            raise
+        counts.add(len(batch), result)
+
+    def close(self) -> None:
+        """Close the pooled HTTP clients and stop the loop, if this process started one."""
+        with self._lock:
+            loop, self._loop = self._loop, None
+            if loop is None or self._pid != os.getpid():
+                return
+        try:
+            asyncio.run_coroutine_threadsafe(close_source_pools(), loop).result(timeout=5)
+        except Exception as e:
+            logger.warning(f"Could not close source HTTP clients: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        """Start the background loop, again after a fork if needed."""
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid():
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(
+                    target=loop.run_forever,
+                    name="ingest-loop",
+                    daemon=True
+                )
+                thread.start()
+                self._loop = loop
+                self._pid = os.getpid()
+            return self._loop
+
+
+coordinator = IngestCoordinator()
@@ -0,0 +1,362 @@
+"""Rate limiting, retries and circuit breaking for listing provider requests.
+
+Every provider request goes through ``send_with_retries``, which
+
+* takes a token from a bucket per provider and API key, waiting if empty;
+* is refused with CircuitOpenError while the provider's circuit is open;
+* retries 429, 5xx and transport errors with jittered exponential
+  backoff, honouring ``Retry-After``;
+* counts requests, retries and failures per provider.
+
+State lives in Redis so all ingest workers share one budget and one
+breaker per provider; the local backend (or a Redis outage) keeps it per
+process instead.
+"""
+import asyncio
+import hashlib
+import logging
+import random
+import time
+import weakref
+from collections import defaultdict
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+from app.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+# Breaker states
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# How long a half-open probe may take before another one is let through
+PROBE_TIMEOUT_SECONDS = 30.0
+
+# Key prefix of all guard state in Redis
+KEY_PREFIX = "ingest:guard"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose circuit is open."""
+
+
+def retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    """Parse a Retry-After header (seconds or HTTP date), if present."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def backoff_seconds(attempt: int) -> float:
+    """Full-jitter exponential backoff for a retry attempt (0-based)."""
+    ceiling = min(
+        settings.ingest_backoff_max_seconds,
+        settings.ingest_backoff_base_seconds * (2 ** attempt)
+    )
+    return random.uniform(0, ceiling)
+
+
+class LocalGuardBackend:
+    """Per-process token buckets, breakers and counters."""
+
+    def __init__(self):
+        self._buckets: Dict[str, List[float]] = {}
+        self._breakers: Dict[str, Dict[str, float]] = defaultdict(dict)
+        self._counters: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+
+    async def take_token(self, bucket: str, rate: float, burst: int) -> float:
+        """Reserve a token; returns how long to wait before using it."""
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(bucket, (float(burst), now))
+        tokens = min(float(burst), tokens + (now - updated) * rate) - 1
+        self._buckets[bucket] = [tokens, now]
+        return 0.0 if tokens >= 0 else -tokens / rate
+
+    async def breaker_allow(self, source: str) -> str:
+        """Breaker state a request sees; claims the probe when half-open."""
+        breaker = self._breakers[source]
+        now = time.monotonic()
+        open_until = breaker.get("open_until", 0.0)
+        if not open_until:
+            return CLOSED
+        if now < open_until or now < breaker.get("probe_until", 0.0):
+            return OPEN
+        breaker["probe_until"] = now + PROBE_TIMEOUT_SECONDS
+        return HALF_OPEN
+
+    async def breaker_failure(self, source: str) -> str:
+        """Count a failure; returns the breaker state afterwards."""
+        breaker = self._breakers[source]
+        now = time.monotonic()
+        if breaker.get("open_until"):
+            breaker.update(open_until=now + settings.ingest_breaker_cooldown_seconds, probe_until=0.0)
+            return OPEN
+        if now - breaker.get("window_start", 0.0) > settings.ingest_breaker_window_seconds:
+            breaker.update(failures=0, window_start=now)
+        breaker["failures"] = breaker.get("failures", 0) + 1
+        if breaker["failures"] >= settings.ingest_breaker_threshold:
+            breaker.update(open_until=now + settings.ingest_breaker_cooldown_seconds, failures=0)
+            return OPEN
+        return CLOSED
+
+    async def breaker_reset(self, source: str) -> None:
+        """Close the breaker after a successful probe."""
+        self._breakers.pop(source, None)
+
+    async def count(self, source: str, **increments: float) -> None:
+        for name, value in increments.items():
+            self._counters[source][name] += value
+
+    async def snapshot(self, source: str) -> Dict[str, Any]:
+        breaker = self._breakers.get(source, {})
+        now = time.monotonic()
+        open_until = breaker.get("open_until", 0.0)
+        return {
+            "circuit": CLOSED if not open_until else (OPEN if now < open_until else HALF_OPEN),
+            "recent_failures": int(breaker.get("failures", 0)),
+            **{name: value for name, value in self._counters.get(source, {}).items()}
+        }
+
+
+# Token bucket with reservation: tokens may go negative, and the caller
+# waits until its reserved token has been refilled
+_TAKE_TOKEN = """
+local rate, burst = tonumber(ARGV[1]), tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1e6
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate) - 1
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 60)
+if tokens >= 0 then return '0' end
+return tostring(-tokens / rate)
+"""
+
+_BREAKER_ALLOW = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1e6
+local state = redis.call('HMGET', KEYS[1], 'open_until', 'probe_until')
+local open_until = tonumber(state[1]) or 0
+if open_until == 0 then return 'closed' end
+if now < open_until or now < (tonumber(state[2]) or 0) then return 'open' end
+redis.call('HSET', KEYS[1], 'probe_until', now + tonumber(ARGV[1]))
+return 'half_open'
+"""
+
+_BREAKER_FAILURE = """
+local threshold, window, cooldown = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1e6
+local state = redis.call('HMGET', KEYS[1], 'failures', 'window_start', 'open_until')
+if (tonumber(state[3]) or 0) > 0 then
+    redis.call('HSET', KEYS[1], 'open_until', now + cooldown, 'probe_until', 0)
+    return 'open'
+end
+local failures, window_start = tonumber(state[1]) or 0, tonumber(state[2]) or 0
+if now - window_start > window then failures, window_start = 0, now end
+failures = failures + 1
+if failures >= threshold then
+    redis.call('HSET', KEYS[1], 'open_until', now + cooldown, 'failures', 0)
+    return 'open'
+end
+redis.call('HSET', KEYS[1], 'failures', failures, 'window_start', window_start)
+return 'closed'
+"""
+
+
+class RedisGuardBackend(LocalGuardBackend):
+    """Guard state shared through Redis; falls back to local state on errors."""
+
+    def __init__(self, url: str):
+        super().__init__()
+        import redis.asyncio
+
+        self.client = redis.asyncio.Redis.from_url(url, socket_timeout=1.0, decode_responses=True)
+        self._take_token = self.client.register_script(_TAKE_TOKEN)
+        self._allow = self.client.register_script(_BREAKER_ALLOW)
+        self._failure = self.client.register_script(_BREAKER_FAILURE)
+
+    async def take_token(self, bucket: str, rate: float, burst: int) -> float:
+        try:
+            return float(await self._take_token(keys=[f"{KEY_PREFIX}:bucket:{bucket}"], args=[rate, burst]))
+        except Exception as e:
+            logger.warning(f"Redis rate limiter unavailable, limiting locally: {e}")
+            return await super().take_token(bucket, rate, burst)
+
+    async def breaker_allow(self, source: str) -> str:
+        try:
+            return await self._allow(keys=[self._breaker_key(source)], args=[PROBE_TIMEOUT_SECONDS])
+        except Exception as e:
+            logger.warning(f"Redis circuit breaker unavailable, tracking locally: {e}")
+            return await super().breaker_allow(source)
+
+    async def breaker_failure(self, source: str) -> str:
+        try:
+            return await self._failure(keys=[self._breaker_key(source)], args=[
+                settings.ingest_breaker_threshold,
+                settings.ingest_breaker_window_seconds,
+                settings.ingest_breaker_cooldown_seconds
+            ])
+        except Exception as e:
+            logger.warning(f"Redis circuit breaker unavailable, tracking locally: {e}")
+            return await super().breaker_failure(source)
+
+    async def breaker_reset(self, source: str) -> None:
+        try:
+            await self.client.delete(self._breaker_key(source))
+        except Exception as e:
+            logger.warning(f"Redis circuit breaker unavailable, tracking locally: {e}")
+            await super().breaker_reset(source)
+
+    async def count(self, source: str, **increments: float) -> None:
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for name, value in increments.items():
+                pipe.hincrbyfloat(f"{KEY_PREFIX}:metrics:{source}", name, value)
+            await pipe.execute()
+        except Exception:
+            await super().count(source, **increments)
+
+    async def snapshot(self, source: str) -> Dict[str, Any]:
+        counters, breaker = await asyncio.gather(
+            self.client.hgetall(f"{KEY_PREFIX}:metrics:{source}"),
+            self.client.hgetall(self._breaker_key(source))
+        )
+        now = time.time()
+        open_until = float(breaker.get("open_until") or 0)
+        return {
+            "circuit": CLOSED if not open_until else (OPEN if now < open_until else HALF_OPEN),
+            "recent_failures": int(float(breaker.get("failures") or 0)),
+            **{name: float(value) for name, value in counters.items()}
+        }
+
+    @staticmethod
+    def _breaker_key(source: str) -> str:
+        return f"{KEY_PREFIX}:breaker:{source}"
+
+
+# Backends hold clients bound to the event loop they were created on
+_backends: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, LocalGuardBackend]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_guard_backend() -> LocalGuardBackend:
+    """Get the configured guard backend for the running event loop."""
+    loop = asyncio.get_running_loop()
+    backend = _backends.get(loop)
+    if backend is None:
+        if settings.ingest_guard_backend == "redis":
+            backend = RedisGuardBackend(settings.redis_url)
+        else:
+            backend = LocalGuardBackend()
+        _backends[loop] = backend
+    return backend
+
+
+def _bucket_name(source: str, api_key: Optional[str]) -> str:
+    """Bucket per provider and API key; the key itself never leaves the process."""
+    digest = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:12]
+    return f"{source}:{digest}"
+
+
+async def send_with_retries(
+    source: str,
+    api_key: Optional[str],
+    send: Callable[[], Awaitable[httpx.Response]]
+) -> httpx.Response:
+    """Send a provider request under its rate limit, breaker and retry policy.
+
+    Args:
+        source: Provider name, e.g. "marketcheck"
+        api_key: API key the request is made with
+        send: Issues the request once and returns the response
+
+    Returns:
+        Final response; still a 429/5xx if every retry failed, for the
+        caller's raise_for_status
+
+    Raises:
+        CircuitOpenError: If the provider's circuit is open
+        httpx.TransportError: If the last attempt failed to connect or read
+    """
+    backend = get_guard_backend()
+    rate = settings.ingest_rate_limits.get(source)
+    bucket = _bucket_name(source, api_key)
+
+    attempt = 0
+    while True:
+        state = await backend.breaker_allow(source)
+        if state == OPEN:
+            await backend.count(source, rejected=1)
+            raise CircuitOpenError(f"{source} circuit is open")
+
+        if rate:
+            wait = await backend.take_token(bucket, rate, settings.ingest_rate_burst)
+            if wait > 0:
+                await backend.count(source, rate_limited_seconds=wait)
+                await asyncio.sleep(wait)
+
+        await backend.count(source, requests=1)
+        try:
+            response = await send()
+        except httpx.TransportError as e:
+            response, error = None, e
+        else:
+            error = None
+
+        # Any answer below 500 shows the provider is up, a 429 included: it
+        # asks us to slow down, and its retry must not find the probe taken
+        if state == HALF_OPEN and response is not None and response.status_code < 500:
+            await backend.breaker_reset(source)
+            logger.info(f"{source} circuit closed")
+
+        if response is not None and response.status_code != 429 and response.status_code < 500:
+            return response
+
+        # Throttling is the provider asking us to slow down, not failing
+        if response is not None and response.status_code == 429:
+            await backend.count(source, throttled=1)
+        else:
+            if response is not None:
+                await backend.count(source, server_errors=1)
+            else:
+                await backend.count(source, transport_errors=1)
+            if await backend.breaker_failure(source) == OPEN:
+                logger.error(f"{source} circuit opened")
+
+        if attempt >= settings.ingest_max_retries:
+            if error is not None:
+                raise error
+            return response
+
+        delay = retry_after_seconds(response) if response is not None else None
+        if delay is None:
+            delay = backoff_seconds(attempt)
+        delay = min(delay, settings.ingest_backoff_max_seconds)
+        logger.warning(
+            f"{source} request failed ({error or response.status_code}); "
+            f"retry {attempt + 1}/{settings.ingest_max_retries} in {delay:.1f}s"
+        )
+        await backend.count(source, retries=1)
+        await asyncio.sleep(delay)
+        attempt += 1
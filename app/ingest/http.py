@@ -0,0 +1,66 @@
+"""Long-lived pooled HTTP clients shared by the listing sources."""
+import asyncio
+import logging
+import weakref
+from dataclasses import dataclass
+from typing import Dict
+
+import httpx
+
+from app.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SourcePool:
+    """Pooled HTTP client and concurrency limit for one source."""
+    client: httpx.AsyncClient
+    semaphore: asyncio.Semaphore
+
+
+# Pools are bound to the event loop they were created on
+_pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, SourcePool]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_source_pool(source: str) -> SourcePool:
+    """Get the pooled client for a source on the running event loop.
+
+    The client keeps connections alive (and negotiates HTTP/2 when enabled)
+    across requests and ingests; the semaphore caps in-flight requests to
+    the source.
+
+    Args:
+        source: Source name, e.g. "marketcheck"
+
+    Returns:
+        Source pool for the running loop
+    """
+    loop = asyncio.get_running_loop()
+    pools = _pools.setdefault(loop, {})
+
+    pool = pools.get(source)
+    if pool is None or pool.client.is_closed:
+        client = httpx.AsyncClient(
+            http2=settings.ingest_http2,
+            limits=httpx.Limits(
+                max_connections=settings.ingest_max_connections,
+                max_keepalive_connections=settings.ingest_max_keepalive_connections
+            ),
+            timeout=settings.ingest_request_timeout_seconds
+        )
+        pool = SourcePool(client, asyncio.Semaphore(settings.ingest_source_concurrency))
+        pools[source] = pool
+        logger.info(f"Opened pooled HTTP client for {source}")
+
+    return pool
+
+
+async def close_source_pools() -> None:
+    """Close every pooled client on the running event loop."""
+    pools = _pools.pop(asyncio.get_running_loop(), {})
+    for pool in pools.values():
+        await pool.client.aclose()
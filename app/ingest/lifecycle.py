@@ -0,0 +1,155 @@
+"""Listing lifecycle: last-seen tracking, expiry and price history.
+
+Every fetch that returns a listing moves its ``last_seen_at``. A listing
+that its source has stopped returning for LISTING_EXPIRY_FULL_FETCHES
+full-fetch intervals gets ``expired_at`` set and drops out of matching
+(and of the partial ANN index on Postgres); if it shows up again it is
+revived. Price and mileage changes are appended to
+``listing_price_history`` so price movements can be read without the
+archived payloads.
+"""
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, or_, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.schemas import IngestWatermark, Listing, ListingPriceHistory
+
+# Unchanged listings have last_seen_at rewritten at most this often
+LAST_SEEN_RESOLUTION = timedelta(hours=1)
+
+# VINs per UPDATE/INSERT statement
+LIFECYCLE_CHUNK_SIZE = 500
+
+
+def touch_listings(db: Session, vins: List[str], now: datetime) -> None:
+    """Mark listings fetched unchanged as seen, reviving expired ones. The caller commits.
+
+    Args:
+        db: Database session
+        vins: VINs returned by a fetch whose content did not change
+        now: Time of the fetch
+    """
+    stale_before = now - LAST_SEEN_RESOLUTION
+    for start in range(0, len(vins), LIFECYCLE_CHUNK_SIZE):
+        db.execute(
+            update(Listing)
+            .where(
+                Listing.vin.in_(vins[start:start + LIFECYCLE_CHUNK_SIZE]),
+                or_(Listing.last_seen_at < stale_before, Listing.expired_at.isnot(None))
+            )
+            .values(last_seen_at=now, expired_at=None)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def record_price_changes(
+    db: Session,
+    previous: Dict[str, Tuple[Optional[float], Optional[int]]],
+    rows: List[Dict[str, Any]],
+    now: datetime
+) -> int:
+    """Append the price/mileage of new listings and of listings where either changed.
+
+    Args:
+        db: Database session
+        previous: VIN -> (price, mileage) stored before this upsert
+        rows: Listing rows being written, with typed price and mileage
+        now: Time of the fetch
+
+    Returns:
+        Number of history points written
+    """
+    points = []
+    for row in rows:
+        current = (row.get("price"), row.get("mileage"))
+        if current == (None, None) or previous.get(row["vin"]) == current:
+            continue
+        points.append({"vin": row["vin"], "observed_at": now, "price": current[0], "mileage": current[1]})
+    if not points:
+        return 0
+
+    dialect = db.get_bind().dialect.name
+    for start in range(0, len(points), LIFECYCLE_CHUNK_SIZE):
+        chunk = points[start:start + LIFECYCLE_CHUNK_SIZE]
+        if dialect in ("postgresql", "sqlite"):
+            insert = postgresql_insert if dialect == "postgresql" else sqlite_insert
+            db.execute(insert(ListingPriceHistory).values(chunk).on_conflict_do_nothing())
+        else:
+            for point in chunk:
+                db.merge(ListingPriceHistory(**point))
+    return len(points)
+
+
+def price_history(db: Session, vin: str) -> List[Tuple[datetime, Optional[float], Optional[int]]]:
+    """Price/mileage points of a listing, oldest first.
+
+    Returns:
+        List of (observed_at, price, mileage)
+    """
+    rows = db.query(
+        ListingPriceHistory.observed_at, ListingPriceHistory.price, ListingPriceHistory.mileage
+    ).filter(ListingPriceHistory.vin == vin).order_by(ListingPriceHistory.observed_at)
+    return [tuple(row) for row in rows]
+
+
+def expiry_cutoffs(db: Session, now: Optional[datetime] = None) -> Dict[str, datetime]:
+    """Per source, the last-seen time before which a listing is expired.
+
+    A listing must have gone unseen for LISTING_EXPIRY_FULL_FETCHES
+    full-fetch intervals, and since the source's most recent full fetch:
+    if the source has not been fetched in full for a while (provider
+    outage, ingest stopped) its listings are not expired on that account.
+    Sources never fetched in full have no cut-off.
+
+    Args:
+        db: Database session
+        now: Current time
+
+    Returns:
+        Source name -> cut-off
+    """
+    now = now or datetime.utcnow()
+    unseen_for = timedelta(
+        seconds=settings.listing_expiry_full_fetches * settings.ingest_full_fetch_interval_seconds
+    )
+    last_full_fetches = db.query(
+        IngestWatermark.source, func.max(IngestWatermark.full_fetch_at)
+    ).group_by(IngestWatermark.source)
+    return {
+        source: min(now - unseen_for, full_fetch_at)
+        for source, full_fetch_at in last_full_fetches
+        if full_fetch_at is not None
+    }
+
+
+def expire_stale_listings(db: Session, now: Optional[datetime] = None) -> Dict[str, int]:
+    """Set ``expired_at`` on active listings their source stopped returning. The caller commits.
+
+    Args:
+        db: Database session
+        now: Current time
+
+    Returns:
+        Source name -> listings expired
+    """
+    now = now or datetime.utcnow()
+    expired = {}
+    for source, cutoff in expiry_cutoffs(db, now).items():
+        result = db.execute(
+            update(Listing)
+            .where(
+                Listing.source == source,
+                Listing.expired_at.is_(None),
+                Listing.last_seen_at < cutoff
+            )
+            .values(expired_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        expired[source] = result.rowcount
+    return expired
+
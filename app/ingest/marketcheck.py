@@ -1,10 +1,14 @@
 """Marketcheck API client for fetching car listings."""
 import logging
-from typing import Optional, List, Dict, Any
-from datetime import datetime
+from contextlib import aclosing
+from typing import Optional, List, Dict, Any, AsyncIterator
+from datetime import datetime, timezone
 import httpx
 
 from app.config import settings
+from app.ingest.guard import send_with_retries
+from app.ingest.http import get_source_pool
+from app.ingest.pagination import ListingPage, iter_pages
 
 
 logger = logging.getLogger(__name__)
@@ -13,7 +17,9 @@ logger = logging.getLogger(__name__)
 class MarketCheckClient:
     """Client for Marketcheck API."""
     
+    SOURCE = "marketcheck"
     BASE_URL = "https://marketcheck-prod.apigee.net/v2"
+    SUPPORTS_CHANGED_SINCE = True
     
     def __init__(self, api_key: Optional[str] = None):
         """Initialize client with API key."""
@@ -50,6 +56,80 @@ class MarketCheckClient:
             logger.error("Marketcheck API key not configured")
             return []
         
+        try:
+            page = await self._fetch_page(zip_code, radius, limit, offset, **filters)
+            return page.listings
+            
+        except httpx.HTTPError as e:
+            logger.error(f"Marketcheck API error: {e}")
+            return []
+        except Exception as e:
+            logger.error(f"Unexpected error fetching Marketcheck listings: {e}")
+            return []
+    
+    async def iter_listings(
+        self,
+        zip_code: str,
+        radius: int = 50,
+        page_size: int = 100,
+        max_results: Optional[int] = None,
+        changed_since: Optional[datetime] = None,
+        **filters
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream every listing for a ZIP code and radius, page by page.
+        
+        The next page is prefetched while the current one is consumed.
+        Errors propagate to the caller instead of ending the stream silently.
+        
+        With ``changed_since``, results are requested most recently seen
+        first and the stream ends at the first listing Marketcheck last saw
+        before the cut-off, so an incremental fetch only pages through what
+        changed.
+        
+        Args:
+            zip_code: ZIP code to search around
+            radius: Search radius in miles
+            page_size: Results per request
+            max_results: Stop after this many results
+            changed_since: Only listings seen since this UTC time
+            **filters: Additional filters (year_min, price_max, etc.)
+        
+        Yields:
+            Listing dictionaries
+        """
+        if not self.api_key:
+            logger.error("Marketcheck API key not configured")
+            return
+        
+        cutoff = None
+        if changed_since is not None:
+            cutoff = changed_since.replace(tzinfo=timezone.utc).timestamp()
+            filters["sort_by_last_seen"] = True
+        
+        async def fetch_page(limit: int, offset: int) -> ListingPage:
+            return await self._fetch_page(zip_code, radius, limit, offset, **filters)
+        
+        async with aclosing(iter_pages(fetch_page, page_size, max_results)) as pages:
+            async for page in pages:
+                for listing in page.listings:
+                    if cutoff is not None and _last_seen(listing) < cutoff:
+                        logger.info(f"Reached Marketcheck listings unchanged since {changed_since}")
+                        return
+                    yield listing
+    
+    async def _fetch_page(
+        self,
+        zip_code: str,
+        radius: int,
+        limit: int,
+        offset: int,
+        **filters
+    ) -> ListingPage:
+        """Fetch and transform one page of search results.
+        
+        Raises:
+            httpx.HTTPError: If the request fails
+        """
         params = {
             "api_key": self.api_key,
             "zip": zip_code,
@@ -66,36 +146,35 @@ class MarketCheckClient:
             params["price"] = f"~{filters['price_max']}"
         if "body_type" in filters:
             params["body_type"] = filters["body_type"]
+        if filters.get("sort_by_last_seen"):
+            params["sort_by"] = "last_seen"
+            params["sort_order"] = "desc"
         
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
+        pool = get_source_pool(self.SOURCE)
+        
+        async def send() -> httpx.Response:
+            async with pool.semaphore:
+                return await pool.client.get(
                     f"{self.BASE_URL}/search/car/active",
                     headers=self.headers,
-                    params=params,
-                    timeout=30.0
+                    params=params
                 )
-                response.raise_for_status()
-                
-                data = response.json()
-                listings = data.get("listings", [])
-                
-                # Transform to our standard format
-                transformed_listings = []
-                for listing in listings:
-                    transformed = self._transform_listing(listing)
-                    if transformed:
-                        transformed_listings.append(transformed)
-                
-                logger.info(f"Retrieved {len(transformed_listings)} listings from Marketcheck")
-                return transformed_listings
-                
-        except httpx.HTTPError as e:
-            logger.error(f"Marketcheck API error: {e}")
-            return []
-        except Exception as e:
-            logger.error(f"Unexpected error fetching Marketcheck listings: {e}")
-            return []
+        
+        response = await send_with_retries(self.SOURCE, self.api_key, send)
+        response.raise_for_status()
+        
+        data = response.json()
+        listings = data.get("listings", [])
+        
+        # Transform to our standard format
+        transformed_listings = []
+        for listing in listings:
+            transformed = self._transform_listing(listing)
+            if transformed:
+                transformed_listings.append(transformed)
+        
+        logger.info(f"Retrieved {len(transformed_listings)} listings from Marketcheck (offset {offset})")
+        return ListingPage(transformed_listings, len(listings), data.get("num_found"))
     
     def _transform_listing(self, raw_listing: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Transform Marketcheck listing to our standard format.
@@ -150,6 +229,14 @@ class MarketCheckClient:
             return None
 
 
+def _last_seen(listing: Dict[str, Any]) -> float:
+    """Unix time Marketcheck last saw a transformed listing; +inf if it does not say."""
+    try:
+        return float(listing["raw_data"]["last_seen_at"])
+    except (KeyError, TypeError, ValueError):
+        return float("inf")
+
+
 # Module-level function for easy import
 async def get_listings(zip_code: str, radius: int = 50, **kwargs) -> List[Dict[str, Any]]:
     """Get listings from Marketcheck API.
@@ -163,4 +250,19 @@ async def get_listings(zip_code: str, radius: int = 50, **kwargs) -> List[Dict[s
         List of listing dictionaries
     """
     client = MarketCheckClient()
-    return await client.get_listings(zip_code, radius, **kwargs) 
\ No newline at end of file
+    return await client.get_listings(zip_code, radius, **kwargs)
+
+
+def iter_listings(zip_code: str, radius: int = 50, **kwargs) -> AsyncIterator[Dict[str, Any]]:
+    """Stream all listings from Marketcheck API.
+    
+    Args:
+        zip_code: ZIP code to search around
+        radius: Search radius in miles
+        **kwargs: Additional parameters
+        
+    Returns:
+        Async iterator of listing dictionaries
+    """
+    client = MarketCheckClient()
+    return client.iter_listings(zip_code, radius, **kwargs)
\ No newline at end of file
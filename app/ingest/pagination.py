@@ -0,0 +1,53 @@
+"""Prefetching pagination shared by the listing sources."""
+import asyncio
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+
+@dataclass
+class ListingPage:
+    """One page of search results from a source."""
+    listings: List[Dict[str, Any]]  # transformed listings
+    raw_count: int  # results returned before transformation
+    total: Optional[int] = None  # total matches, if the source reports it
+
+
+async def iter_pages(
+    fetch_page: Callable[[int, int], Awaitable[ListingPage]],
+    page_size: int,
+    max_results: Optional[int] = None
+) -> AsyncIterator[ListingPage]:
+    """Page through a result set, fetching the next page ahead of time.
+
+    While the caller works on page N, page N+1 is already being requested,
+    so at most two pages are held in memory at once.
+
+    Args:
+        fetch_page: Coroutine function taking (limit, offset)
+        page_size: Results per page
+        max_results: Stop after this many results
+
+    Yields:
+        Pages in order
+    """
+    offset = 0
+    pending: Optional[asyncio.Future] = asyncio.ensure_future(fetch_page(page_size, offset))
+
+    try:
+        while pending is not None:
+            page = await pending
+            pending = None
+            offset += page_size
+
+            has_more = (
+                page.raw_count >= page_size
+                and (page.total is None or offset < page.total)
+                and (max_results is None or offset < max_results)
+            )
+            if has_more:
+                pending = asyncio.ensure_future(fetch_page(page_size, offset))
+
+            yield page
+    finally:
+        if pending is not None:
+            pending.cancel()
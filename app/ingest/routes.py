@@ -0,0 +1,27 @@
+"""Ingest routes exposing provider health."""
+import logging
+from typing import Any, Dict
+
+from fastapi import APIRouter, HTTPException
+
+from app.ingest.coordinator import source_names
+from app.ingest.guard import get_guard_backend
+
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/ingest", tags=["ingest"])
+
+
+@router.get("/metrics")
+async def provider_metrics() -> Dict[str, Any]:
+    """Circuit state and request counters of every listing provider.
+
+    Counters are shared by all ingest workers when the guard state lives in
+    Redis; with the local backend they only cover this process.
+    """
+    backend = get_guard_backend()
+    try:
+        return {source: await backend.snapshot(source) for source in source_names()}
+    except Exception as e:
+        logger.error(f"Error reading provider metrics: {e}")
+        raise HTTPException(status_code=503, detail="Provider metrics unavailable")
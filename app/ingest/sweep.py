@@ -0,0 +1,302 @@
+"""Scheduled ingest sweep over geographic tiles covering the active users.
+
+Users are located by the ``zip_code`` in their settings (with ``latitude``
+and ``longitude`` there, or from the ZIP centroid file). A tile is a radius
+search around one of those ZIPs; ``plan_tiles`` picks as few of them as it
+can so that every user is inside at least one. Tiles are re-fetched on an
+interval that shrinks with how much of what they return is new, and VINs
+already saved by another tile in the same window are not saved again.
+"""
+import csv
+import heapq
+import json
+import logging
+import math
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.schemas import Preference, User
+
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_MILES = 3958.8
+
+# Weight of the latest sweep in a tile's churn average
+CHURN_SMOOTHING = 0.5
+
+# Redis keys
+TILE_STATE_KEY = "ingest:sweep:tiles"
+SEEN_VINS_PREFIX = "ingest:sweep:seen"
+
+
+@dataclass
+class Tile:
+    """Radius search around one ZIP, covering the users of nearby ZIPs."""
+    zip_code: str
+    latitude: float
+    longitude: float
+    zip_codes: List[str] = field(default_factory=list)
+    users: int = 0
+
+
+def haversine_miles(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * math.asin(math.sqrt(a))
+
+
+@lru_cache()
+def load_zip_centroids(path: Optional[str]) -> Dict[str, Tuple[float, float]]:
+    """Read ZIP centroids from a Census ZCTA gazetteer file (GEOID, INTPTLAT, INTPTLONG).
+
+    Returns:
+        ZIP -> (latitude, longitude); empty without a file
+    """
+    if not path:
+        return {}
+    centroids = {}
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f, delimiter="\t"):
+            row = {key.strip(): value for key, value in row.items()}
+            centroids[row["GEOID"]] = (float(row["INTPTLAT"]), float(row["INTPTLONG"]))
+    return centroids
+
+
+def user_locations(db: Session) -> Dict[str, Tuple[float, float, int]]:
+    """Locations of users with an active preference, grouped by ZIP.
+
+    Args:
+        db: Database session
+
+    Returns:
+        ZIP -> (latitude, longitude, number of users)
+    """
+    centroids = load_zip_centroids(settings.zip_centroids_path)
+    users = db.query(User.settings).filter(
+        User.id.in_(db.query(Preference.user_id).filter(Preference.is_active.is_(True)))
+    )
+
+    locations: Dict[str, List[Any]] = {}
+    unlocated = 0
+    for (user_settings,) in users:
+        user_settings = user_settings or {}
+        zip_code = user_settings.get("zip_code")
+        if not zip_code:
+            unlocated += 1
+            continue
+        point = centroids.get(zip_code)
+        if user_settings.get("latitude") is not None and user_settings.get("longitude") is not None:
+            point = (float(user_settings["latitude"]), float(user_settings["longitude"]))
+        if point is None:
+            unlocated += 1
+            continue
+        entry = locations.setdefault(zip_code, [point[0], point[1], 0])
+        entry[2] += 1
+
+    if unlocated:
+        logger.info(f"{unlocated} active users have no usable location and are not swept")
+    return {zip_code: tuple(entry) for zip_code, entry in locations.items()}
+
+
+def plan_tiles(locations: Dict[str, Tuple[float, float, int]], radius: float) -> List[Tile]:
+    """Choose tile centres so every location is within ``radius`` of one.
+
+    Greedy weighted set cover: repeatedly take the ZIP whose radius covers
+    the most not-yet-covered users. This keeps the number of searches, and
+    so the overlap between them, close to the minimum.
+
+    Args:
+        locations: ZIP -> (latitude, longitude, users)
+        radius: Search radius of a tile in miles
+
+    Returns:
+        Tiles, largest first
+    """
+    zips = list(locations)
+    if not zips:
+        return []
+
+    # Grid of roughly radius-sized cells, so only neighbouring cells are compared
+    cell = radius / 69.0
+    grid: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+    for i, zip_code in enumerate(zips):
+        lat, lon, _ = locations[zip_code]
+        grid[(int(lat // cell), int(lon // cell))].append(i)
+
+    coverage: List[List[int]] = []
+    for zip_code in zips:
+        lat, lon, _ = locations[zip_code]
+        row, col = int(lat // cell), int(lon // cell)
+        # Longitude degrees shrink towards the poles
+        span = int(math.ceil(1 / max(math.cos(math.radians(lat)), 0.01)))
+        covered = [
+            j
+            for d_row in (-1, 0, 1)
+            for d_col in range(-span, span + 1)
+            for j in grid.get((row + d_row, col + d_col), ())
+            if haversine_miles(lat, lon, *locations[zips[j]][:2]) <= radius
+        ]
+        coverage.append(covered)
+
+    weights = [locations[zip_code][2] for zip_code in zips]
+    uncovered = [True] * len(zips)
+    heap = [(-sum(weights[j] for j in covered), i) for i, covered in enumerate(coverage)]
+    heapq.heapify(heap)
+
+    tiles = []
+    while heap:
+        gain, i = heapq.heappop(heap)
+        actual = sum(weights[j] for j in coverage[i] if uncovered[j])
+        if actual == 0:
+            continue
+        if heap and actual < -heap[0][0]:
+            # Stale gain; re-queue with the current one (lazy greedy)
+            heapq.heappush(heap, (-actual, i))
+            continue
+
+        lat, lon, _ = locations[zips[i]]
+        tile = Tile(zips[i], lat, lon)
+        for j in coverage[i]:
+            if uncovered[j]:
+                uncovered[j] = False
+                tile.zip_codes.append(zips[j])
+                tile.users += weights[j]
+        tiles.append(tile)
+
+    return tiles
+
+
+def tile_interval_seconds(churn: float) -> float:
+    """Re-fetch interval for a tile, from the max interval at no churn to the min at full churn."""
+    churn = min(max(churn, 0.0), 1.0)
+    low, high = settings.ingest_tile_min_interval_seconds, settings.ingest_tile_max_interval_seconds
+    return high - (high - low) * churn
+
+
+class TileScheduler:
+    """Per-tile last run and churn, shared by beat and the ingest workers in Redis."""
+
+    def __init__(self, client):
+        """Initialize scheduler.
+
+        Args:
+            client: Redis client
+        """
+        self.client = client
+
+    def state(self) -> Dict[str, Dict[str, float]]:
+        """Last run and churn of every tile swept so far."""
+        raw = self.client.hgetall(TILE_STATE_KEY)
+        return {
+            (key.decode() if isinstance(key, bytes) else key): json.loads(value)
+            for key, value in raw.items()
+        }
+
+    def due(self, tiles: Sequence[Tile], now: Optional[float] = None) -> List[Tile]:
+        """Tiles whose interval has passed, highest churn first.
+
+        Args:
+            tiles: Planned tiles
+            now: Current Unix time
+
+        Returns:
+            Tiles to ingest now
+        """
+        now = time.time() if now is None else now
+        state = self.state()
+        due = []
+        for tile in tiles:
+            entry = state.get(tile.zip_code)
+            if entry is None or now - entry["last_run"] >= tile_interval_seconds(entry["churn"]):
+                due.append((entry["churn"] if entry else 1.0, tile))
+        due.sort(key=lambda item: -item[0])
+        return [tile for _, tile in due]
+
+    def mark_dispatched(self, zip_code: str, now: Optional[float] = None) -> None:
+        """Record that a tile was queued, so the next sweep does not queue it again."""
+        entry = self.state_of(zip_code)
+        entry["last_run"] = time.time() if now is None else now
+        self.client.hset(TILE_STATE_KEY, zip_code, json.dumps(entry))
+
+    def record_result(self, zip_code: str, fetched: int, new: int) -> float:
+        """Fold a finished ingest of a tile into its churn.
+
+        Returns:
+            Updated churn (smoothed share of fetched listings that were new)
+        """
+        entry = self.state_of(zip_code)
+        if fetched:
+            entry["churn"] = (1 - CHURN_SMOOTHING) * entry["churn"] + CHURN_SMOOTHING * (new / fetched)
+        self.client.hset(TILE_STATE_KEY, zip_code, json.dumps(entry))
+        return entry["churn"]
+
+    def state_of(self, zip_code: str) -> Dict[str, float]:
+        value = self.client.hget(TILE_STATE_KEY, zip_code)
+        return json.loads(value) if value else {"last_run": 0.0, "churn": 1.0}
+
+
+class VinDeduper:
+    """Drops VINs that another tile already saved in the current window.
+
+    Seen VINs are kept in one Redis set per dedupe window, which expires
+    after the following window. Checking and marking are separate calls
+    so that VINs are only marked once they are saved: a failed save
+    leaves them to the next tile that fetches them.
+    """
+
+    def __init__(self, client, window_seconds: Optional[int] = None):
+        """Initialize deduper.
+
+        Args:
+            client: Redis client
+            window_seconds: Window length; defaults to INGEST_DEDUPE_WINDOW_SECONDS
+        """
+        self.client = client
+        self.window_seconds = window_seconds or settings.ingest_dedupe_window_seconds
+        self.dropped = 0
+
+    def unseen(self, listings: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Keep the listings whose VIN this window has not seen yet.
+
+        If Redis is unreachable every listing is kept; the upsert is
+        idempotent, dedupe only saves work.
+        """
+        if not listings:
+            return listings
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for listing in listings:
+                pipe.sismember(self._key(), listing.get("vin") or "")
+            seen = pipe.execute()
+        except Exception as e:
+            logger.warning(f"VIN dedupe unavailable, saving every listing: {e}")
+            return listings
+
+        kept = [listing for listing, is_seen in zip(listings, seen) if not is_seen]
+        self.dropped += len(listings) - len(kept)
+        return kept
+
+    def mark_seen(self, listings: List[Dict[str, Any]]) -> None:
+        """Record saved listings so other tiles skip them for the rest of the window."""
+        vins = [listing["vin"] for listing in listings if listing.get("vin")]
+        if not vins:
+            return
+        key = self._key()
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            pipe.sadd(key, *vins)
+            pipe.expire(key, 2 * self.window_seconds)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"VIN dedupe unavailable, not marking {len(vins)} VINs: {e}")
+
+    def _key(self) -> str:
+        return f"{SEEN_VINS_PREFIX}:{int(time.time() // self.window_seconds)}"
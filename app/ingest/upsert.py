@@ -0,0 +1,197 @@
+"""Bulk upsert of transformed listings."""
+import hashlib
+import json
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List
+
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.ingest.archive import archive_raw_listings, split_raw_data
+from app.ingest.lifecycle import record_price_changes, touch_listings
+from app.models.schemas import Listing
+
+
+logger = logging.getLogger(__name__)
+
+# Fields that change on every fetch without the listing itself changing
+VOLATILE_FIELDS = {"fetched_at", "raw_data"}
+
+# Rows per INSERT statement
+UPSERT_CHUNK_SIZE = 500
+
+# Typed Listing columns copied out of attrs for SQL filtering
+FILTER_COLUMNS = ("make", "model", "year", "price", "mileage", "body_type", "drivetrain")
+
+# The subset read by the preference hard filters (passes_hard_filters)
+HARD_FILTER_COLUMNS = ("make", "price", "body_type", "drivetrain")
+
+
+@dataclass
+class UpsertResult:
+    """Outcome of a bulk upsert, by VIN."""
+    new_vins: List[str] = field(default_factory=list)
+    updated_vins: List[str] = field(default_factory=list)
+    unchanged_vins: List[str] = field(default_factory=list)
+    # Updated VINs whose hard-filter columns changed -> their previous values
+    filter_changes: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+
+
+def listing_content_hash(listing_data: Dict[str, Any]) -> str:
+    """Fingerprint the normalized content of a listing.
+
+    Args:
+        listing_data: Transformed listing dictionary
+
+    Returns:
+        Hex SHA-256 of the listing without volatile fields
+    """
+    content = {k: v for k, v in listing_data.items() if k not in VOLATILE_FIELDS}
+    encoded = json.dumps(content, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def listing_columns(listing_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Typed column values for the filterable fields of a listing.
+
+    Empty strings and zero prices/mileages become NULL, which the hard
+    filters treat as "unknown" just like a missing attrs key.
+
+    Args:
+        listing_data: Transformed listing dictionary
+
+    Returns:
+        Values for Listing.make, model, year, price, mileage, body_type and drivetrain
+    """
+    body_type = listing_data.get("body_type")
+    return {
+        "make": listing_data.get("make") or None,
+        "model": listing_data.get("model") or None,
+        "year": _to_number(listing_data.get("year"), int),
+        "price": _to_number(listing_data.get("price"), float),
+        "mileage": _to_number(listing_data.get("mileage"), int),
+        "body_type": body_type.lower() if body_type else None,
+        "drivetrain": listing_data.get("drivetrain") or None,
+    }
+
+
+def _to_number(value: Any, kind: type) -> Any:
+    """Coerce a provider value to int/float, or None if absent or unparseable."""
+    if value in (None, "", 0):
+        return None
+    try:
+        return kind(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def bulk_upsert_listings(db: Session, listings: List[Dict[str, Any]]) -> UpsertResult:
+    """Insert new listings and update changed ones in bulk.
+
+    Existing content hashes are read with one IN query; listings whose hash
+    is unchanged are not written at all. Everything else goes out as
+    ``INSERT ... ON CONFLICT (vin) DO UPDATE`` on Postgres and SQLite.
+    ``attrs`` only keeps the normalized fields; the raw provider payload of
+    new and changed listings goes to the compressed archive, and their
+    price/mileage to the price history. Every listing in the batch is
+    marked as seen (and un-expired). The caller commits.
+
+    Args:
+        db: Database session
+        listings: Transformed listing dictionaries
+
+    Returns:
+        VINs split into new, updated and unchanged, and the previous
+        hard-filter values of updated listings where those changed
+    """
+    result = UpsertResult()
+
+    # Last occurrence of a VIN in the batch wins
+    by_vin: Dict[str, Dict[str, Any]] = {}
+    for listing_data in listings:
+        vin = listing_data.get("vin")
+        if vin:
+            by_vin[vin] = listing_data
+    if not by_vin:
+        return result
+
+    existing = {}
+    previous: Dict[str, Dict[str, Any]] = {}
+    for row in db.query(
+        Listing.vin, Listing.content_hash, *(getattr(Listing, column) for column in FILTER_COLUMNS)
+    ).filter(Listing.vin.in_(list(by_vin))):
+        existing[row.vin] = row.content_hash
+        previous[row.vin] = {column: getattr(row, column) for column in FILTER_COLUMNS}
+
+    now = datetime.utcnow()
+    rows = []
+    for vin, listing_data in by_vin.items():
+        content_hash = listing_content_hash(listing_data)
+        columns = listing_columns(listing_data)
+        if vin in existing:
+            if existing[vin] == content_hash:
+                result.unchanged_vins.append(vin)
+                continue
+            result.updated_vins.append(vin)
+            if any(previous[vin][column] != columns[column] for column in HARD_FILTER_COLUMNS):
+                result.filter_changes[vin] = {column: previous[vin][column] for column in HARD_FILTER_COLUMNS}
+        else:
+            result.new_vins.append(vin)
+
+        rows.append({
+            "vin": vin,
+            "source": listing_data.get("source", "unknown"),
+            "attrs": split_raw_data(listing_data)[0],
+            "content_hash": content_hash,
+            **columns,
+            "created_at": now,
+            "updated_at": now,
+            "last_seen_at": now,
+            "expired_at": None
+        })
+
+    for start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        _upsert_rows(db, rows[start:start + UPSERT_CHUNK_SIZE])
+
+    archive_raw_listings(db, [by_vin[row["vin"]] for row in rows])
+    record_price_changes(
+        db, {vin: (values["price"], values["mileage"]) for vin, values in previous.items()}, rows, now
+    )
+    touch_listings(db, result.unchanged_vins, now)
+
+    return result
+
+
+def _upsert_rows(db: Session, rows: List[Dict[str, Any]]) -> None:
+    """Write one chunk of listing rows with a single statement."""
+    dialect = db.get_bind().dialect.name
+
+    if dialect == "postgresql":
+        insert = postgresql_insert
+    elif dialect == "sqlite":
+        insert = sqlite_insert
+    else:
+        # No ON CONFLICT support; fall back to per-row merges
+        for row in rows:
+            db.merge(Listing(**row))
+        return
+
+    stmt = insert(Listing).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Listing.vin],
+        set_={
+            "source": stmt.excluded.source,
+            "attrs": stmt.excluded.attrs,
+            "content_hash": stmt.excluded.content_hash,
+            "updated_at": stmt.excluded.updated_at,
+            "last_seen_at": stmt.excluded.last_seen_at,
+            "expired_at": None,
+            **{column: stmt.excluded[column] for column in FILTER_COLUMNS}
+        },
+        # Another writer may have stored the same content meanwhile
+        where=Listing.content_hash.is_distinct_from(stmt.excluded.content_hash)
+    )
+    db.execute(stmt)
@@ -0,0 +1,100 @@
+"""Per-(source, search area) watermarks for incremental ingestion."""
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.schemas import IngestWatermark
+
+
+# Provider "last seen" times are re-read this far behind the watermark
+WATERMARK_OVERLAP = timedelta(minutes=10)
+
+
+def changed_since(
+    db: Session,
+    sources: Iterable[str],
+    zip_code: str,
+    radius: int,
+    now: Optional[datetime] = None
+) -> Dict[str, Optional[datetime]]:
+    """Cut-off each source can be asked for changes since.
+
+    A source gets None (fetch everything) if it was never fetched
+    completely for this area, or if its last full fetch is older than
+    INGEST_FULL_FETCH_INTERVAL_SECONDS.
+
+    Args:
+        db: Database session
+        sources: Source names
+        zip_code: ZIP code searched around
+        radius: Search radius in miles
+        now: Current time
+
+    Returns:
+        Source name -> cut-off or None
+    """
+    now = now or datetime.utcnow()
+    rows = {
+        row.source: row for row in db.query(IngestWatermark).filter(
+            IngestWatermark.zip_code == zip_code,
+            IngestWatermark.radius == radius
+        )
+    }
+    full_fetch_after = now - timedelta(seconds=settings.ingest_full_fetch_interval_seconds)
+
+    since = {}
+    for source in sources:
+        row = rows.get(source)
+        if row is None or row.full_fetch_at is None or row.full_fetch_at < full_fetch_after:
+            since[source] = None
+        else:
+            since[source] = row.fetched_since - WATERMARK_OVERLAP
+    return since
+
+
+def advance_watermarks(
+    db: Session,
+    sources: Iterable[str],
+    zip_code: str,
+    radius: int,
+    started_at: datetime,
+    full: Dict[str, bool]
+) -> None:
+    """Record complete fetches of an area. The caller commits.
+
+    Args:
+        db: Database session
+        sources: Sources that were fetched to the end without errors
+        zip_code: ZIP code searched around
+        radius: Search radius in miles
+        started_at: When the fetch started
+        full: Source name -> whether it fetched without a cut-off
+    """
+    rows = [
+        {
+            "source": source,
+            "zip_code": zip_code,
+            "radius": radius,
+            "fetched_since": started_at,
+            "full_fetch_at": started_at if full.get(source) else None
+        }
+        for source in sources
+    ]
+    if not rows:
+        return
+
+    insert = postgresql_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+    stmt = insert(IngestWatermark).values(rows)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[IngestWatermark.source, IngestWatermark.zip_code, IngestWatermark.radius],
+        set_={
+            "fetched_since": stmt.excluded.fetched_since,
+            # An incremental fetch keeps the previous full fetch time
+            "full_fetch_at": func.coalesce(stmt.excluded.full_fetch_at, IngestWatermark.full_fetch_at)
+        }
+    ))
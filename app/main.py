@@ -7,9 +7,10 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
 from app.config import settings
-from app.database import init_db
+from app.database import init_db, pool_metrics
 from app.chat.routes import router as chat_router
 from app.alerts.routes import router as alerts_router
+from app.ingest.routes import router as ingest_router
 
 
 # Configure logging
@@ -51,6 +52,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # alerts feed pagination
 )
 
 
@@ -65,6 +67,13 @@ async def health_check():
     }
 
 
+# Database pool metrics
+@app.get("/metrics/db-pool")
+async def db_pool_metrics():
+    """Connection pool counters and occupancy for the API engine."""
+    return pool_metrics.snapshot()
+
+
 # Root endpoint
 @app.get("/")
 async def root():
@@ -79,6 +88,7 @@ async def root():
 # Include routers
 app.include_router(chat_router, prefix="/api")
 app.include_router(alerts_router, prefix="/api")
+app.include_router(ingest_router, prefix="/api")
 
 
 # Global exception handler
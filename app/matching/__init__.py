@@ -0,0 +1 @@
+# Matching module
\ No newline at end of file
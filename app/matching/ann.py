@@ -0,0 +1,515 @@
+"""Embeddable IVF approximate nearest-neighbour index over float32 vectors."""
+import fcntl
+import json
+import logging
+import os
+import shutil
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.matching.matrix import DEFAULT_THRESHOLD, PreferenceMatrix
+
+
+logger = logging.getLogger(__name__)
+
+# Vectors per list sampled when training centroids
+TRAIN_SAMPLE_PER_LIST = 64
+
+# k-means iterations when training centroids
+TRAIN_ITERATIONS = 10
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scale rows to unit length, leaving zero rows at zero."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+
+class IVFIndex:
+    """Inverted-file index for cosine similarity search.
+
+    Vectors are normalized on insert and assigned to the nearest of
+    ``n_lists`` k-means centroids. A query scans only the ``nprobe`` lists
+    whose centroids are closest, computing exact scores for the vectors in
+    them. The index has two segments:
+
+    * a base segment, stored on disk grouped by list and memory-mapped on
+      load, so a restart costs no decoding or re-embedding;
+    * an in-memory delta segment for vectors added since the last save.
+
+    Deletes are tombstones until ``save`` rewrites the base segment. Until
+    ``min_train_size`` vectors have been added the index is untrained and
+    every query is a brute-force scan. Each entry may carry a version
+    string (e.g. the source row's ``updated_at``), saved with the index,
+    so a stale vector can be told apart after a reload.
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        n_lists: int = 256,
+        nprobe: int = 16,
+        min_train_size: Optional[int] = None
+    ):
+        """Initialize an empty index.
+
+        Args:
+            dim: Vector dimension
+            n_lists: Number of inverted lists (k-means centroids)
+            nprobe: Lists scanned per query
+            min_train_size: Vectors needed before centroids are trained
+        """
+        self.dim = dim
+        self.n_lists = n_lists
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size or n_lists * TRAIN_SAMPLE_PER_LIST
+        self.centroids: Optional[np.ndarray] = None
+
+        # Base segment, grouped by list: rows offsets[i]:offsets[i + 1] belong to list i
+        self._base = np.zeros((0, dim), dtype=np.float32)
+        self._base_ids: List[str] = []
+        self._base_deleted = np.zeros(0, dtype=bool)
+        self._offsets = np.zeros(2, dtype=np.int64)
+
+        # Delta segment
+        self._delta = np.zeros((0, dim), dtype=np.float32)
+        self._delta_ids: List[str] = []
+        self._delta_lists = np.zeros(0, dtype=np.int32)
+        self._delta_deleted = np.zeros(0, dtype=bool)
+        self._delta_size = 0
+
+        # id -> (segment, row); segment 0 is base, 1 is delta
+        self._locations: Dict[str, Tuple[int, int]] = {}
+        self.versions: Dict[str, str] = {}
+        self.dirty = False
+
+    def __len__(self) -> int:
+        return len(self._locations)
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self._locations
+
+    @property
+    def ids(self) -> List[str]:
+        """IDs of all live entries."""
+        return list(self._locations)
+
+    @property
+    def is_trained(self) -> bool:
+        """Whether centroids have been trained."""
+        return self.centroids is not None
+
+    def add(
+        self,
+        ids: Sequence[str],
+        vectors: Sequence[Sequence[float]],
+        versions: Optional[Sequence[Optional[str]]] = None
+    ) -> None:
+        """Insert or replace vectors.
+
+        Args:
+            ids: Item IDs
+            vectors: One vector per ID
+            versions: Version of each vector; None leaves it unversioned
+        """
+        if not len(ids):
+            return
+
+        vectors = _normalize(np.asarray(vectors, dtype=np.float32).reshape(len(ids), self.dim))
+        self.remove(ids)
+        for item_id, version in zip(ids, versions or ()):
+            if version is not None:
+                self.versions[item_id] = version
+
+        needed = self._delta_size + len(ids)
+        if needed > len(self._delta):
+            capacity = max(needed, 2 * len(self._delta), 1024)
+            extra = capacity - len(self._delta)
+            self._delta = np.concatenate([self._delta, np.zeros((extra, self.dim), dtype=np.float32)])
+            self._delta_lists = np.concatenate([self._delta_lists, np.zeros(extra, dtype=np.int32)])
+            self._delta_deleted = np.concatenate([self._delta_deleted, np.zeros(extra, dtype=bool)])
+
+        start = self._delta_size
+        self._delta[start:needed] = vectors
+        self._delta_lists[start:needed] = self._assign(vectors)
+        self._delta_deleted[start:needed] = False
+        for i, item_id in enumerate(ids):
+            self._delta_ids.append(item_id)
+            self._locations[item_id] = (1, start + i)
+        self._delta_size = needed
+        self.dirty = True
+
+        if not self.is_trained and len(self) >= self.min_train_size:
+            self.train()
+
+    def remove(self, ids: Iterable[str]) -> None:
+        """Delete vectors by ID; unknown IDs are ignored.
+
+        Args:
+            ids: Item IDs
+        """
+        for item_id in ids:
+            location = self._locations.pop(item_id, None)
+            self.versions.pop(item_id, None)
+            if location is None:
+                continue
+            segment, row = location
+            if segment == 0:
+                self._base_deleted[row] = True
+            else:
+                self._delta_deleted[row] = True
+            self.dirty = True
+
+    def search(
+        self,
+        query: Sequence[float],
+        k: Optional[int] = None,
+        threshold: Optional[float] = None,
+        nprobe: Optional[int] = None
+    ) -> List[Tuple[str, float]]:
+        """Find the stored vectors most similar to a query.
+
+        Args:
+            query: Query vector
+            k: Return at most this many results
+            threshold: Only return results with cosine similarity above this
+            nprobe: Lists to scan, defaults to the index setting
+
+        Returns:
+            List of (id, cosine_similarity), best first
+        """
+        q = np.asarray(query, dtype=np.float32)
+        norm = np.linalg.norm(q)
+        if norm == 0 or not self._locations:
+            return []
+        q = q / norm
+
+        lists = self._probe(q, nprobe or self.nprobe)
+
+        # Base segment: each probed list is one contiguous slice
+        base_rows: List[np.ndarray] = []
+        base_scores: List[np.ndarray] = []
+        for list_id in lists:
+            start, end = self._offsets[list_id], self._offsets[list_id + 1]
+            if start == end:
+                continue
+            live = np.flatnonzero(~self._base_deleted[start:end])
+            base_scores.append((np.asarray(self._base[start:end]) @ q)[live])
+            base_rows.append(live + start)
+
+        # Delta segment
+        n = self._delta_size
+        delta_rows = np.flatnonzero(np.isin(self._delta_lists[:n], lists) & ~self._delta_deleted[:n])
+
+        rows = np.concatenate(base_rows + [delta_rows]).astype(np.int64)
+        scores = np.concatenate(base_scores + [self._delta[delta_rows] @ q]).astype(np.float32)
+        n_base = len(rows) - len(delta_rows)
+
+        keep = np.arange(len(scores))
+        if threshold is not None:
+            keep = np.flatnonzero(scores > threshold)
+        if k is not None and len(keep) > k:
+            keep = keep[np.argpartition(-scores[keep], k - 1)[:k]]
+        keep = keep[np.argsort(-scores[keep], kind="stable")]
+
+        return [
+            (self._base_ids[rows[i]] if i < n_base else self._delta_ids[rows[i]], float(scores[i]))
+            for i in keep
+        ]
+
+    def train(self) -> None:
+        """Train centroids with spherical k-means and regroup all vectors."""
+        ids, vectors = self._live_vectors()
+        n_lists = min(self.n_lists, len(ids))
+        if n_lists == 0:
+            return
+
+        rng = np.random.default_rng(0)
+        sample_size = min(len(ids), self.n_lists * TRAIN_SAMPLE_PER_LIST)
+        sample = vectors[rng.choice(len(ids), sample_size, replace=False)]
+
+        centroids = sample[rng.choice(sample_size, n_lists, replace=False)].copy()
+        for _ in range(TRAIN_ITERATIONS):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            empty = ~np.any(sums, axis=1)
+            # Re-seed empty lists from random sample points
+            sums[empty] = sample[rng.choice(sample_size, int(empty.sum()))]
+            centroids = _normalize(sums)
+
+        self.centroids = centroids
+        self.n_lists = n_lists
+        self._rebuild(ids, vectors)
+        logger.info(f"Trained IVF index: {len(ids)} vectors in {n_lists} lists")
+
+    def save(self, path: str) -> None:
+        """Persist the index, merging the delta into the base segment.
+
+        The new files are written next to the old ones and swapped in, so a
+        crash mid-save leaves the previous snapshot intact. Meant for a
+        single writer (see loader.update_ann_index); readers only ``load``.
+
+        Args:
+            path: Index directory
+        """
+        ids, vectors = self._live_vectors()
+        self._rebuild(ids, vectors)
+
+        # Worker processes may be loading the index meanwhile
+        with open(f"{path}.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+
+            tmp_path = f"{path}.tmp"
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            os.makedirs(tmp_path)
+
+            np.save(os.path.join(tmp_path, "vectors.npy"), self._base)
+            np.save(os.path.join(tmp_path, "offsets.npy"), self._offsets)
+            if self.centroids is not None:
+                np.save(os.path.join(tmp_path, "centroids.npy"), self.centroids)
+            with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+                json.dump({
+                    "dim": self.dim,
+                    "n_lists": self.n_lists,
+                    "nprobe": self.nprobe,
+                    "min_train_size": self.min_train_size,
+                    "ids": self._base_ids,
+                    "versions": {
+                        item_id: self.versions[item_id]
+                        for item_id in self._base_ids if item_id in self.versions
+                    }
+                }, f)
+
+            old_path = f"{path}.old"
+            shutil.rmtree(old_path, ignore_errors=True)
+            if os.path.exists(path):
+                os.rename(path, old_path)
+            os.rename(tmp_path, path)
+            shutil.rmtree(old_path, ignore_errors=True)
+
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "IVFIndex":
+        """Load an index saved with ``save``.
+
+        Args:
+            path: Index directory
+            mmap: Memory-map the vectors instead of reading them into memory
+
+        Returns:
+            Loaded index
+        """
+        # Do not read a snapshot while save() is swapping it
+        with open(f"{path}.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_SH)
+
+            with open(os.path.join(path, "meta.json")) as f:
+                meta = json.load(f)
+
+            index = cls(meta["dim"], meta["n_lists"], meta["nprobe"], meta["min_train_size"])
+            centroids_path = os.path.join(path, "centroids.npy")
+            if os.path.exists(centroids_path):
+                index.centroids = np.load(centroids_path)
+
+            index._base = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r" if mmap else None)
+            index._offsets = np.load(os.path.join(path, "offsets.npy"))
+
+        index._base_ids = meta["ids"]
+        index.versions = meta.get("versions", {})
+        index._base_deleted = np.zeros(len(index._base_ids), dtype=bool)
+        index._locations = {item_id: (0, row) for row, item_id in enumerate(index._base_ids)}
+        return index
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        """Nearest centroid for each vector (list 0 when untrained)."""
+        if self.centroids is None:
+            return np.zeros(len(vectors), dtype=np.int32)
+        return np.argmax(vectors @ self.centroids.T, axis=1).astype(np.int32)
+
+    def _probe(self, q: np.ndarray, nprobe: int) -> np.ndarray:
+        """Lists to scan for a normalized query."""
+        if self.centroids is None:
+            return np.zeros(1, dtype=np.int32)
+        nprobe = min(nprobe, self.n_lists)
+        return np.argpartition(-(self.centroids @ q), nprobe - 1)[:nprobe].astype(np.int32)
+
+    def _live_vectors(self) -> Tuple[List[str], np.ndarray]:
+        """IDs and vectors of every non-deleted entry, base segment first."""
+        base_rows = np.flatnonzero(~self._base_deleted)
+        delta_rows = np.flatnonzero(~self._delta_deleted[:self._delta_size])
+        ids = [self._base_ids[row] for row in base_rows] + [self._delta_ids[row] for row in delta_rows]
+        vectors = np.concatenate([
+            np.asarray(self._base[base_rows], dtype=np.float32).reshape(-1, self.dim),
+            self._delta[delta_rows]
+        ])
+        return ids, vectors
+
+    def _rebuild(self, ids: List[str], vectors: np.ndarray) -> None:
+        """Replace both segments with a base segment grouped by list."""
+        assignment = self._assign(vectors)
+        order = np.argsort(assignment, kind="stable")
+        n_lists = self.n_lists if self.centroids is not None else 1
+
+        self._base = np.ascontiguousarray(vectors[order])
+        self._base_ids = [ids[i] for i in order]
+        self._base_deleted = np.zeros(len(ids), dtype=bool)
+        self._offsets = np.concatenate([
+            [0], np.cumsum(np.bincount(assignment, minlength=n_lists))
+        ]).astype(np.int64)
+
+        self._delta = np.zeros((0, self.dim), dtype=np.float32)
+        self._delta_ids = []
+        self._delta_lists = np.zeros(0, dtype=np.int32)
+        self._delta_deleted = np.zeros(0, dtype=bool)
+        self._delta_size = 0
+
+        self._locations = {item_id: (0, row) for row, item_id in enumerate(self._base_ids)}
+
+
+class IndexedPreferenceMatrix(PreferenceMatrix):
+    """PreferenceMatrix whose embeddings live in an IVF index.
+
+    Only the hard-filter columns are kept in memory; candidate preferences
+    come from the index (memory-mapped, persisted across restarts) and are
+    then checked against the filter mask. Exposes the same ``match`` /
+    ``match_many`` interface as PreferenceMatrix.
+    """
+
+    STORES_VECTORS = False
+
+    def __init__(self, index: IVFIndex, capacity: int = 1024):
+        """Initialize matrix around an index.
+
+        Args:
+            index: Index holding (or receiving) the preference embeddings
+            capacity: Initial number of preallocated rows
+        """
+        super().__init__(index.dim, capacity)
+        self.index = index
+
+    def add(
+        self,
+        preference_id: str,
+        car_pref: Dict[str, Any],
+        embedding: Optional[Sequence[float]] = None,
+        normalized: bool = False,
+        version: Optional[str] = None
+    ) -> None:
+        """Add or replace a preference.
+
+        Args:
+            preference_id: Preference ID
+            car_pref: CarPreference JSON
+            embedding: Preference embedding; may be omitted if the index
+                already holds it
+            normalized: Ignored; the index normalizes every vector it stores
+            version: Version of the embedding, stored with it in the index
+        """
+        if embedding is not None:
+            vector = np.asarray(embedding, dtype=np.float32)
+            if vector.shape != (self.dim,):
+                logger.warning(f"Skipping preference {preference_id}: bad embedding shape {vector.shape}")
+                return
+            self.index.add([preference_id], [vector], [version])
+        elif preference_id not in self.index:
+            logger.warning(f"Skipping preference {preference_id}: no embedding in index")
+            return
+
+        self._add_row(preference_id, car_pref)
+
+    def remove(self, preference_id: str) -> None:
+        """Remove a preference from the filters and the index.
+
+        Args:
+            preference_id: Preference ID
+        """
+        super().remove(preference_id)
+        self.index.remove([preference_id])
+
+    def match(
+        self,
+        listing_attrs: Dict[str, Any],
+        embedding: Sequence[float],
+        threshold: float = DEFAULT_THRESHOLD
+    ) -> List[Tuple[str, float]]:
+        """Find preferences matching a listing.
+
+        Args:
+            listing_attrs: Listing attributes
+            embedding: Listing embedding vector
+            threshold: Minimum cosine similarity for a match
+
+        Returns:
+            List of (preference_id, similarity_score) tuples, best first
+        """
+        if not self._slots or embedding is None or len(embedding) == 0:
+            return []
+
+        candidates = self.index.search(embedding, threshold=threshold)
+        if not candidates:
+            return []
+
+        mask = self.filter_mask(listing_attrs)
+        matches = []
+        for preference_id, score in candidates:
+            slot = self._slots.get(preference_id)
+            if slot is not None and mask[slot]:
+                matches.append((preference_id, score))
+        return matches
+
+    def match_delta(
+        self,
+        old_attrs: Dict[str, Any],
+        new_attrs: Dict[str, Any],
+        embedding: Sequence[float],
+        threshold: float = DEFAULT_THRESHOLD
+    ) -> List[Tuple[str, float]]:
+        """Find preferences a changed listing matches now but was filtered out of before.
+
+        Args:
+            old_attrs: Listing attributes before the change
+            new_attrs: Listing attributes after the change
+            embedding: Listing embedding vector (unchanged)
+            threshold: Minimum cosine similarity for a match
+
+        Returns:
+            List of (preference_id, similarity_score) tuples, best first
+        """
+        if not self._slots or embedding is None or len(embedding) == 0:
+            return []
+
+        candidates = self.index.search(embedding, threshold=threshold)
+        if not candidates:
+            return []
+
+        mask = self.filter_mask(new_attrs) & ~self.filter_mask(old_attrs)
+        matches = []
+        for preference_id, score in candidates:
+            slot = self._slots.get(preference_id)
+            if slot is not None and mask[slot]:
+                matches.append((preference_id, score))
+        return matches
+
+    def match_many(
+        self,
+        listings_attrs: Sequence[Dict[str, Any]],
+        embeddings: Sequence[Sequence[float]],
+        threshold: float = DEFAULT_THRESHOLD
+    ) -> List[List[Tuple[str, float]]]:
+        """Find matching preferences for a batch of listings.
+
+        Args:
+            listings_attrs: Attributes of each listing
+            embeddings: Embedding of each listing
+            threshold: Minimum cosine similarity for a match
+
+        Returns:
+            One list of (preference_id, similarity_score) tuples per listing
+        """
+        return [
+            self.match(attrs, embedding, threshold)
+            for attrs, embedding in zip(listings_attrs, embeddings)
+        ]
@@ -0,0 +1,163 @@
+"""Match a newly saved preference against the existing listing inventory."""
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Sequence, Tuple
+from uuid import uuid4
+
+import numpy as np
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from app.alerts.counters import record_new_alerts
+from app.matching.filters import hard_filter_clauses
+from app.matching.matrix import DEFAULT_THRESHOLD, normalize_embedding, passes_hard_filters
+from app.matching.vector_search import listings_similar_to_preference, supports_vector_search
+from app.models.schemas import Alert, Listing
+
+
+logger = logging.getLogger(__name__)
+
+# Listings whose embeddings are read (and scored) per IN query
+SCAN_CHUNK_SIZE = 2000
+
+
+def match_listings_for_preference(
+    db: Session,
+    car_pref: Dict[str, Any],
+    embedding: Sequence[float],
+    limit: int,
+    threshold: float = DEFAULT_THRESHOLD
+) -> List[Tuple[str, float]]:
+    """Find the enriched listings that best match a preference.
+
+    Uses the HNSW index on Postgres and a filtered brute-force scan
+    (scan_listings) elsewhere; either way the hard filters run in SQL.
+    On Postgres the attrs are re-checked too, for rows ingested before
+    the filter columns were populated.
+
+    Args:
+        db: Database session
+        car_pref: CarPreference JSON
+        embedding: Preference embedding
+        limit: Maximum number of listings to return
+        threshold: Minimum cosine similarity for a match
+
+    Returns:
+        List of (vin, similarity_score) tuples, best first
+    """
+    if supports_vector_search(db):
+        candidates = listings_similar_to_preference(
+            db, embedding, limit, threshold,
+            filters=hard_filter_clauses(car_pref),
+            accept=lambda row: passes_hard_filters(car_pref, row.attrs)
+        )
+        return [
+            (vin, similarity)
+            for vin, _, similarity in candidates
+            if similarity > threshold
+        ]
+
+    return scan_listings(db, car_pref, embedding, limit, threshold)
+
+
+def scan_listings(
+    db: Session,
+    car_pref: Dict[str, Any],
+    embedding: Sequence[float],
+    limit: int,
+    threshold: float = DEFAULT_THRESHOLD
+) -> List[Tuple[str, float]]:
+    """Brute-force top-k search over enriched listings.
+
+    The hard filters run in SQL, so embeddings are only read for listings
+    that pass them; those are streamed and scored in chunks.
+
+    Args:
+        db: Database session
+        car_pref: CarPreference JSON
+        embedding: Preference embedding
+        limit: Maximum number of listings to return
+        threshold: Minimum cosine similarity for a match
+
+    Returns:
+        List of (vin, similarity_score) tuples, best first
+    """
+    query, norm = normalize_embedding(embedding)
+    if norm == 0:
+        return []
+
+    result = db.execute(
+        select(Listing.vin, Listing.embedding, Listing.embedding_norm)
+        .where(
+            Listing.embedding.isnot(None),
+            Listing.expired_at.is_(None),
+            *hard_filter_clauses(car_pref)
+        )
+        .execution_options(yield_per=SCAN_CHUNK_SIZE)
+    )
+
+    best_vins: List[str] = []
+    best_scores = np.empty(0, dtype=np.float32)
+    for chunk in result.partitions():
+        vectors = np.stack([row.embedding for row in chunk]).astype(np.float32, copy=False)
+
+        # Rows embedded before write-time normalization have no stored norm
+        legacy = np.array([row.embedding_norm is None for row in chunk])
+        if legacy.any():
+            norms = np.linalg.norm(vectors[legacy], axis=1)
+            norms[norms == 0] = 1.0
+            vectors[legacy] /= norms[:, None]
+
+        scores = vectors @ query
+        hits = np.flatnonzero(scores > threshold)
+        best_vins += [chunk[i].vin for i in hits]
+        best_scores = np.concatenate([best_scores, scores[hits]])
+
+        # Keep only the running top-k
+        if len(best_scores) > limit:
+            keep = np.argpartition(-best_scores, limit)[:limit]
+            best_vins = [best_vins[i] for i in keep]
+            best_scores = best_scores[keep]
+
+    order = np.argsort(-best_scores, kind="stable")
+    return [(best_vins[i], float(best_scores[i])) for i in order]
+
+
+def insert_alerts(db: Session, preference_id: str, matches: List[Tuple[str, float]]) -> List[str]:
+    """Insert alerts for matches that do not have one yet, in one statement.
+
+    The caller commits.
+
+    Args:
+        db: Database session
+        preference_id: Preference ID
+        matches: List of (vin, similarity_score) tuples
+
+    Returns:
+        IDs of the created alerts
+    """
+    if not matches:
+        return []
+
+    existing = {
+        row[0] for row in db.query(Alert.vin).filter(
+            Alert.preference_id == preference_id,
+            Alert.vin.in_([vin for vin, _ in matches])
+        )
+    }
+    now = datetime.utcnow()
+    rows = [
+        {
+            "id": str(uuid4()),
+            "preference_id": preference_id,
+            "vin": vin,
+            "similarity_score": score,
+            "created_at": now
+        }
+        for vin, score in matches
+        if vin not in existing
+    ]
+    if rows:
+        db.execute(insert(Alert), rows)
+        record_new_alerts(db, [preference_id] * len(rows), now)
+    return [row["id"] for row in rows]
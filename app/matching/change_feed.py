@@ -0,0 +1,80 @@
+"""Redis stream announcing preference changes to matcher workers."""
+import logging
+from typing import Optional
+
+from app.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+# Approximate number of notifications the stream retains
+STREAM_MAXLEN = 10_000
+
+
+def _redis_client():
+    import redis
+
+    return redis.Redis.from_url(settings.redis_url, socket_timeout=1.0)
+
+
+def publish_preference_change(preference_id: str, client=None) -> None:
+    """Notify workers that a preference was saved, re-embedded or deactivated.
+
+    Best effort: workers also poll the ``updated_at`` watermark, so a lost
+    notification only delays the change.
+
+    Args:
+        preference_id: Preference ID
+        client: Redis client; defaults to one for REDIS_URL
+    """
+    try:
+        client = client or _redis_client()
+        client.xadd(
+            settings.preference_change_stream,
+            {"preference_id": preference_id},
+            maxlen=STREAM_MAXLEN,
+            approximate=True
+        )
+    except Exception as e:
+        logger.warning(f"Could not publish change of preference {preference_id}: {e}")
+
+
+class PreferenceChangeFeed:
+    """Worker-side reader of the preference change stream.
+
+    The stream is only a doorbell: ``poll`` tells whether anything was
+    published since the last call, and the worker then reads the actual
+    changes from the database by watermark.
+    """
+
+    def __init__(self, client=None):
+        """Initialize the feed at the current end of the stream.
+
+        Args:
+            client: Redis client; defaults to one for REDIS_URL
+        """
+        self.client = client or _redis_client()
+        self.stream = settings.preference_change_stream
+        self.last_id = "0-0"
+        self.poll()
+
+    def poll(self) -> Optional[bool]:
+        """Check for notifications published since the last poll.
+
+        Returns:
+            True if there were any, False if not, None if Redis is unreachable
+        """
+        try:
+            latest = self.client.xrevrange(self.stream, count=1)
+        except Exception as e:
+            logger.warning(f"Preference change feed unavailable: {e}")
+            return None
+
+        if not latest:
+            return False
+        entry_id = latest[0][0]
+        entry_id = entry_id.decode() if isinstance(entry_id, bytes) else entry_id
+        if entry_id == self.last_id:
+            return False
+        self.last_id = entry_id
+        return True
@@ -0,0 +1,260 @@
+"""Content-addressed cache for OpenAI embeddings."""
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+def encode_vector(vector: Sequence[float]) -> bytes:
+    """Pack an embedding as little-endian float32 bytes."""
+    return np.asarray(vector, dtype="<f4").tobytes()
+
+
+def decode_vector(blob: bytes) -> List[float]:
+    """Unpack an embedding packed by encode_vector."""
+    return np.frombuffer(blob, dtype="<f4").tolist()
+
+
+class RedisEmbeddingBackend:
+    """Embedding blobs stored in Redis with a per-key TTL.
+
+    LRU eviction is delegated to the Redis server (``maxmemory-policy
+    allkeys-lru``); the TTL bounds how long an unused entry can linger.
+    """
+
+    def __init__(self, url: str, ttl_seconds: int, prefix: str = "emb:"):
+        """Initialize backend.
+
+        Args:
+            url: Redis URL
+            ttl_seconds: Entry time-to-live
+            prefix: Key prefix
+        """
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        """Fetch blobs for keys, None for missing entries."""
+        return self.client.mget([self.prefix + key for key in keys])
+
+    def set_many(self, items: Dict[str, bytes]) -> None:
+        """Store blobs, refreshing their TTL."""
+        pipe = self.client.pipeline(transaction=False)
+        for key, blob in items.items():
+            pipe.set(self.prefix + key, blob, ex=self.ttl_seconds)
+        pipe.execute()
+
+
+class DiskEmbeddingBackend:
+    """Embedding blobs stored in a local SQLite file with LRU and TTL eviction."""
+
+    # Evict at most once per this many writes
+    EVICT_EVERY = 100
+
+    def __init__(self, path: str, ttl_seconds: int, max_entries: int):
+        """Initialize backend.
+
+        Args:
+            path: SQLite file path
+            ttl_seconds: Entry time-to-live
+            max_entries: Entries kept before least recently used ones are evicted
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_accessed ON embeddings (accessed_at)"
+        )
+        self._conn.commit()
+
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        """Fetch blobs for keys, None for missing or expired entries."""
+        now = time.time()
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT key, value FROM embeddings WHERE key IN ({placeholders}) "
+                f"AND created_at > ?",
+                [*keys, now - self.ttl_seconds]
+            ).fetchall()
+            found = dict(rows)
+            if found:
+                self._conn.execute(
+                    f"UPDATE embeddings SET accessed_at = ? "
+                    f"WHERE key IN ({','.join('?' * len(found))})",
+                    [now, *found]
+                )
+                self._conn.commit()
+        return [found.get(key) for key in keys]
+
+    def set_many(self, items: Dict[str, bytes]) -> None:
+        """Store blobs, evicting expired and least recently used entries."""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, value, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                [(key, blob, now, now) for key, blob in items.items()]
+            )
+            self._writes += len(items)
+            if self._writes >= self.EVICT_EVERY:
+                self._writes = 0
+                self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        """Drop expired entries, then the least recently used overflow."""
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE created_at <= ?", (now - self.ttl_seconds,)
+        )
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN ("
+            "SELECT key FROM embeddings ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+
+class EmbeddingCache:
+    """Embedding cache keyed by a hash of (model name, text).
+
+    Backend errors are logged and treated as misses so a cache outage only
+    costs extra OpenAI calls. Hit/miss counters are per process and logged
+    every EMBEDDING_CACHE_STATS_LOG_SECONDS.
+    """
+
+    def __init__(self, backend, model: str):
+        """Initialize cache.
+
+        Args:
+            backend: Storage backend with get_many/set_many
+            model: Embedding model name, part of every key
+        """
+        self.backend = backend
+        self.model = model
+        self.hits = 0
+        self.misses = 0
+        self._stats_logged_at = time.monotonic()
+
+    def key(self, text: str) -> str:
+        """Content address for a text under this cache's model."""
+        return hashlib.sha256(f"{self.model}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Look up cached embeddings.
+
+        Args:
+            texts: Texts to look up
+
+        Returns:
+            Embedding per text, None where not cached
+        """
+        if not texts:
+            return []
+
+        try:
+            blobs = self.backend.get_many([self.key(text) for text in texts])
+        except Exception as e:
+            logger.warning(f"Embedding cache lookup failed: {e}")
+            blobs = [None] * len(texts)
+
+        results = [decode_vector(blob) if blob else None for blob in blobs]
+        hits = sum(1 for result in results if result is not None)
+        self.hits += hits
+        self.misses += len(texts) - hits
+        self._log_stats_if_due()
+        return results
+
+    def set_many(self, texts: List[str], embeddings: List[List[float]]) -> None:
+        """Store embeddings for texts.
+
+        Args:
+            texts: Embedded texts
+            embeddings: Embedding for each text
+        """
+        if not texts:
+            return
+
+        try:
+            self.backend.set_many({
+                self.key(text): encode_vector(embedding)
+                for text, embedding in zip(texts, embeddings)
+            })
+        except Exception as e:
+            logger.warning(f"Embedding cache write failed: {e}")
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters for this process."""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0
+        }
+
+    def _log_stats_if_due(self) -> None:
+        interval = settings.embedding_cache_stats_log_seconds
+        now = time.monotonic()
+        if interval <= 0 or now - self._stats_logged_at < interval:
+            return
+        self._stats_logged_at = now
+        stats = self.stats()
+        logger.info(
+            f"Embedding cache (pid {os.getpid()}): {stats['hits']} hits, "
+            f"{stats['misses']} misses, hit rate {stats['hit_rate']:.1%}"
+        )
+
+
+class _NullBackend:
+    """Backend that never stores anything."""
+
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        return [None] * len(keys)
+
+    def set_many(self, items: Dict[str, bytes]) -> None:
+        pass
+
+
+@lru_cache()
+def get_embedding_cache() -> EmbeddingCache:
+    """Get the process-wide embedding cache configured in settings."""
+    backend_name = settings.embedding_cache_backend
+    if backend_name == "redis":
+        backend = RedisEmbeddingBackend(
+            settings.redis_url,
+            ttl_seconds=settings.embedding_cache_ttl_seconds
+        )
+    elif backend_name == "disk":
+        backend = DiskEmbeddingBackend(
+            settings.embedding_cache_path,
+            ttl_seconds=settings.embedding_cache_ttl_seconds,
+            max_entries=settings.embedding_cache_max_entries
+        )
+    else:
+        backend = _NullBackend()
+    return EmbeddingCache(backend, settings.embedding_model)
@@ -0,0 +1,206 @@
+"""Inverted index over preference hard filters, for pruning rows before scoring."""
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+# Pending entries a bucket accepts before merging them into its sorted run
+MERGE_MIN_PENDING = 256
+
+
+class _Bucket:
+    """Rows sharing one (body style, drivetrain) code pair.
+
+    Rows are kept in a run sorted by budget, so the rows whose budget covers
+    a price are a suffix found by binary search. Additions go to a small
+    unsorted pending set and removals flip a liveness flag; both are folded
+    into the sorted run by ``merge`` once they grow past a fraction of it.
+    """
+
+    def __init__(self):
+        self.budgets = np.empty(0, dtype=np.float64)
+        self.slots = np.empty(0, dtype=np.int64)
+        self.live = np.empty(0, dtype=bool)
+        self.dead = 0
+        self.pending: Dict[int, float] = {}
+        self._pending_arrays: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    def add_pending(self, slot: int, budget: float) -> None:
+        self.pending[slot] = budget
+        self._pending_arrays = None
+
+    def drop_pending(self, slot: int) -> None:
+        del self.pending[slot]
+        self._pending_arrays = None
+
+    def needs_merge(self) -> bool:
+        limit = max(MERGE_MIN_PENDING, len(self.slots) // 4)
+        return len(self.pending) > limit or self.dead > limit
+
+    def merge(self) -> None:
+        """Fold pending rows in and drop dead ones, keeping the run sorted."""
+        pending_slots, pending_budgets = self.pending_arrays()
+        budgets = np.concatenate([self.budgets[self.live], pending_budgets])
+        slots = np.concatenate([self.slots[self.live], pending_slots])
+        order = np.argsort(budgets, kind="stable")
+        self.budgets = budgets[order]
+        self.slots = slots[order]
+        self.live = np.ones(len(slots), dtype=bool)
+        self.dead = 0
+        self.pending = {}
+        self._pending_arrays = None
+
+    def pending_arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        if self._pending_arrays is None:
+            self._pending_arrays = (
+                np.fromiter(self.pending.keys(), dtype=np.int64, count=len(self.pending)),
+                np.fromiter(self.pending.values(), dtype=np.float64, count=len(self.pending))
+            )
+        return self._pending_arrays
+
+    def covering(self, price: Optional[float]) -> List[np.ndarray]:
+        """Live rows whose budget is at least ``price`` (all rows if None)."""
+        start = 0 if price is None else int(np.searchsorted(self.budgets, price, side="left"))
+        parts = [self.slots[start:][self.live[start:]]]
+        if self.pending:
+            pending_slots, pending_budgets = self.pending_arrays()
+            parts.append(pending_slots if price is None else pending_slots[pending_budgets >= price])
+        return parts
+
+
+class PreferenceFilterIndex:
+    """Row index of a PreferenceMatrix keyed by its hard-filter columns.
+
+    Rows are bucketed by (body style code, drivetrain code) and, within a
+    bucket, ordered by budget. A listing then only touches the buckets its
+    body type and drivetrain are compatible with, and only the rows in
+    them that can afford it. Brand exclusions are left to the matrix's
+    per-brand bitmaps.
+
+    Rows are identified by their slot in the matrix. Adds and removes are
+    incremental; ``rebuild`` is only needed when the matrix renumbers rows.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        """Initialize an empty index.
+
+        Args:
+            capacity: Initial number of slots
+        """
+        self._buckets: List[_Bucket] = []
+        self._bucket_ids: Dict[Tuple[int, int], int] = {}
+        self._bucket_of = np.full(capacity, -1, dtype=np.int32)
+        self._position = np.full(capacity, -1, dtype=np.int64)
+
+    def resize(self, capacity: int) -> None:
+        """Make room for slots up to ``capacity``."""
+        extra = capacity - len(self._bucket_of)
+        if extra > 0:
+            self._bucket_of = np.concatenate([self._bucket_of, np.full(extra, -1, dtype=np.int32)])
+            self._position = np.concatenate([self._position, np.full(extra, -1, dtype=np.int64)])
+
+    def add(self, slot: int, body_style: int, drivetrain: int, budget: float) -> None:
+        """Index a row.
+
+        Args:
+            slot: Matrix row
+            body_style: Body style code of the row
+            drivetrain: Drivetrain code of the row
+            budget: Budget of the row (inf for none)
+        """
+        if self._bucket_of[slot] >= 0:
+            self.remove(slot)
+
+        key = (int(body_style), int(drivetrain))
+        bucket_id = self._bucket_ids.get(key)
+        if bucket_id is None:
+            bucket_id = self._bucket_ids[key] = len(self._buckets)
+            self._buckets.append(_Bucket())
+        bucket = self._buckets[bucket_id]
+        bucket.add_pending(slot, float(budget))
+        self._bucket_of[slot] = bucket_id
+        self._position[slot] = -1
+
+        if bucket.needs_merge():
+            self._merge(bucket)
+
+    def remove(self, slot: int) -> None:
+        """Drop a row from the index if present."""
+        bucket_id = self._bucket_of[slot]
+        if bucket_id < 0:
+            return
+        bucket = self._buckets[bucket_id]
+        position = self._position[slot]
+        if position < 0:
+            bucket.drop_pending(slot)
+        else:
+            bucket.live[position] = False
+            bucket.dead += 1
+        self._bucket_of[slot] = -1
+
+        if bucket.needs_merge():
+            self._merge(bucket)
+
+    def rebuild(self, body_styles: np.ndarray, drivetrains: np.ndarray, budgets: np.ndarray) -> None:
+        """Index rows 0..n-1 from scratch, e.g. after the matrix compacts.
+
+        Args:
+            body_styles: Body style code per row
+            drivetrains: Drivetrain code per row
+            budgets: Budget per row
+        """
+        self._buckets = []
+        self._bucket_ids = {}
+        self._bucket_of[:] = -1
+        self._position[:] = -1
+
+        n = len(budgets)
+        if n == 0:
+            return
+        pairs = np.stack([body_styles, drivetrains], axis=1)
+        keys, inverse = np.unique(pairs, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        for bucket_id, (body_style, drivetrain) in enumerate(keys):
+            slots = np.flatnonzero(inverse == bucket_id)
+            bucket = _Bucket()
+            order = np.argsort(budgets[slots], kind="stable")
+            bucket.slots = slots[order].astype(np.int64)
+            bucket.budgets = budgets[bucket.slots].astype(np.float64)
+            bucket.live = np.ones(len(slots), dtype=bool)
+            self._buckets.append(bucket)
+            self._bucket_ids[(int(body_style), int(drivetrain))] = bucket_id
+            self._position[bucket.slots] = np.arange(len(slots))
+        self._bucket_of[:n] = inverse
+
+    def candidates(
+        self,
+        body_styles: Optional[Sequence[int]],
+        drivetrains: Optional[Sequence[int]],
+        price: Optional[float]
+    ) -> np.ndarray:
+        """Rows whose filters a listing can pass, in ascending slot order.
+
+        Args:
+            body_styles: Row body style codes compatible with the listing
+                (None: any)
+            drivetrains: Row drivetrain codes compatible with the listing
+                (None: any)
+            price: Listing price (None: no budget constraint)
+
+        Returns:
+            Sorted array of matrix rows
+        """
+        parts = []
+        for (body_style, drivetrain), bucket_id in self._bucket_ids.items():
+            if body_styles is not None and body_style not in body_styles:
+                continue
+            if drivetrains is not None and drivetrain not in drivetrains:
+                continue
+            parts += self._buckets[bucket_id].covering(price)
+        if not parts:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate(parts))
+
+    def _merge(self, bucket: _Bucket) -> None:
+        bucket.merge()
+        self._position[bucket.slots] = np.arange(len(bucket.slots))
@@ -0,0 +1,42 @@
+"""Hard filters of a CarPreference as SQL over the typed listing columns."""
+from typing import Any, Dict, List
+
+from sqlalchemy import or_
+
+from app.models.schemas import Listing
+
+
+def hard_filter_clauses(car_pref: Dict[str, Any]) -> List[Any]:
+    """SQL counterpart of passes_hard_filters, for pruning listings in the query.
+
+    Reads the indexed columns that ingest copies out of attrs. As in the
+    scalar check, a listing attribute that is unknown (NULL) never rules a
+    listing out.
+
+    Args:
+        car_pref: CarPreference JSON
+
+    Returns:
+        WHERE clauses over Listing columns
+    """
+    clauses = []
+
+    body_style = car_pref.get("body_style")
+    if body_style:
+        clauses.append(or_(
+            Listing.body_type.is_(None), Listing.body_type == body_style.lower()
+        ))
+
+    drivetrain = car_pref.get("drivetrain")
+    if drivetrain:
+        clauses.append(or_(Listing.drivetrain.is_(None), Listing.drivetrain == drivetrain))
+
+    budget = car_pref.get("budget_usd")
+    if budget:
+        clauses.append(or_(Listing.price.is_(None), Listing.price <= budget))
+
+    exclusions = car_pref.get("brand_exclusions")
+    if exclusions:
+        clauses.append(or_(Listing.make.is_(None), Listing.make.notin_(exclusions)))
+
+    return clauses
@@ -0,0 +1,287 @@
+"""Keep a worker-local PreferenceMatrix in sync with the preferences table."""
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.matching.ann import IndexedPreferenceMatrix, IVFIndex
+from app.matching.change_feed import PreferenceChangeFeed
+from app.matching.matrix import PreferenceMatrix
+from app.models.schemas import Preference
+
+
+logger = logging.getLogger(__name__)
+
+# Rows fetched per IN query when loading new preferences
+LOAD_CHUNK_SIZE = 1000
+
+# Re-read changes this far behind the watermark, for transactions that
+# committed after a later updated_at had already been seen
+WATERMARK_OVERLAP = timedelta(seconds=5)
+
+
+@dataclass
+class MatrixSyncState:
+    """How far a worker's matrix has caught up with the preferences table."""
+    watermark: Optional[datetime] = None  # Highest updated_at applied
+    versions: Dict[str, datetime] = field(default_factory=dict)  # updated_at of each loaded row
+    last_full_sync: float = float("-inf")
+    last_poll: float = float("-inf")
+    feed: Optional[PreferenceChangeFeed] = None
+
+
+_matrix: Optional[PreferenceMatrix] = None
+_state: Optional[MatrixSyncState] = None
+_index_snapshot: Optional[int] = None
+
+
+def get_preference_matrix(db: Session) -> PreferenceMatrix:
+    """Get the process-wide preference matrix, refreshed against the database.
+
+    The table is fully reconciled every PREFERENCE_RESYNC_SECONDS. In
+    between, only preferences whose ``updated_at`` passed the watermark are
+    re-read, and only when the change stream announced something (or,
+    without Redis, on every call) or PREFERENCE_POLL_SECONDS have passed.
+
+    With an ANN index the worker only reads the snapshot on disk (written
+    by the rebuild_ann_index beat task); at a full reconcile it switches to
+    a newer snapshot if one was saved.
+
+    Args:
+        db: Database session
+
+    Returns:
+        Up-to-date preference matrix
+    """
+    global _matrix, _state
+    now = time.monotonic()
+    resync = _state is None or now - _state.last_full_sync >= settings.preference_resync_seconds
+    if _matrix is None or (resync and index_snapshot() != _index_snapshot):
+        _matrix = create_preference_matrix()
+        _state = MatrixSyncState(feed=_state.feed if _state else _connect_feed())
+
+    if resync:
+        refresh_preference_matrix(db, _matrix, _state)
+    else:
+        announced = _state.feed.poll() if _state.feed else None
+        if announced is not False or now - _state.last_poll >= settings.preference_poll_seconds:
+            apply_preference_changes(db, _matrix, _state)
+
+    return _matrix
+
+
+def create_preference_matrix() -> PreferenceMatrix:
+    """Create an empty matrix, backed by the on-disk ANN index if configured.
+
+    Returns:
+        IndexedPreferenceMatrix when ANN_INDEX_PATH is set, else a brute-force
+        PreferenceMatrix
+    """
+    global _index_snapshot
+    path = settings.ann_index_path
+    if not path:
+        return PreferenceMatrix(quantized=settings.matching_quantized)
+
+    _index_snapshot = index_snapshot()
+    if _index_snapshot is not None:
+        index = IVFIndex.load(path)
+        logger.info(f"Loaded ANN index with {len(index)} preferences from {path}")
+    else:
+        index = IVFIndex(1536, n_lists=settings.ann_n_lists, nprobe=settings.ann_nprobe)
+    return IndexedPreferenceMatrix(index)
+
+
+def index_snapshot() -> Optional[int]:
+    """Identifies the ANN index snapshot on disk (its save time), or None if there is none."""
+    if not settings.ann_index_path:
+        return None
+    try:
+        return os.stat(os.path.join(settings.ann_index_path, "meta.json")).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def update_ann_index(db: Session) -> int:
+    """Bring the ANN index on disk up to date with the preferences table.
+
+    Loads the current snapshot, reconciles it like a worker would (only
+    new and re-embedded preferences are read in full) and saves it if
+    anything changed. The rebuild_ann_index beat task is the only caller,
+    so there is a single writer; workers just load the result.
+
+    Args:
+        db: Database session
+
+    Returns:
+        Number of preferences in the index
+    """
+    matrix = create_preference_matrix()
+    refresh_preference_matrix(db, matrix)
+    index = matrix.index
+    if index.dirty:
+        index.save(settings.ann_index_path)
+        logger.info(f"Saved ANN index with {len(index)} preferences to {settings.ann_index_path}")
+    return len(index)
+
+
+def _index_version(updated_at: Optional[datetime]) -> Optional[str]:
+    """Version stored with a preference's vector in the ANN index."""
+    return updated_at.isoformat() if updated_at else None
+
+
+def _connect_feed() -> Optional[PreferenceChangeFeed]:
+    """Subscribe to the change stream, or None to poll the watermark instead."""
+    if not settings.preference_change_stream:
+        return None
+    try:
+        return PreferenceChangeFeed()
+    except Exception as e:
+        logger.warning(f"Preference change feed disabled: {e}")
+        return None
+
+
+def refresh_preference_matrix(
+    db: Session,
+    matrix: PreferenceMatrix,
+    state: Optional[MatrixSyncState] = None
+) -> None:
+    """Reconcile a matrix with every active preference.
+
+    Only the IDs and versions of active preferences are read; full rows
+    (including embeddings) are loaded for preferences the matrix has not
+    seen or that changed since they were loaded. Also catches deleted rows,
+    which the watermark cannot see.
+
+    Args:
+        db: Database session
+        matrix: Matrix to update in place
+        state: Sync state to advance; a fresh one if omitted
+    """
+    state = state or MatrixSyncState()
+    watermark = db.query(func.max(Preference.updated_at)).scalar()
+
+    active = dict(
+        db.query(Preference.id, Preference.updated_at).filter(
+            Preference.is_active.is_(True),
+            Preference.embedding.isnot(None)
+        )
+    )
+
+    for preference_id in set(matrix.ids) - set(active):
+        matrix.remove(preference_id)
+        state.versions.pop(preference_id, None)
+
+    added = [preference_id for preference_id in active if preference_id not in matrix]
+    changed = [
+        preference_id for preference_id in active
+        if preference_id in matrix and state.versions.get(preference_id) != active[preference_id]
+    ]
+
+    # Embeddings already persisted in the ANN index need not be read again,
+    # unless the preference was re-embedded since they were saved
+    indexed = set()
+    if isinstance(matrix, IndexedPreferenceMatrix):
+        matrix.index.remove(set(matrix.index.ids) - set(active))
+        indexed = {
+            preference_id for preference_id in added
+            if matrix.index.versions.get(preference_id) == _index_version(active[preference_id])
+        }
+
+    _load_preferences(db, matrix, added, indexed)
+    _load_preferences(db, matrix, changed)
+    state.versions.update(active)
+
+    state.watermark = watermark
+    state.last_full_sync = state.last_poll = time.monotonic()
+    if added or changed:
+        logger.info(
+            f"Loaded {len(added)} new and {len(changed)} changed preferences into matcher "
+            f"({len(matrix)} active)"
+        )
+
+
+def apply_preference_changes(db: Session, matrix: PreferenceMatrix, state: MatrixSyncState) -> None:
+    """Apply preferences updated since the watermark to a matrix.
+
+    Args:
+        db: Database session
+        matrix: Matrix to update in place
+        state: Sync state of the matrix, advanced in place
+    """
+    if state.watermark is None:
+        refresh_preference_matrix(db, matrix, state)
+        return
+
+    rows = db.query(
+        Preference.id,
+        Preference.updated_at,
+        Preference.is_active,
+        Preference.embedding.isnot(None)
+    ).filter(Preference.updated_at >= state.watermark - WATERMARK_OVERLAP).all()
+    state.last_poll = time.monotonic()
+
+    changed = {}
+    removed = 0
+    for preference_id, updated_at, is_active, embedded in rows:
+        state.watermark = max(state.watermark, updated_at)
+        if not (is_active and embedded):
+            if preference_id in matrix:
+                matrix.remove(preference_id)
+                removed += 1
+            state.versions.pop(preference_id, None)
+        elif preference_id not in matrix or state.versions.get(preference_id) != updated_at:
+            changed[preference_id] = updated_at
+
+    _load_preferences(db, matrix, list(changed))
+    state.versions.update(changed)
+    if changed or removed:
+        logger.info(
+            f"Applied {len(changed)} updated and {removed} removed preferences to matcher "
+            f"({len(matrix)} active)"
+        )
+
+
+def _load_preferences(
+    db: Session,
+    matrix: PreferenceMatrix,
+    preference_ids: List[str],
+    indexed: Iterable[str] = ()
+) -> None:
+    """Add (or replace) preferences in a matrix, in chunks.
+
+    Args:
+        db: Database session
+        matrix: Matrix to update in place
+        preference_ids: Preferences to load
+        indexed: Subset whose embedding the matrix's ANN index already holds
+    """
+    indexed = set(indexed)
+    for start in range(0, len(preference_ids), LOAD_CHUNK_SIZE):
+        chunk = preference_ids[start:start + LOAD_CHUNK_SIZE]
+
+        cached = [preference_id for preference_id in chunk if preference_id in indexed]
+        if cached:
+            rows = db.query(Preference.id, Preference.car_pref).filter(Preference.id.in_(cached))
+            for preference_id, car_pref in rows:
+                matrix.add(preference_id, car_pref)
+
+        missing = [preference_id for preference_id in chunk if preference_id not in indexed]
+        if missing:
+            preferences = db.query(Preference).filter(Preference.id.in_(missing)).all()
+            for preference in preferences:
+                options = {}
+                if isinstance(matrix, IndexedPreferenceMatrix):
+                    options["version"] = _index_version(preference.updated_at)
+                matrix.add(
+                    preference.id,
+                    preference.car_pref,
+                    preference.embedding,
+                    normalized=preference.embedding_norm is not None,
+                    **options
+                )
@@ -0,0 +1,510 @@
+"""In-memory preference matrix for vectorized listing matching."""
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.matching.filter_index import PreferenceFilterIndex
+from app.models.types import quantize_int8
+
+
+logger = logging.getLogger(__name__)
+
+# Cosine similarity a preference must exceed to produce an alert
+DEFAULT_THRESHOLD = 0.8
+
+# Category code reserved for "no constraint"
+_UNSET = 0
+
+# Rows widened from int8 to float32 at a time when scoring quantized rows
+QUANTIZED_BLOCK_ROWS = 4096
+
+# Slack on the quantization error bound for float32 rounding in the scan
+_BOUND_EPSILON = 1e-5
+
+
+def normalize_embedding(embedding: Sequence[float]) -> Tuple[np.ndarray, float]:
+    """Scale an embedding to unit length.
+
+    Embeddings are stored normalized, with the original norm kept alongside,
+    so cosine similarity against them is a plain dot product.
+
+    Args:
+        embedding: Embedding vector
+
+    Returns:
+        (unit vector, original norm); zero vectors are returned unchanged
+    """
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = float(np.linalg.norm(vector))
+    if norm > 0:
+        vector = vector / norm
+    return vector, norm
+
+
+def passes_hard_filters(car_pref: Dict[str, Any], listing_attrs: Dict[str, Any]) -> bool:
+    """Check a single preference's hard filters against a listing.
+
+    Scalar counterpart of PreferenceMatrix.filter_mask, for candidates that
+    come from somewhere other than the matrix (e.g. an index query).
+
+    Args:
+        car_pref: CarPreference JSON
+        listing_attrs: Listing attributes
+
+    Returns:
+        True if no hard filter rules the listing out
+    """
+    body_style = car_pref.get("body_style")
+    body_type = listing_attrs.get("body_type")
+    if body_style and body_type and body_style.lower() != body_type.lower():
+        return False
+
+    drivetrain = car_pref.get("drivetrain")
+    if drivetrain and listing_attrs.get("drivetrain") and drivetrain != listing_attrs["drivetrain"]:
+        return False
+
+    budget = car_pref.get("budget_usd")
+    if budget and listing_attrs.get("price") and listing_attrs["price"] > budget:
+        return False
+
+    make = listing_attrs.get("make")
+    if make and make in (car_pref.get("brand_exclusions") or []):
+        return False
+
+    return True
+
+
+class PreferenceMatrix:
+    """Active preference embeddings held in one contiguous float32 matrix.
+
+    Rows are normalized when they are added, so scoring a listing is a single
+    matrix-vector product. The hard filters (body style, drivetrain, budget
+    and brand exclusions) are kept in parallel arrays and indexed by a
+    PreferenceFilterIndex, so a listing is only scored against the rows
+    whose filters it can pass. Rows are added and removed in place; removed
+    rows leave a hole that is reclaimed by periodic compaction.
+
+    With ``quantized=True`` an int8 copy of every row is kept as well. Scoring
+    then scans the int8 rows, keeps the rows whose score could still exceed
+    the threshold given their quantization error, and re-scores only those
+    against the float32 rows, so the threshold decision stays exact.
+    """
+
+    # Subclasses that keep vectors elsewhere (e.g. an ANN index) set this off
+    STORES_VECTORS = True
+
+    def __init__(self, dim: int = 1536, capacity: int = 1024, quantized: bool = False):
+        """Initialize an empty matrix.
+
+        Args:
+            dim: Embedding dimension
+            capacity: Initial number of preallocated rows
+            quantized: Pre-score candidates with int8-quantized rows
+        """
+        self.dim = dim
+        self.quantized = quantized and self.STORES_VECTORS
+        self._size = 0
+        self._ids: List[Optional[str]] = []
+        self._slots: Dict[str, int] = {}
+        self._vectors = np.zeros((capacity, dim if self.STORES_VECTORS else 0), dtype=np.float32)
+        self._codes = np.zeros((capacity, dim if self.quantized else 0), dtype=np.int8)
+        self._scales = np.zeros(capacity, dtype=np.float32)
+        self._errors = np.zeros(capacity, dtype=np.float32)
+        self._active = np.zeros(capacity, dtype=bool)
+        self._body_style = np.zeros(capacity, dtype=np.int32)
+        self._drivetrain = np.zeros(capacity, dtype=np.int32)
+        self._budget = np.full(capacity, np.inf, dtype=np.float64)
+        self._brand_exclusions: Dict[str, np.ndarray] = {}
+        self._body_style_codes: Dict[str, int] = {}
+        self._drivetrain_codes: Dict[str, int] = {}
+        self._filter_index = PreferenceFilterIndex(capacity)
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, preference_id: str) -> bool:
+        return preference_id in self._slots
+
+    @property
+    def ids(self) -> List[str]:
+        """IDs of all preferences currently held."""
+        return list(self._slots)
+
+    def add(
+        self,
+        preference_id: str,
+        car_pref: Dict[str, Any],
+        embedding: Sequence[float],
+        normalized: bool = False
+    ) -> None:
+        """Add or replace a preference.
+
+        Args:
+            preference_id: Preference ID
+            car_pref: CarPreference JSON
+            embedding: Preference embedding vector
+            normalized: Embedding is already unit length (or zero)
+        """
+        vector = np.asarray(embedding, dtype=np.float32)
+        if vector.shape != (self.dim,):
+            logger.warning(f"Skipping preference {preference_id}: bad embedding shape {vector.shape}")
+            return
+
+        if not normalized:
+            vector, _ = normalize_embedding(vector)
+
+        slot = self._add_row(preference_id, car_pref)
+        self._vectors[slot] = vector
+
+        if self.quantized:
+            codes, scale = quantize_int8(vector)
+            self._codes[slot] = codes
+            self._scales[slot] = scale
+            # Cauchy-Schwarz: |approx - exact| <= ||residual|| for a unit query
+            self._errors[slot] = np.linalg.norm(vector - codes * np.float32(scale))
+
+    def remove(self, preference_id: str) -> None:
+        """Remove a preference if present.
+
+        Args:
+            preference_id: Preference ID
+        """
+        slot = self._slots.pop(preference_id, None)
+        if slot is None:
+            return
+
+        self._ids[slot] = None
+        self._active[slot] = False
+        self._filter_index.remove(slot)
+        for mask in self._brand_exclusions.values():
+            mask[slot] = False
+
+        # Reclaim holes once they make up more than half of the used rows
+        if self._size > 1024 and len(self._slots) < self._size // 2:
+            self._compact()
+
+    def filter_mask(self, listing_attrs: Dict[str, Any]) -> np.ndarray:
+        """Evaluate the hard filters for a listing against every row.
+
+        Args:
+            listing_attrs: Listing attributes
+
+        Returns:
+            Boolean mask over the used rows
+        """
+        n = self._size
+        mask = self._active[:n].copy()
+
+        body_type = listing_attrs.get("body_type")
+        if body_type:
+            code = self._body_style_codes.get(body_type.lower())
+            codes = self._body_style[:n]
+            mask &= (codes == _UNSET) | (codes == code) if code else codes == _UNSET
+
+        drivetrain = listing_attrs.get("drivetrain")
+        if drivetrain:
+            code = self._drivetrain_codes.get(drivetrain)
+            codes = self._drivetrain[:n]
+            mask &= (codes == _UNSET) | (codes == code) if code else codes == _UNSET
+
+        price = listing_attrs.get("price")
+        if price:
+            mask &= self._budget[:n] >= price
+
+        make = listing_attrs.get("make")
+        if make and make in self._brand_exclusions:
+            mask &= ~self._brand_exclusions[make][:n]
+
+        return mask
+
+    def candidates(self, listing_attrs: Dict[str, Any]) -> np.ndarray:
+        """Rows whose hard filters a listing passes, via the filter index.
+
+        Same rows as ``np.flatnonzero(filter_mask(listing_attrs))``, without
+        evaluating every row.
+
+        Args:
+            listing_attrs: Listing attributes
+
+        Returns:
+            Sorted array of row indexes
+        """
+        body_styles = drivetrains = None
+
+        body_type = listing_attrs.get("body_type")
+        if body_type:
+            code = self._body_style_codes.get(body_type.lower())
+            body_styles = (_UNSET, code) if code else (_UNSET,)
+
+        drivetrain = listing_attrs.get("drivetrain")
+        if drivetrain:
+            code = self._drivetrain_codes.get(drivetrain)
+            drivetrains = (_UNSET, code) if code else (_UNSET,)
+
+        rows = self._filter_index.candidates(
+            body_styles, drivetrains, listing_attrs.get("price") or None
+        )
+
+        make = listing_attrs.get("make")
+        if make and make in self._brand_exclusions and len(rows):
+            rows = rows[~self._brand_exclusions[make][rows]]
+
+        return rows
+
+    def match(
+        self,
+        listing_attrs: Dict[str, Any],
+        embedding: Sequence[float],
+        threshold: float = DEFAULT_THRESHOLD
+    ) -> List[Tuple[str, float]]:
+        """Find preferences matching a listing.
+
+        Args:
+            listing_attrs: Listing attributes
+            embedding: Listing embedding vector
+            threshold: Minimum cosine similarity for a match
+
+        Returns:
+            List of (preference_id, similarity_score) tuples, best first
+        """
+        if not self._slots or embedding is None or len(embedding) == 0:
+            return []
+
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return []
+
+        query = query / norm
+        rows = self.candidates(listing_attrs)
+        if self.quantized and len(rows):
+            bounds = self._approximate_scores(rows, query[None, :])[:, 0] + self._errors[rows]
+            rows = rows[bounds > threshold - _BOUND_EPSILON]
+
+        return self._rank(rows, query, threshold)
+
+    def match_delta(
+        self,
+        old_attrs: Dict[str, Any],
+        new_attrs: Dict[str, Any],
+        embedding: Sequence[float],
+        threshold: float = DEFAULT_THRESHOLD
+    ) -> List[Tuple[str, float]]:
+        """Find preferences a changed listing matches now but was filtered out of before.
+
+        Only the rows whose hard filters the new attributes pass and the old
+        ones did not are scored, so a price change re-evaluates a handful of
+        budgets rather than the whole matrix.
+
+        Args:
+            old_attrs: Listing attributes before the change
+            new_attrs: Listing attributes after the change
+            embedding: Listing embedding vector (unchanged)
+            threshold: Minimum cosine similarity for a match
+
+        Returns:
+            List of (preference_id, similarity_score) tuples, best first
+        """
+        if not self._slots or embedding is None or len(embedding) == 0:
+            return []
+
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return []
+
+        query = query / norm
+        rows = np.setdiff1d(
+            self.candidates(new_attrs), self.candidates(old_attrs), assume_unique=True
+        )
+        if self.quantized and len(rows):
+            bounds = self._approximate_scores(rows, query[None, :])[:, 0] + self._errors[rows]
+            rows = rows[bounds > threshold - _BOUND_EPSILON]
+
+        return self._rank(rows, query, threshold)
+
+    def match_many(
+        self,
+        listings_attrs: Sequence[Dict[str, Any]],
+        embeddings: Sequence[Sequence[float]],
+        threshold: float = DEFAULT_THRESHOLD
+    ) -> List[List[Tuple[str, float]]]:
+        """Find matching preferences for a batch of listings.
+
+        The rows any listing's hard filters let through are scored against
+        all listings with one matrix-matrix product.
+
+        Args:
+            listings_attrs: Attributes of each listing
+            embeddings: Embedding of each listing
+            threshold: Minimum cosine similarity for a match
+
+        Returns:
+            One list of (preference_id, similarity_score) tuples per listing
+        """
+        results: List[List[Tuple[str, float]]] = [[] for _ in listings_attrs]
+        if not self._slots or not len(embeddings):
+            return results
+
+        queries = np.array(embeddings, dtype=np.float32).reshape(len(embeddings), self.dim)
+        norms = np.linalg.norm(queries, axis=1)
+        valid = norms > 0
+        queries[valid] /= norms[valid, None]
+
+        # Only rows that at least one listing's filters let through are scored
+        candidates = [
+            self.candidates(attrs) if valid[j] else np.empty(0, dtype=np.int64)
+            for j, attrs in enumerate(listings_attrs)
+        ]
+        union = np.unique(np.concatenate(candidates))
+        if not len(union):
+            return results
+
+        # (candidate rows, listings) block of scores, or of score upper bounds
+        # when the rows are quantized
+        if self.quantized:
+            scores = self._approximate_scores(union, queries) + self._errors[union, None]
+            cutoff = threshold - _BOUND_EPSILON
+        else:
+            scores = self._vectors[union] @ queries.T
+            cutoff = threshold
+
+        for j, rows in enumerate(candidates):
+            if not len(rows):
+                continue
+            positions = np.searchsorted(union, rows)
+            column = scores[positions, j]
+            hits = column > cutoff
+            rows, column = rows[hits], column[hits]
+            if self.quantized:
+                results[j] = self._rank(rows, queries[j], threshold)
+            else:
+                order = np.argsort(-column, kind="stable")
+                results[j] = [(self._ids[rows[i]], float(column[i])) for i in order]
+
+        return results
+
+    def _rank(
+        self,
+        rows: np.ndarray,
+        query: np.ndarray,
+        threshold: float
+    ) -> List[Tuple[str, float]]:
+        """Score rows exactly against a unit query and keep those above threshold."""
+        if not len(rows):
+            return []
+
+        scores = self._vectors[rows] @ query
+        hits = scores > threshold
+        rows, scores = rows[hits], scores[hits]
+
+        order = np.argsort(-scores, kind="stable")
+        return [(self._ids[rows[i]], float(scores[i])) for i in order]
+
+    def _approximate_scores(self, rows: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        """Dot products of int8 rows with unit queries.
+
+        Returns:
+            (len(rows), len(queries)) float32 scores
+        """
+        scores = np.empty((len(rows), len(queries)), dtype=np.float32)
+        for start in range(0, len(rows), QUANTIZED_BLOCK_ROWS):
+            block = rows[start:start + QUANTIZED_BLOCK_ROWS]
+            widened = self._codes[block].astype(np.float32)
+            scores[start:start + len(block)] = (widened @ queries.T) * self._scales[block, None]
+        return scores
+
+    def _add_row(self, preference_id: str, car_pref: Dict[str, Any]) -> int:
+        """Claim a row for a preference and fill in its filter columns.
+
+        Returns:
+            Row index
+        """
+        if preference_id in self._slots:
+            PreferenceMatrix.remove(self, preference_id)
+
+        if self._size == len(self._active):
+            self._grow()
+
+        slot = self._size
+        self._size += 1
+        self._ids.append(preference_id)
+        self._slots[preference_id] = slot
+        self._active[slot] = True
+
+        body_style = car_pref.get("body_style")
+        self._body_style[slot] = (
+            self._code(self._body_style_codes, body_style.lower()) if body_style else _UNSET
+        )
+        drivetrain = car_pref.get("drivetrain")
+        self._drivetrain[slot] = (
+            self._code(self._drivetrain_codes, drivetrain) if drivetrain else _UNSET
+        )
+        budget = car_pref.get("budget_usd")
+        self._budget[slot] = budget if budget else np.inf
+        self._filter_index.add(
+            slot, self._body_style[slot], self._drivetrain[slot], self._budget[slot]
+        )
+
+        for brand in car_pref.get("brand_exclusions") or []:
+            mask = self._brand_exclusions.get(brand)
+            if mask is None:
+                mask = np.zeros(len(self._active), dtype=bool)
+                self._brand_exclusions[brand] = mask
+            mask[slot] = True
+
+        return slot
+
+    @staticmethod
+    def _code(codes: Dict[str, int], value: str) -> int:
+        """Get or assign the category code for a value."""
+        code = codes.get(value)
+        if code is None:
+            code = len(codes) + 1
+            codes[value] = code
+        return code
+
+    def _grow(self) -> None:
+        """Double the preallocated capacity."""
+        capacity = max(2 * len(self._active), 1024)
+        extra = capacity - len(self._active)
+
+        self._vectors = np.concatenate(
+            [self._vectors, np.zeros((extra, self._vectors.shape[1]), dtype=np.float32)]
+        )
+        self._codes = np.concatenate(
+            [self._codes, np.zeros((extra, self._codes.shape[1]), dtype=np.int8)]
+        )
+        self._scales = np.concatenate([self._scales, np.zeros(extra, dtype=np.float32)])
+        self._errors = np.concatenate([self._errors, np.zeros(extra, dtype=np.float32)])
+        self._active = np.concatenate([self._active, np.zeros(extra, dtype=bool)])
+        self._body_style = np.concatenate([self._body_style, np.zeros(extra, dtype=np.int32)])
+        self._drivetrain = np.concatenate([self._drivetrain, np.zeros(extra, dtype=np.int32)])
+        self._budget = np.concatenate([self._budget, np.full(extra, np.inf)])
+        for brand, mask in self._brand_exclusions.items():
+            self._brand_exclusions[brand] = np.concatenate([mask, np.zeros(extra, dtype=bool)])
+        self._filter_index.resize(capacity)
+
+    def _compact(self) -> None:
+        """Move live rows to the front and drop the holes."""
+        keep = np.flatnonzero(self._active[:self._size])
+        n = len(keep)
+
+        self._vectors[:n] = self._vectors[keep]
+        self._codes[:n] = self._codes[keep]
+        self._scales[:n] = self._scales[keep]
+        self._errors[:n] = self._errors[keep]
+        self._body_style[:n] = self._body_style[keep]
+        self._drivetrain[:n] = self._drivetrain[keep]
+        self._budget[:n] = self._budget[keep]
+        self._active[:n] = True
+        self._active[n:] = False
+        for mask in self._brand_exclusions.values():
+            mask[:n] = mask[keep]
+            mask[n:] = False
+
+        self._ids = [self._ids[slot] for slot in keep]
+        self._slots = {preference_id: i for i, preference_id in enumerate(self._ids)}
+        self._size = n
+        self._filter_index.rebuild(self._body_style[:n], self._drivetrain[:n], self._budget[:n])
@@ -0,0 +1,98 @@
+"""Re-match listings whose hard-filter fields changed on a later ingest."""
+import logging
+from datetime import datetime
+from typing import Any, Dict, List
+from uuid import uuid4
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.alerts.counters import record_new_alerts
+from app.ingest.upsert import HARD_FILTER_COLUMNS
+from app.matching.matrix import DEFAULT_THRESHOLD, PreferenceMatrix
+from app.models.schemas import Alert, AlertType, Listing
+
+
+logger = logging.getLogger(__name__)
+
+
+def filter_attrs(listing: Listing) -> Dict[str, Any]:
+    """Current hard-filter values of a listing, from its typed columns."""
+    return {column: getattr(listing, column) for column in HARD_FILTER_COLUMNS}
+
+
+def change_alert_type(old_attrs: Dict[str, Any], new_attrs: Dict[str, Any]) -> AlertType:
+    """Alert type for preferences a change let a listing into."""
+    old_price, new_price = old_attrs.get("price"), new_attrs.get("price")
+    if old_price and new_price and new_price < old_price:
+        return AlertType.PRICE_DROP
+    return AlertType.MATCH
+
+
+def rematch_changed_listings(
+    db: Session,
+    matrix: PreferenceMatrix,
+    changes: Dict[str, Dict[str, Any]],
+    threshold: float = DEFAULT_THRESHOLD
+) -> List[str]:
+    """Alert preferences that changed listings now pass the hard filters of.
+
+    Each listing is only scored against the preferences its previous
+    filter values ruled out and its current ones do not (see
+    PreferenceMatrix.match_delta), with its stored embedding. Listings
+    that are not enriched yet are skipped: enrichment matches them with
+    their current values anyway. A preference gets at most one alert of
+    each type per listing. The caller commits.
+
+    Args:
+        db: Database session
+        matrix: Preference matrix
+        changes: VIN -> hard-filter values before the change (UpsertResult.filter_changes)
+        threshold: Minimum cosine similarity for a match
+
+    Returns:
+        IDs of the created alerts
+    """
+    if not changes:
+        return []
+
+    listings = db.query(Listing).filter(
+        Listing.vin.in_(list(changes)),
+        Listing.embedding.isnot(None),
+        Listing.expired_at.is_(None)
+    ).all()
+
+    candidates = []
+    for listing in listings:
+        new_attrs = filter_attrs(listing)
+        old_attrs = changes[listing.vin]
+        alert_type = change_alert_type(old_attrs, new_attrs)
+        for preference_id, score in matrix.match_delta(old_attrs, new_attrs, listing.embedding, threshold):
+            candidates.append((preference_id, listing.vin, alert_type.value, score))
+    if not candidates:
+        return []
+
+    existing = set(
+        db.query(Alert.preference_id, Alert.vin, Alert.alert_type).filter(
+            Alert.vin.in_({vin for _, vin, _, _ in candidates})
+        ).all()
+    )
+    now = datetime.utcnow()
+    rows = [
+        {
+            "id": str(uuid4()),
+            "preference_id": preference_id,
+            "vin": vin,
+            "alert_type": alert_type,
+            "similarity_score": score,
+            "created_at": now
+        }
+        for preference_id, vin, alert_type, score in candidates
+        if (preference_id, vin, alert_type) not in existing
+    ]
+    if rows:
+        db.execute(insert(Alert), rows)
+        record_new_alerts(db, [row["preference_id"] for row in rows], now)
+
+    logger.info(f"Re-matched {len(listings)} changed listings: {len(rows)} new alerts")
+    return [row["id"] for row in rows]
@@ -0,0 +1,184 @@
+"""Indexed nearest-neighbour queries over pgvector embedding columns."""
+import logging
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Float, Select, and_, select, text
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.matching.matrix import DEFAULT_THRESHOLD, passes_hard_filters
+from app.models.schemas import Listing, Preference
+from app.models.types import uses_vector
+
+
+logger = logging.getLogger(__name__)
+
+# pgvector's upper bound on hnsw.ef_search, and so on the rows one HNSW scan returns
+HNSW_MAX_EF_SEARCH = 1000
+
+
+def supports_vector_search(db: Session) -> bool:
+    """Whether the session's backend stores embeddings as indexed vectors."""
+    return uses_vector(db.get_bind().dialect)
+
+
+def cosine_distance(column, embedding: Sequence[float]):
+    """pgvector cosine distance (``<=>``) between a column and an embedding."""
+    return column.op("<=>", return_type=Float)(embedding)
+
+
+def _set_ef_search(db: Session, limit: int) -> None:
+    """Widen the HNSW candidate list so LIMIT k can actually return k rows."""
+    db.execute(text(f"SET LOCAL hnsw.ef_search = {min(max(int(limit), 40), HNSW_MAX_EF_SEARCH)}"))
+
+
+def _nearest_rows(
+    db: Session,
+    query: Select,
+    distance: Any,
+    accept: Callable[[Any], bool],
+    limit: Optional[int] = None
+) -> List[Any]:
+    """Rows of a threshold-filtered query, nearest first, that pass ``accept``.
+
+    Pages through the HNSW index with a growing LIMIT until a page comes
+    back short (every row over the threshold has been seen) or ``limit``
+    rows are accepted. An HNSW scan returns at most ``hnsw.ef_search``
+    rows, so past HNSW_MAX_EF_SEARCH candidates the query is run
+    unordered instead, which the index cannot serve: an exact scan.
+
+    Args:
+        db: Database session (Postgres)
+        query: SELECT with a ``distance`` column, filtered to the threshold
+        distance: Distance expression to order by
+        accept: Check rows must pass, e.g. hard filters not expressible in SQL
+        limit: Maximum number of rows to return; None returns every row
+
+    Returns:
+        Accepted rows, nearest first
+    """
+    page = max(settings.vector_search_limit, 1)
+    while page <= HNSW_MAX_EF_SEARCH:
+        _set_ef_search(db, page)
+        rows = db.execute(query.order_by(distance).limit(page)).all()
+        accepted = [row for row in rows if accept(row)]
+        if len(rows) < page or (limit is not None and len(accepted) >= limit):
+            return accepted[:limit]
+        page *= 2
+
+    logger.info(f"More than {HNSW_MAX_EF_SEARCH} candidates over the threshold; scanning exactly")
+    rows = sorted(db.execute(query).all(), key=lambda row: row.distance)
+    return [row for row in rows if accept(row)][:limit]
+
+
+def nearest_preferences(
+    db: Session,
+    embedding: Sequence[float],
+    threshold: float = DEFAULT_THRESHOLD,
+    accept: Callable[[Any], bool] = lambda row: True
+) -> List[Tuple[str, Dict[str, Any], float]]:
+    """Find every active preference within the threshold of an embedding.
+
+    Runs ``ORDER BY embedding <=> :q LIMIT k`` against the HNSW index,
+    growing k until all preferences over the threshold are returned.
+
+    Args:
+        db: Database session (Postgres)
+        embedding: Query embedding
+        threshold: Minimum cosine similarity
+        accept: Check candidate rows (id, car_pref, distance) must pass
+
+    Returns:
+        List of (preference_id, car_pref, similarity_score), best first
+    """
+    distance = cosine_distance(Preference.embedding, embedding)
+
+    rows = _nearest_rows(
+        db,
+        select(Preference.id, Preference.car_pref, distance.label("distance"))
+        .where(
+            and_(
+                Preference.is_active.is_(True),
+                Preference.embedding.isnot(None),
+                distance < 1 - threshold
+            )
+        ),
+        distance,
+        accept
+    )
+
+    return [(row.id, row.car_pref, 1 - row.distance) for row in rows]
+
+
+def find_matching_preferences_indexed(
+    db: Session,
+    listing_attrs: Dict[str, Any],
+    embedding: Sequence[float],
+    threshold: float = DEFAULT_THRESHOLD
+) -> List[Tuple[str, float]]:
+    """Match a listing against preferences through the vector index.
+
+    Returns every preference over the threshold that passes the hard
+    filters, like PreferenceMatrix.match, up to the recall of the HNSW
+    index itself.
+
+    Args:
+        db: Database session (Postgres)
+        listing_attrs: Listing attributes
+        embedding: Listing embedding
+        threshold: Minimum cosine similarity for a match
+
+    Returns:
+        List of (preference_id, similarity_score) tuples, best first
+    """
+    candidates = nearest_preferences(
+        db, embedding, threshold,
+        accept=lambda row: passes_hard_filters(row.car_pref, listing_attrs)
+    )
+    return [
+        (preference_id, similarity)
+        for preference_id, _, similarity in candidates
+        if similarity > threshold
+    ]
+
+
+def listings_similar_to_preference(
+    db: Session,
+    embedding: Sequence[float],
+    limit: int,
+    threshold: float = DEFAULT_THRESHOLD,
+    filters: Sequence[Any] = (),
+    accept: Callable[[Any], bool] = lambda row: True
+) -> List[Tuple[str, Dict[str, Any], float]]:
+    """Find the enriched listings closest to a preference embedding.
+
+    Args:
+        db: Database session (Postgres)
+        embedding: Preference embedding
+        limit: Maximum number of listings to return
+        threshold: Minimum cosine similarity
+        filters: Extra WHERE clauses, e.g. hard_filter_clauses(car_pref)
+        accept: Check candidate rows (vin, attrs, distance) must pass
+
+    Returns:
+        List of (vin, attrs, similarity_score), best first
+    """
+    distance = cosine_distance(Listing.embedding, embedding)
+
+    rows = _nearest_rows(
+        db,
+        select(Listing.vin, Listing.attrs, distance.label("distance"))
+        .where(
+            and_(
+                Listing.embedding.isnot(None),
+                Listing.expired_at.is_(None),
+                distance < 1 - threshold,
+                *filters
+            )
+        ),
+        distance,
+        accept,
+        limit
+    )
+
+    return [(row.vin, row.attrs, 1 - row.distance) for row in rows]
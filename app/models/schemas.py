@@ -3,16 +3,18 @@ from datetime import datetime
 from typing import Optional, Any
 from uuid import uuid4
 from sqlalchemy import (
-    Column, String, Text, Boolean, Integer, Float, DateTime, JSON,
+    Column, String, Text, Boolean, Integer, Float, Date, DateTime, JSON, LargeBinary,
     ForeignKey, UniqueConstraint, Index, text
 )
-# For SQLite compatibility, we'll use String for UUID and JSON for VECTOR
+# For SQLite compatibility, we'll use String for UUID; Embedding falls back to a binary blob
 import uuid
 from sqlalchemy.orm import relationship
 from pydantic import BaseModel, Field
 from enum import Enum
 
+from app.config import settings
 from app.database import Base
+from app.models.types import Embedding
 
 
 class BodyStyle(str, Enum):
@@ -39,6 +41,12 @@ class FuelType(str, Enum):
     EV = "EV"
 
 
+class AlertType(str, Enum):
+    """Why an alert was raised."""
+    MATCH = "match"  # listing matched when it was enriched or backfilled
+    PRICE_DROP = "price_drop"  # a price cut let the listing pass the preference's filters
+
+
 class CarPreference(BaseModel):
     """Pydantic model for car preferences JSON schema."""
     body_style: BodyStyle
@@ -100,13 +108,24 @@ class Preference(Base):
     id = Column(String(36), primary_key=True, default=lambda: str(uuid4()))
     user_id = Column(String(36), ForeignKey("users.id"), nullable=False, index=True)
     car_pref = Column(JSON, nullable=False)  # CarPreference JSON
-    embedding = Column(JSON, nullable=True)  # OpenAI ada-002 embeddings (stored as JSON for SQLite)
+    embedding = Column(Embedding(1536, storage=settings.embedding_storage_dtype), nullable=True)  # OpenAI ada-002 embeddings (pgvector on Postgres)
+    embedding_norm = Column(Float, nullable=True)  # Norm before normalization; set when embedding is stored unit-length
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False, index=True)  # Watermark for matcher workers
     is_active = Column(Boolean, default=True, nullable=False)
     
     # Relationships
     user = relationship("User", back_populates="preferences")
     alerts = relationship("Alert", back_populates="preference", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        Index(
+            'idx_preference_embedding_hnsw', 'embedding',
+            postgresql_using='hnsw',
+            postgresql_with={'m': 16, 'ef_construction': 64},
+            postgresql_ops={'embedding': 'vector_cosine_ops'}
+        ).ddl_if(dialect='postgresql'),
+    )
 
 
 class Listing(Base):
@@ -116,20 +135,61 @@ class Listing(Base):
     vin = Column(String(17), primary_key=True)
     source = Column(String(50), nullable=False)  # marketcheck, autodev, etc.
     attrs = Column(JSON, nullable=False)  # Full listing data
-    embedding = Column(JSON, nullable=True)  # Embedding of description + options (stored as JSON for SQLite)
+    content_hash = Column(String(64), nullable=True)  # Fingerprint of attrs as ingested
+    # Copies of attrs fields used by hard filters (see app.ingest.upsert.listing_columns)
+    make = Column(String(50), nullable=True, index=True)
+    model = Column(String(100), nullable=True)
+    year = Column(Integer, nullable=True, index=True)
+    price = Column(Float, nullable=True, index=True)
+    mileage = Column(Integer, nullable=True, index=True)
+    body_type = Column(String(50), nullable=True, index=True)  # Lowercased
+    drivetrain = Column(String(20), nullable=True, index=True)
+    embedding = Column(Embedding(1536, storage=settings.embedding_storage_dtype), nullable=True)  # Embedding of description + options (pgvector on Postgres)
+    embedding_norm = Column(Float, nullable=True)  # Norm before normalization; set when embedding is stored unit-length
     decoded_at = Column(DateTime, nullable=True)  # When VIN was decoded
     enriched_at = Column(DateTime, nullable=True)  # When options were enriched
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    last_seen_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)  # Last fetch that returned the listing
+    expired_at = Column(DateTime, nullable=True)  # Set by the expiry sweep; cleared if the listing reappears
     
     # Relationships
     alerts = relationship("Alert", back_populates="listing")
     
     __table_args__ = (
         Index('idx_listing_created', 'created_at'),
+        # Only active listings are in the ANN index; expired ones drop out of matching
+        Index(
+            'idx_listing_active_embedding_hnsw', 'embedding',
+            postgresql_using='hnsw',
+            postgresql_with={'m': 16, 'ef_construction': 64},
+            postgresql_ops={'embedding': 'vector_cosine_ops'},
+            postgresql_where=text('expired_at IS NULL')
+        ).ddl_if(dialect='postgresql'),
     )
 
 
+class ListingRawArchive(Base):
+    """Compressed raw provider payload of a listing, per fetch that changed it."""
+    __tablename__ = "listing_raw_archive"
+    
+    vin = Column(String(17), primary_key=True)
+    fetched_at = Column(DateTime, primary_key=True)
+    source = Column(String(50), nullable=False)
+    codec = Column(String(8), nullable=False)  # zstd or gzip
+    payload = Column(LargeBinary, nullable=False)  # Compressed JSON
+
+
+class ListingPriceHistory(Base):
+    """Append-only price/mileage of a listing, one row per observed change."""
+    __tablename__ = "listing_price_history"
+    
+    vin = Column(String(17), primary_key=True)
+    observed_at = Column(DateTime, primary_key=True)
+    price = Column(Float, nullable=True)
+    mileage = Column(Integer, nullable=True)
+
+
 class Alert(Base):
     """Alert model for matching listings to preferences."""
     __tablename__ = "alerts"
@@ -138,6 +198,7 @@ class Alert(Base):
     preference_id = Column(String(36), ForeignKey("preferences.id"), nullable=False, index=True)
     vin = Column(String(17), ForeignKey("listings.vin"), nullable=False, index=True)
     similarity_score = Column(Float, nullable=False)
+    alert_type = Column(String(20), default=AlertType.MATCH.value, nullable=False)  # AlertType
     sent_at = Column(DateTime, nullable=True)
     viewed_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -147,6 +208,36 @@ class Alert(Base):
     listing = relationship("Listing", back_populates="alerts")
     
     __table_args__ = (
-        UniqueConstraint('preference_id', 'vin', name='uq_alert_preference_vin'),
+        UniqueConstraint('preference_id', 'vin', 'alert_type', name='uq_alert_preference_vin_type'),
         Index('idx_alert_created', 'created_at'),
-    ) 
\ No newline at end of file
+        Index('idx_alert_preference_created', 'preference_id', 'created_at'),  # per-user feed pages
+    )
+
+
+class AlertCounter(Base):
+    """Per-user alert totals, maintained incrementally when ALERT_STATS_COUNTERS is on."""
+    __tablename__ = "alert_counters"
+    
+    user_id = Column(String(36), ForeignKey("users.id"), primary_key=True)
+    total_alerts = Column(Integer, default=0, nullable=False)
+    unseen_alerts = Column(Integer, default=0, nullable=False)
+
+
+class AlertDailyCount(Base):
+    """Per-user, per-day (UTC) alert counts, maintained alongside AlertCounter."""
+    __tablename__ = "alert_daily_counts"
+    
+    user_id = Column(String(36), ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    alerts = Column(Integer, default=0, nullable=False)
+
+
+class IngestWatermark(Base):
+    """Last complete fetch of one source for one search area."""
+    __tablename__ = "ingest_watermarks"
+    
+    source = Column(String(50), primary_key=True)
+    zip_code = Column(String(10), primary_key=True)
+    radius = Column(Integer, primary_key=True)
+    fetched_since = Column(DateTime, nullable=False)  # Start of the last complete fetch
+    full_fetch_at = Column(DateTime, nullable=True)  # Start of the last fetch without a since cut-off
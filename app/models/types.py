@@ -0,0 +1,144 @@
+"""Custom SQLAlchemy column types."""
+import json
+import struct
+from typing import Any, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy.types import LargeBinary, TypeDecorator
+
+try:
+    from pgvector.sqlalchemy import Vector
+except ImportError:  # pragma: no cover - pgvector is only needed on Postgres
+    Vector = None
+
+
+# Blob layout: b"EV", format code, reserved byte, then the payload. The
+# 4-byte header keeps float32 payloads aligned for np.frombuffer.
+_MAGIC = b"EV"
+_HEADER_SIZE = 4
+_FORMATS = {"float32": 1, "float16": 2, "int8": 3}
+_FORMAT_NAMES = {code: name for name, code in _FORMATS.items()}
+
+
+def encode_embedding(vector: Sequence[float], storage: str = "float32") -> bytes:
+    """Pack an embedding into a compact little-endian blob.
+
+    ``int8`` stores a symmetric per-vector scale (float32) ahead of the
+    quantized values, so each component is off by at most scale / 2.
+
+    Args:
+        vector: Embedding vector
+        storage: Storage format: float32, float16 or int8
+
+    Returns:
+        Encoded bytes
+    """
+    code = _FORMATS.get(storage)
+    if code is None:
+        raise ValueError(f"Unknown embedding storage format: {storage}")
+
+    values = np.asarray(vector, dtype=np.float32)
+    header = _MAGIC + bytes((code, 0))
+
+    if storage == "float32":
+        return header + values.astype("<f4", copy=False).tobytes()
+    if storage == "float16":
+        return header + values.astype("<f2").tobytes()
+
+    quantized, scale = quantize_int8(values)
+    return header + struct.pack("<f", scale) + quantized.tobytes()
+
+
+def quantize_int8(vector: Sequence[float]) -> Tuple[np.ndarray, float]:
+    """Symmetric scalar quantization of a vector to int8.
+
+    Args:
+        vector: Vector to quantize
+
+    Returns:
+        (int8 codes, scale) such that vector ~= codes * scale
+    """
+    values = np.asarray(vector, dtype=np.float32)
+    peak = float(np.abs(values).max()) if values.size else 0.0
+    scale = peak / 127 if peak > 0 else 1.0
+    codes = np.clip(np.rint(values / scale), -127, 127).astype(np.int8)
+    return codes, scale
+
+
+def decode_embedding(blob: bytes) -> np.ndarray:
+    """Unpack a blob written by encode_embedding.
+
+    float32 blobs are returned as a read-only view over the buffer, without
+    copying; float16 and int8 blobs are widened to float32.
+
+    Args:
+        blob: Encoded bytes
+
+    Returns:
+        float32 embedding array
+    """
+    if bytes(blob[:2]) != _MAGIC:
+        raise ValueError("Not an encoded embedding")
+
+    storage = _FORMAT_NAMES.get(blob[2])
+    if storage == "float32":
+        return np.frombuffer(blob, dtype="<f4", offset=_HEADER_SIZE)
+    if storage == "float16":
+        return np.frombuffer(blob, dtype="<f2", offset=_HEADER_SIZE).astype(np.float32)
+    if storage == "int8":
+        (scale,) = struct.unpack_from("<f", blob, _HEADER_SIZE)
+        quantized = np.frombuffer(blob, dtype=np.int8, offset=_HEADER_SIZE + 4)
+        return quantized.astype(np.float32) * np.float32(scale)
+    raise ValueError(f"Unknown embedding storage code: {blob[2]}")
+
+
+class Embedding(TypeDecorator):
+    """Embedding vector column.
+
+    Stored as a pgvector ``vector(dim)`` on Postgres, so it can be indexed
+    and searched with the ``<=>`` cosine distance operator, and as a binary
+    blob (see encode_embedding) on every other backend. Values are read back
+    as float32 numpy arrays. Rows still holding the legacy JSON float list
+    are decoded too; scripts/migrate_embeddings.py rewrites them.
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def __init__(self, dim: int = 1536, storage: str = "float32"):
+        """Initialize type.
+
+        Args:
+            dim: Embedding dimension
+            storage: Blob format on non-pgvector backends (float32, float16 or int8)
+        """
+        if storage not in _FORMATS:
+            raise ValueError(f"Unknown embedding storage format: {storage}")
+        super().__init__()
+        self.dim = dim
+        self.storage = storage
+
+    def load_dialect_impl(self, dialect):
+        if uses_vector(dialect):
+            return dialect.type_descriptor(Vector(self.dim))
+        return dialect.type_descriptor(LargeBinary())
+
+    def process_bind_param(self, value: Any, dialect) -> Any:
+        if value is None or uses_vector(dialect):
+            return value
+        return encode_embedding(value, self.storage)
+
+    def process_result_value(self, value: Any, dialect) -> Optional[np.ndarray]:
+        if value is None or isinstance(value, np.ndarray):
+            return value
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return decode_embedding(value)
+        # Legacy JSON text (or an already-parsed list)
+        if isinstance(value, str):
+            value = json.loads(value)
+        return np.asarray(value, dtype=np.float32)
+
+
+def uses_vector(dialect) -> bool:
+    """Whether embeddings are stored as pgvector vectors on this dialect."""
+    return dialect.name == "postgresql" and Vector is not None
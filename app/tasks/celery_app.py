@@ -1,19 +1,29 @@
 """Celery application configuration and tasks."""
 import logging
-from typing import Dict, Any, List, Optional
+from typing import Callable, Dict, Any, List
 from datetime import datetime
+from uuid import uuid4
 import json
 
 from celery import Celery
+from celery.signals import worker_process_shutdown, worker_shutdown
 from sqlalchemy import select, and_
 from sqlalchemy.orm import Session
 import httpx
 from openai import OpenAI
-import numpy as np
 
 from app.config import settings
-from app.database import engine
 from app.models.schemas import Listing, Preference, Alert
+from app.alerts.counters import record_new_alerts
+from app.tasks.db import get_session
+from app.ingest.upsert import UpsertResult, bulk_upsert_listings
+from app.matching.backfill import insert_alerts, match_listings_for_preference
+from app.matching.embedding_cache import get_embedding_cache
+from app.matching.change_feed import publish_preference_change
+from app.matching.loader import get_preference_matrix, update_ann_index
+from app.matching.matrix import normalize_embedding
+from app.matching.rematch import rematch_changed_listings
+from app.matching.vector_search import find_matching_preferences_indexed, supports_vector_search
 
 
 logger = logging.getLogger(__name__)
@@ -34,16 +44,50 @@ celery_app.conf.update(
     enable_utc=True,
     task_routes={
         "app.tasks.celery_app.enrich_and_match": "enrichment",
+        "app.tasks.celery_app.enrich_and_match_batch": "enrichment",
+        "app.tasks.celery_app.rematch_listings": "enrichment",
+        "app.tasks.celery_app.embed_preference": "enrichment",
+        "app.tasks.celery_app.backfill_preference_matches": "enrichment",
+        "app.tasks.celery_app.rebuild_ann_index": "enrichment",
         "app.tasks.celery_app.ingest_listings": "ingest",
+        "app.tasks.celery_app.sweep_ingest_tiles": "ingest",
+        "app.tasks.celery_app.ingest_tile": "ingest",
+        "app.tasks.celery_app.expire_listings": "ingest",
         "app.tasks.celery_app.send_alerts": "notifications"
-    }
+    },
+    beat_schedule={
+        "sweep-ingest-tiles": {
+            "task": "app.tasks.celery_app.sweep_ingest_tiles",
+            "schedule": settings.ingest_sweep_interval_seconds
+        },
+        "expire-listings": {
+            "task": "app.tasks.celery_app.expire_listings",
+            "schedule": settings.listing_expiry_interval_seconds
+        }
+    },
+    # Worker profiles (app/tasks/worker.py) override the prefetch per queue
+    worker_prefetch_multiplier=1,
+    # Requeue tasks whose worker process dies mid-run (acks_late tasks only)
+    task_reject_on_worker_lost=True
 )
 
+# One writer keeps the shared ANN index current; matcher workers only read it
+if settings.ann_index_path:
+    celery_app.conf.beat_schedule["rebuild-ann-index"] = {
+        "task": "app.tasks.celery_app.rebuild_ann_index",
+        "schedule": settings.ann_save_interval_seconds
+    }
+
 # Initialize OpenAI client for embeddings
 openai_client = OpenAI(api_key=settings.openai_api_key)
 
 
-@celery_app.task(name="app.tasks.celery_app.enrich_and_match")
+@celery_app.task(
+    name="app.tasks.celery_app.enrich_and_match",
+    acks_late=True,
+    ignore_result=True,
+    rate_limit=settings.openai_rate_limit
+)
 def enrich_and_match(vin: str) -> Dict[str, Any]:
     """Enrich a listing and match against user preferences.
     
@@ -56,7 +100,7 @@ def enrich_and_match(vin: str) -> Dict[str, Any]:
     logger.info(f"Starting enrichment for VIN: {vin}")
     
     # Use synchronous session for Celery task
-    with Session(engine) as db:
+    with get_session() as db:
         # Get listing
         listing = db.query(Listing).filter(Listing.vin == vin).first()
         if not listing:
@@ -69,14 +113,8 @@ def enrich_and_match(vin: str) -> Dict[str, Any]:
             return {"status": "already_enriched"}
         
         try:
-            # Decode VIN (mock for now)
-            decoded_info = decode_vin(vin)
-            
-            # Get build sheet / options (mock for now)
-            options = get_vehicle_options(vin, listing.attrs)
-            
-            # Create description for embedding
-            description = create_listing_description(listing.attrs, decoded_info, options)
+            # Decode VIN, collect options and build the embedding text
+            description = prepare_listing(listing)
             
             # Generate embedding
             embedding = generate_embedding(description)
@@ -84,12 +122,7 @@ def enrich_and_match(vin: str) -> Dict[str, Any]:
             # Update listing
             listing.decoded_at = datetime.utcnow()
             listing.enriched_at = datetime.utcnow()
-            listing.embedding = embedding
-            listing.attrs = {
-                **listing.attrs,
-                "decoded_info": decoded_info,
-                "options": options
-            }
+            listing.embedding, listing.embedding_norm = normalize_embedding(embedding)
             
             # Find matching preferences
             matches = find_matching_preferences(db, listing, embedding)
@@ -107,18 +140,25 @@ def enrich_and_match(vin: str) -> Dict[str, Any]:
                 
                 if not existing_alert:
                     alert = Alert(
+                        id=str(uuid4()),
                         preference_id=preference_id,
                         vin=vin,
-                        similarity_score=similarity_score
+                        similarity_score=similarity_score,
+                        created_at=listing.enriched_at
                     )
                     db.add(alert)
-                    alerts_created.append(str(alert.id))
-                    
-                    # Queue notification task
-                    send_alerts.delay(str(alert.id))
+                    alerts_created.append(alert)
             
+            record_new_alerts(
+                db, [alert.preference_id for alert in alerts_created], listing.enriched_at
+            )
             db.commit()
             
+            # Queue notifications only once the alerts are visible
+            alerts_created = [alert.id for alert in alerts_created]
+            for alert_id in alerts_created:
+                send_alerts.delay(alert_id)
+            
             logger.info(f"Enrichment complete for VIN {vin}. Created {len(alerts_created)} alerts.")
             
             return {
@@ -134,7 +174,264 @@ def enrich_and_match(vin: str) -> Dict[str, Any]:
             return {"error": str(e)}
 
 
-@celery_app.task(name="app.tasks.celery_app.ingest_listings")
+@celery_app.task(
+    name="app.tasks.celery_app.enrich_and_match_batch",
+    bind=True,
+    acks_late=True,
+    ignore_result=True,
+    max_retries=3,
+    default_retry_delay=30,
+    rate_limit=settings.openai_rate_limit
+)
+def enrich_and_match_batch(self, vins: List[str]) -> Dict[str, Any]:
+    """Enrich a batch of listings and match them against user preferences.
+    
+    Loads all listings in one query, embeds every description in one
+    embeddings request, matches them the same way enrich_and_match does
+    (see find_matching_preferences_many) and writes all alerts in a
+    single commit.
+    
+    A failure (including a failed embeddings request) rolls back the
+    whole batch, so no listing is marked enriched without an embedding,
+    and the batch is retried. Once the retries are used up each VIN is
+    queued for enrich_and_match on its own, so one bad listing does not
+    leave the others unenriched.
+    
+    Args:
+        vins: Vehicle Identification Numbers
+        
+    Returns:
+        Dictionary with enrichment results and matches
+    """
+    logger.info(f"Starting batch enrichment for {len(vins)} VINs")
+    
+    with get_session() as db:
+        listings = db.query(Listing).filter(
+            and_(
+                Listing.vin.in_(vins),
+                Listing.enriched_at.is_(None)
+            )
+        ).all()
+        
+        if not listings:
+            logger.info("No unenriched listings in batch")
+            return {"status": "success", "enriched": 0, "alerts_created": [], "matches_found": 0}
+        
+        pending = [listing.vin for listing in listings]
+        try:
+            descriptions = [prepare_listing(listing) for listing in listings]
+            embeddings = generate_embeddings(descriptions)
+            
+            now = datetime.utcnow()
+            for listing, embedding in zip(listings, embeddings):
+                listing.decoded_at = now
+                listing.enriched_at = now
+                listing.embedding, listing.embedding_norm = normalize_embedding(embedding)
+            
+            batch_matches = find_matching_preferences_many(db, listings, embeddings)
+            
+            # Skip pairs that already have an alert
+            existing = set(
+                db.query(Alert.preference_id, Alert.vin).filter(
+                    Alert.vin.in_([listing.vin for listing in listings])
+                ).all()
+            )
+            
+            alerts_created = []
+            alert_preferences = []
+            matches_found = 0
+            for listing, matches in zip(listings, batch_matches):
+                matches_found += len(matches)
+                for preference_id, similarity_score in matches:
+                    if (preference_id, listing.vin) in existing:
+                        continue
+                    alert = Alert(
+                        id=str(uuid4()),
+                        preference_id=preference_id,
+                        vin=listing.vin,
+                        similarity_score=similarity_score,
+                        created_at=now
+                    )
+                    db.add(alert)
+                    alerts_created.append(alert.id)
+                    alert_preferences.append(preference_id)
+            
+            record_new_alerts(db, alert_preferences, now)
+            db.commit()
+            
+            # Queue notifications only once the alerts are visible
+            for alert_id in alerts_created:
+                send_alerts.delay(alert_id)
+            
+            logger.info(
+                f"Batch enrichment complete for {len(listings)} VINs. "
+                f"Created {len(alerts_created)} alerts."
+            )
+            
+            return {
+                "status": "success",
+                "enriched": len(listings),
+                "alerts_created": alerts_created,
+                "matches_found": matches_found
+            }
+            
+        except Exception as e:
+            logger.error(f"Error enriching batch of {len(vins)} VINs: {e}")
+            db.rollback()
+            if self.request.retries < self.max_retries:
+                raise self.retry(exc=e)
+            
+            for vin in pending:
+                enrich_and_match.delay(vin)
+            return {"error": str(e), "requeued": len(pending)}
+
+
+@celery_app.task(
+    name="app.tasks.celery_app.rematch_listings",
+    acks_late=True,
+    ignore_result=True
+)
+def rematch_listings(changes: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Alert on listings whose price (or other hard-filter field) change lets them match.
+    
+    Uses the listings' stored embeddings; nothing is re-embedded.
+    
+    Args:
+        changes: VIN -> hard-filter values before the change
+        
+    Returns:
+        Dictionary with the created alerts
+    """
+    with get_session() as db:
+        try:
+            alerts_created = rematch_changed_listings(db, get_preference_matrix(db), changes)
+            db.commit()
+        except Exception as e:
+            logger.error(f"Error re-matching {len(changes)} changed listings: {e}")
+            db.rollback()
+            return {"error": str(e)}
+    
+    # Queue notifications only once the alerts are visible
+    for alert_id in alerts_created:
+        send_alerts.delay(alert_id)
+    
+    return {"status": "success", "changed": len(changes), "alerts_created": alerts_created}
+
+
+@celery_app.task(
+    name="app.tasks.celery_app.embed_preference",
+    acks_late=True,
+    ignore_result=True,
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    max_retries=5,
+    rate_limit=settings.openai_rate_limit
+)
+def embed_preference(preference_id: str) -> Dict[str, Any]:
+    """Embed a saved preference so it can be matched against listings.
+    
+    Queues backfill_preference_matches once the embedding is stored, so the
+    preference is matched against listings that are already enriched. If
+    the embedding cannot be generated nothing is stored, published or
+    backfilled, and the task is retried with exponential backoff.
+    
+    Args:
+        preference_id: Preference ID
+        
+    Returns:
+        Dictionary with embedding status
+    """
+    logger.info(f"Embedding preference: {preference_id}")
+    
+    with get_session() as db:
+        preference = db.query(Preference).filter(Preference.id == preference_id).first()
+        if not preference:
+            logger.error(f"Preference not found: {preference_id}")
+            return {"error": "Preference not found"}
+        
+        description = create_preference_description(preference.car_pref)
+        preference.embedding, preference.embedding_norm = normalize_embedding(
+            generate_embedding(description)
+        )
+        db.commit()
+    
+    publish_preference_change(preference_id)
+    backfill_preference_matches.delay(preference_id)
+    
+    return {"status": "success", "preference_id": preference_id}
+
+
+@celery_app.task(
+    name="app.tasks.celery_app.backfill_preference_matches",
+    acks_late=True,
+    ignore_result=True
+)
+def backfill_preference_matches(preference_id: str) -> Dict[str, Any]:
+    """Match a preference against the existing listing inventory.
+    
+    Args:
+        preference_id: Preference ID
+        
+    Returns:
+        Dictionary with backfill results
+    """
+    logger.info(f"Backfilling matches for preference: {preference_id}")
+    
+    with get_session() as db:
+        preference = db.query(Preference).filter(Preference.id == preference_id).first()
+        if not preference or preference.embedding is None:
+            logger.error(f"Preference not found or not embedded: {preference_id}")
+            return {"error": "Preference not found or not embedded"}
+        
+        try:
+            matches = match_listings_for_preference(
+                db,
+                preference.car_pref,
+                preference.embedding,
+                limit=settings.backfill_max_alerts
+            )
+            alerts_created = insert_alerts(db, preference_id, matches)
+            db.commit()
+        except Exception as e:
+            logger.error(f"Error backfilling matches for preference {preference_id}: {e}")
+            db.rollback()
+            return {"error": str(e)}
+    
+    for alert_id in alerts_created:
+        send_alerts.delay(alert_id)
+    
+    logger.info(
+        f"Backfill for preference {preference_id} matched {len(matches)} listings. "
+        f"Created {len(alerts_created)} alerts."
+    )
+    
+    return {
+        "status": "success",
+        "matches_found": len(matches),
+        "alerts_created": alerts_created
+    }
+
+
+@celery_app.task(name="app.tasks.celery_app.rebuild_ann_index", ignore_result=True)
+def rebuild_ann_index() -> Dict[str, Any]:
+    """Update and save the shared ANN index of preferences (run by beat).
+    
+    Returns:
+        Dictionary with the number of indexed preferences
+    """
+    if not settings.ann_index_path:
+        return {"status": "disabled"}
+    
+    with get_session() as db:
+        indexed = update_ann_index(db)
+    return {"status": "success", "preferences": indexed}
+
+
+@celery_app.task(
+    name="app.tasks.celery_app.ingest_listings",
+    acks_late=True,
+    rate_limit=settings.listing_api_rate_limit
+)
 def ingest_listings(zip_code: str, radius: int = 50) -> Dict[str, Any]:
     """Ingest listings from all sources for a given location.
     
@@ -147,63 +444,170 @@ def ingest_listings(zip_code: str, radius: int = 50) -> Dict[str, Any]:
     """
     logger.info(f"Starting listing ingestion for ZIP: {zip_code}, radius: {radius}")
     
-    results = {
-        "marketcheck": 0,
-        "autodev": 0,
-        "new_listings": 0,
-        "errors": []
-    }
+    results = run_incremental_ingest(zip_code, radius, save_listings)
     
-    # Import here to avoid circular imports
-    from app.ingest import marketcheck, autodev
-    import asyncio
+    logger.info(
+        f"Ingestion complete. New: {results['new_listings']}, changed: {results['changed_listings']}, "
+        f"unchanged: {results['unchanged_listings']}"
+    )
+    return results
+
+
+def run_incremental_ingest(
+    zip_code: str,
+    radius: int,
+    save: Callable[[List[Dict[str, Any]]], UpsertResult]
+) -> Dict[str, Any]:
+    """Ingest an area from every source, asking each only for what changed.
     
-    # Run async functions in sync context
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
+    Sources are fetched since their watermark for the area (or in full when
+    due), and the watermark of every source that finished without errors
+    is moved to the start of this run.
     
-    try:
-        # Fetch from Marketcheck
-        try:
-            mc_listings = loop.run_until_complete(
-                marketcheck.get_listings(zip_code, radius)
-            )
-            results["marketcheck"] = len(mc_listings)
-            
-            # Save listings
-            new_count = save_listings(mc_listings)
-            results["new_listings"] += new_count
-            
-        except Exception as e:
-            logger.error(f"Marketcheck ingestion error: {e}")
-            results["errors"].append(f"Marketcheck: {str(e)}")
+    Args:
+        zip_code: ZIP code to search around
+        radius: Search radius in miles
+        save: Persists a batch of listings
         
-        # Fetch from Auto.dev
-        try:
-            ad_listings = loop.run_until_complete(
-                autodev.get_listings(zip_code, radius)
+    Returns:
+        Coordinator results
+    """
+    # Import here to avoid circular imports
+    from app.ingest.coordinator import coordinator, source_names
+    from app.ingest.watermarks import advance_watermarks, changed_since
+    
+    started_at = datetime.utcnow()
+    with get_session() as db:
+        since = changed_since(db, source_names(), zip_code, radius, now=started_at)
+    
+    # All sources are fetched concurrently over pooled clients
+    results = coordinator.run(zip_code, radius, save, since)
+    
+    if results["complete_sources"]:
+        with get_session() as db:
+            advance_watermarks(
+                db, results["complete_sources"], zip_code, radius, started_at,
+                full={name: name in results["full_sources"] for name in results["complete_sources"]}
             )
-            results["autodev"] = len(ad_listings)
-            
-            # Save listings
-            new_count = save_listings(ad_listings)
-            results["new_listings"] += new_count
-            
-        except Exception as e:
-            logger.error(f"Auto.dev ingestion error: {e}")
-            results["errors"].append(f"Auto.dev: {str(e)}")
-        
-    finally:
-        loop.close()
+            db.commit()
+    return results
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def _close_ingest_clients(**kwargs) -> None:
+    """Close the pooled provider HTTP clients of this process's ingest loop."""
+    from app.ingest.coordinator import coordinator
     
-    logger.info(f"Ingestion complete. Total new listings: {results['new_listings']}")
+    coordinator.close()
+
+
+@celery_app.task(name="app.tasks.celery_app.sweep_ingest_tiles", ignore_result=True)
+def sweep_ingest_tiles() -> Dict[str, Any]:
+    """Queue ingestion of the geographic tiles that are due (run by beat).
+    
+    Tiles are planned from the active users' locations on every sweep, so
+    new users are covered by the next one.
+    
+    Returns:
+        Dictionary with the number of planned and queued tiles
+    """
+    import redis
+    from app.ingest.sweep import TileScheduler, plan_tiles, user_locations
+    
+    with get_session() as db:
+        locations = user_locations(db)
+    tiles = plan_tiles(locations, settings.ingest_tile_radius_miles)
+    
+    scheduler = TileScheduler(redis.Redis.from_url(settings.redis_url))
+    due = scheduler.due(tiles)[:settings.ingest_tiles_per_sweep]
+    for tile in due:
+        scheduler.mark_dispatched(tile.zip_code)
+        ingest_tile.delay(tile.zip_code, settings.ingest_tile_radius_miles)
+    
+    logger.info(
+        f"Ingest sweep: {len(tiles)} tiles cover {sum(t.users for t in tiles)} users "
+        f"in {len(locations)} ZIPs; queued {len(due)}"
+    )
+    return {"tiles": len(tiles), "queued": len(due)}
+
+
+@celery_app.task(
+    name="app.tasks.celery_app.ingest_tile",
+    acks_late=True,
+    ignore_result=True,
+    rate_limit=settings.listing_api_rate_limit
+)
+def ingest_tile(zip_code: str, radius: int) -> Dict[str, Any]:
+    """Ingest one sweep tile, skipping VINs other tiles already saved.
+    
+    Args:
+        zip_code: ZIP code at the tile centre
+        radius: Search radius in miles
+        
+    Returns:
+        Dictionary with ingestion results and the tile's updated churn
+    """
+    import redis
+    from app.ingest.coordinator import source_names
+    from app.ingest.sweep import TileScheduler, VinDeduper
+    
+    client = redis.Redis.from_url(settings.redis_url)
+    deduper = VinDeduper(client)
+    
+    def save(listings: List[Dict[str, Any]]) -> UpsertResult:
+        kept = deduper.unseen(listings)
+        result = save_listings(kept)
+        # Only once committed; a failed save leaves the VINs to other tiles
+        deduper.mark_seen(kept)
+        return result
+    
+    results = run_incremental_ingest(zip_code, radius, save)
+    fetched = sum(results[name] for name in source_names())
+    results["duplicates_skipped"] = deduper.dropped
+    scheduler = TileScheduler(client)
+    if set(results["full_sources"]) == set(source_names()):
+        # Only a full fetch says what share of the tile is new
+        results["churn"] = scheduler.record_result(zip_code, fetched, results["new_listings"])
+    else:
+        results["churn"] = scheduler.state_of(zip_code)["churn"]
+    
+    logger.info(
+        f"Tile {zip_code}: {fetched} fetched, {deduper.dropped} seen in other tiles, "
+        f"{results['new_listings']} new (churn {results['churn']:.2f})"
+    )
     return results
 
 
-@celery_app.task(name="app.tasks.celery_app.send_alerts")
+@celery_app.task(name="app.tasks.celery_app.expire_listings", ignore_result=True)
+def expire_listings() -> Dict[str, int]:
+    """Expire listings their source has stopped returning (run by beat).
+    
+    Returns:
+        Source name -> listings expired
+    """
+    from app.ingest.lifecycle import expire_stale_listings
+    
+    with get_session() as db:
+        expired = expire_stale_listings(db)
+        db.commit()
+    
+    if any(expired.values()):
+        logger.info(f"Expired listings: {expired}")
+    return expired
+
+
+@celery_app.task(
+    name="app.tasks.celery_app.send_alerts",
+    ignore_result=True,
+    rate_limit=settings.notification_rate_limit
+)
 def send_alerts(alert_id: str) -> Dict[str, Any]:
     """Send notification for an alert.
     
+    Unlike the other tasks this one is acknowledged on receipt rather than
+    on completion: a redelivery after a worker crash would notify twice.
+    
     Args:
         alert_id: Alert ID to send
         
@@ -214,7 +618,7 @@ def send_alerts(alert_id: str) -> Dict[str, Any]:
     
     # TODO: Implement actual notification logic
     # For now, just mark as sent
-    with Session(engine) as db:
+    with get_session() as db:
         alert = db.query(Alert).filter(Alert.id == alert_id).first()
         if alert:
             alert.sent_at = datetime.utcnow()
@@ -224,6 +628,30 @@ def send_alerts(alert_id: str) -> Dict[str, Any]:
             return {"error": "Alert not found"}
 
 
+def prepare_listing(listing: Listing) -> str:
+    """Decode a listing's VIN, attach its options and build its description.
+    
+    Args:
+        listing: Listing to prepare (attrs are updated in place)
+        
+    Returns:
+        Description string for embedding
+    """
+    # Decode VIN (mock for now)
+    decoded_info = decode_vin(listing.vin)
+    
+    # Get build sheet / options (mock for now)
+    options = get_vehicle_options(listing.vin, listing.attrs)
+    
+    listing.attrs = {
+        **listing.attrs,
+        "decoded_info": decoded_info,
+        "options": options
+    }
+    
+    return create_listing_description(listing.attrs, decoded_info, options)
+
+
 def decode_vin(vin: str) -> Dict[str, Any]:
     """Decode VIN using vPIC API.
     
@@ -333,6 +761,37 @@ def create_listing_description(
     return " | ".join(parts)
 
 
+def create_preference_description(car_pref: Dict[str, Any]) -> str:
+    """Create a description of a preference for embedding.
+    
+    Mirrors create_listing_description so preference and listing texts land
+    close together in embedding space. Brand exclusions are left out because
+    negations embed poorly; they are enforced as a hard filter instead.
+    
+    Args:
+        car_pref: CarPreference JSON
+        
+    Returns:
+        Description string for embedding
+    """
+    parts = []
+    
+    if car_pref.get('body_style'):
+        parts.append(f"Body: {car_pref['body_style']}")
+    if car_pref.get('drivetrain'):
+        parts.append(f"Drivetrain: {car_pref['drivetrain']}")
+    if car_pref.get('fuel_type'):
+        parts.append(f"Fuel: {car_pref['fuel_type']}")
+    if car_pref.get('min_power_hp'):
+        parts.append(f"Power: at least {car_pref['min_power_hp']} hp")
+    if car_pref.get('must_have_options'):
+        parts.append(f"Options: {', '.join(car_pref['must_have_options'])}")
+    if car_pref.get('budget_usd'):
+        parts.append(f"Budget: up to ${car_pref['budget_usd']}")
+    
+    return " | ".join(parts)
+
+
 def generate_embedding(text: str) -> List[float]:
     """Generate embedding using OpenAI.
     
@@ -342,16 +801,57 @@ def generate_embedding(text: str) -> List[float]:
     Returns:
         Embedding vector
     """
+    return generate_embeddings([text])[0]
+
+
+def generate_embeddings(texts: List[str]) -> List[List[float]]:
+    """Generate embeddings for many texts in a single OpenAI request.
+    
+    Texts already in the embedding cache are not sent to OpenAI; the rest
+    are embedded together and written back to the cache.
+    
+    Args:
+        texts: Texts to embed
+        
+    Returns:
+        Embedding vectors in the same order as texts
+        
+    Raises:
+        Exception: If the OpenAI request fails or returns an incomplete or
+            zero embedding; nothing is cached, so callers can retry
+    """
+    if not texts:
+        return []
+    
+    cache = get_embedding_cache()
+    embeddings = cache.get_many(texts)
+    
+    # Embed each distinct uncached text once
+    missing = list(dict.fromkeys(
+        text for text, embedding in zip(texts, embeddings) if embedding is None
+    ))
+    if not missing:
+        return embeddings
+    
     try:
         response = openai_client.embeddings.create(
-            model="text-embedding-ada-002",
-            input=text
+            model=settings.embedding_model,
+            input=missing
         )
-        return response.data[0].embedding
+        data = sorted(response.data, key=lambda item: item.index)
+        if len(data) != len(missing) or not all(any(item.embedding) for item in data):
+            raise ValueError(f"OpenAI returned {len(data)} usable embeddings for {len(missing)} texts")
     except Exception as e:
-        logger.error(f"Error generating embedding: {e}")
-        # Return zero vector on error
-        return [0.0] * 1536
+        logger.error(f"Error generating {len(missing)} embeddings: {e}")
+        raise
+    
+    fresh = {text: item.embedding for text, item in zip(missing, data)}
+    cache.set_many(missing, [fresh[text] for text in missing])
+    
+    return [
+        embedding if embedding is not None else fresh[text]
+        for text, embedding in zip(texts, embeddings)
+    ]
 
 
 def find_matching_preferences(
@@ -361,6 +861,10 @@ def find_matching_preferences(
 ) -> List[tuple[str, float]]:
     """Find preferences that match a listing.
     
+    On Postgres this is an indexed pgvector nearest-neighbour query; other
+    backends score the listing against the worker's cached preference
+    matrix, which is refreshed incrementally.
+    
     Args:
         db: Database session
         listing: Listing to match
@@ -369,121 +873,76 @@ def find_matching_preferences(
     Returns:
         List of (preference_id, similarity_score) tuples
     """
-    # Get active preferences with embeddings
-    preferences = db.query(Preference).filter(
-        and_(
-            Preference.is_active == True,
-            Preference.embedding.isnot(None)
-        )
-    ).all()
-    
-    matches = []
-    listing_attrs = listing.attrs
+    if not embedding:
+        return []
     
-    for preference in preferences:
-        # Basic filtering based on preference criteria
-        car_pref = preference.car_pref
-        
-        # Check body style
-        if car_pref.get("body_style") and listing_attrs.get("body_type"):
-            if car_pref["body_style"].lower() != listing_attrs["body_type"].lower():
-                continue
-        
-        # Check drivetrain
-        if car_pref.get("drivetrain") and listing_attrs.get("drivetrain"):
-            if car_pref["drivetrain"] != listing_attrs["drivetrain"]:
-                continue
-        
-        # Check budget
-        if car_pref.get("budget_usd") and listing_attrs.get("price"):
-            if listing_attrs["price"] > car_pref["budget_usd"]:
-                continue
-        
-        # Check brand exclusions
-        if car_pref.get("brand_exclusions") and listing_attrs.get("make"):
-            if listing_attrs["make"] in car_pref["brand_exclusions"]:
-                continue
-        
-        # Calculate similarity if embeddings exist
-        if preference.embedding and embedding:
-            similarity = calculate_cosine_similarity(
-                preference.embedding,
-                embedding
-            )
-            
-            # Threshold for matching (adjust as needed)
-            if similarity > 0.8:
-                matches.append((preference.id, similarity))
+    if supports_vector_search(db):
+        return find_matching_preferences_indexed(db, listing.attrs, embedding)
     
-    # Sort by similarity score
-    matches.sort(key=lambda x: x[1], reverse=True)
-    
-    return matches
+    matrix = get_preference_matrix(db)
+    return matrix.match(listing.attrs, embedding)
 
 
-def calculate_cosine_similarity(vec1: List[float], vec2: List[float]) -> float:
-    """Calculate cosine similarity between two vectors.
+def find_matching_preferences_many(
+    db: Session,
+    listings: List[Listing],
+    embeddings: List[List[float]]
+) -> List[List[tuple[str, float]]]:
+    """Find the preferences that match each of a batch of listings.
+    
+    Batch counterpart of find_matching_preferences, with the same results:
+    on Postgres each listing is an indexed pgvector query; other backends
+    score the whole batch against the preference matrix at once.
     
     Args:
-        vec1: First vector
-        vec2: Second vector
+        db: Database session
+        listings: Listings to match
+        embeddings: Listing embedding vectors, in the same order
         
     Returns:
-        Cosine similarity score
+        Per listing, a list of (preference_id, similarity_score) tuples
     """
-    try:
-        vec1_np = np.array(vec1)
-        vec2_np = np.array(vec2)
-        
-        dot_product = np.dot(vec1_np, vec2_np)
-        norm1 = np.linalg.norm(vec1_np)
-        norm2 = np.linalg.norm(vec2_np)
-        
-        if norm1 == 0 or norm2 == 0:
-            return 0.0
-        
-        return dot_product / (norm1 * norm2)
-    except Exception as e:
-        logger.error(f"Error calculating similarity: {e}")
-        return 0.0
+    if supports_vector_search(db):
+        return [
+            find_matching_preferences_indexed(db, listing.attrs, embedding) if embedding else []
+            for listing, embedding in zip(listings, embeddings)
+        ]
+    
+    matrix = get_preference_matrix(db)
+    return matrix.match_many([listing.attrs for listing in listings], embeddings)
 
 
-def save_listings(listings: List[Dict[str, Any]]) -> int:
+def save_listings(listings: List[Dict[str, Any]]) -> UpsertResult:
     """Save listings to database.
     
+    Uses a single bulk upsert per batch; listings whose content is unchanged
+    since the last ingest are not written.
+    
     Args:
         listings: List of listing dictionaries
         
     Returns:
-        Number of new listings saved
+        New, updated and unchanged VINs
     """
-    new_count = 0
+    with get_session() as db:
+        result = bulk_upsert_listings(db, listings)
+        if result.new_vins or result.updated_vins:
+            db.commit()
     
-    with Session(engine) as db:
-        for listing_data in listings:
-            vin = listing_data.get("vin")
-            if not vin:
-                continue
-            
-            # Check if listing already exists
-            existing = db.query(Listing).filter(Listing.vin == vin).first()
-            if existing:
-                # Update existing listing
-                existing.attrs = listing_data
-                existing.updated_at = datetime.utcnow()
-            else:
-                # Create new listing
-                listing = Listing(
-                    vin=vin,
-                    source=listing_data.get("source", "unknown"),
-                    attrs=listing_data
-                )
-                db.add(listing)
-                new_count += 1
-                
-                # Queue enrichment task
-                enrich_and_match.delay(vin)
-        
-        db.commit()
+    # Queue enrichment once the new rows are committed
+    dispatch_enrichment(result.new_vins)
+    if result.filter_changes:
+        rematch_listings.delay(result.filter_changes)
     
-    return new_count 
\ No newline at end of file
+    return result
+
+
+def dispatch_enrichment(vins: List[str]) -> None:
+    """Queue enrichment for new VINs, coalesced into batch tasks.
+    
+    Args:
+        vins: Vehicle Identification Numbers to enrich
+    """
+    batch_size = max(settings.enrichment_batch_size, 1)
+    for start in range(0, len(vins), batch_size):
+        enrich_and_match_batch.delay(vins[start:start + batch_size])
@@ -0,0 +1,114 @@
+"""Synchronous database access for Celery workers.
+
+Each worker process owns one pooled sync engine (see
+app.database.create_sync_engine). Prefork children build theirs after the
+fork, so no connection is ever shared between processes; thread/green pools
+size the engine's pool to the worker concurrency.
+"""
+import logging
+import os
+import time
+from typing import Optional
+
+from celery.signals import worker_init, worker_process_init, worker_process_shutdown
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.config import settings
+from app.database import PoolMetrics, create_sync_engine
+
+
+logger = logging.getLogger(__name__)
+
+# Worker pools that run several tasks concurrently inside one process
+_SHARED_PROCESS_POOLS = {"thread", "gevent", "eventlet"}
+
+_engine: Optional[Engine] = None
+_session_factory: Optional[sessionmaker] = None
+_pool_metrics: Optional[PoolMetrics] = None
+_pid: Optional[int] = None
+_metrics_logged_at = 0.0
+
+
+def init_engine(pool_size: Optional[int] = None) -> Engine:
+    """(Re)create this process's engine.
+
+    An engine inherited across a fork is dropped without closing its
+    connections, which still belong to the parent.
+
+    Args:
+        pool_size: Connections kept open; defaults to settings.worker_db_pool_size
+
+    Returns:
+        The new engine
+    """
+    global _engine, _session_factory, _pool_metrics, _pid, _metrics_logged_at
+
+    if _engine is not None:
+        _engine.dispose(close=_pid == os.getpid())
+
+    _engine = create_sync_engine(pool_size=pool_size)
+    _session_factory = sessionmaker(bind=_engine)
+    _pool_metrics = PoolMetrics(_engine)
+    _pid = os.getpid()
+    _metrics_logged_at = time.monotonic()
+    size = settings.worker_db_pool_size if pool_size is None else pool_size
+    logger.info(f"Worker database engine ready (pid {_pid}, pool size {size})")
+    return _engine
+
+
+def get_engine() -> Engine:
+    """Get this process's engine, creating it on first use."""
+    if _engine is None or _pid != os.getpid():
+        init_engine()
+    return _engine
+
+
+def get_session() -> Session:
+    """Open a session on this process's engine; use as a context manager."""
+    get_engine()
+    _log_pool_metrics_if_due()
+    return _session_factory()
+
+
+def get_pool_metrics() -> dict:
+    """Pool counters and occupancy for this process's engine."""
+    get_engine()
+    return _pool_metrics.snapshot()
+
+
+def _log_pool_metrics_if_due() -> None:
+    """Log this process's pool metrics every WORKER_POOL_METRICS_LOG_SECONDS.
+
+    Each worker process owns its engine, so the metrics are logged from
+    inside it rather than collected by the parent.
+    """
+    global _metrics_logged_at
+
+    interval = settings.worker_pool_metrics_log_seconds
+    now = time.monotonic()
+    if interval <= 0 or now - _metrics_logged_at < interval:
+        return
+    _metrics_logged_at = now
+    logger.info(f"Worker database pool (pid {_pid}): {get_pool_metrics()}")
+
+
+@worker_init.connect
+def _size_pool_for_worker(sender=None, **kwargs) -> None:
+    """Thread/green pools run `concurrency` tasks against one engine."""
+    pool_name = getattr(getattr(sender, "pool_cls", None), "__module__", "").rsplit(".", 1)[-1]
+    if pool_name in _SHARED_PROCESS_POOLS:
+        init_engine(pool_size=max(sender.concurrency, 1))
+
+
+@worker_process_init.connect
+def _init_child_engine(**kwargs) -> None:
+    """Prefork children run one task at a time; overflow covers helper threads."""
+    init_engine(pool_size=1)
+
+
+@worker_process_shutdown.connect
+def _dispose_child_engine(**kwargs) -> None:
+    if _engine is not None and _pid == os.getpid():
+        logger.info(f"Worker database pool (pid {_pid}) at shutdown: {_pool_metrics.snapshot()}")
+        _engine.dispose()
@@ -0,0 +1,113 @@
+"""Start a Celery worker with a named queue/pool profile.
+
+Usage:
+    python -m app.tasks.worker --profile cpu
+    python -m app.tasks.worker --profile io --concurrency 32
+
+Extra arguments after ``--`` are passed to ``celery worker`` unchanged.
+"""
+import argparse
+import os
+import sys
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from app.tasks.celery_app import celery_app
+
+
+@dataclass(frozen=True)
+class WorkerProfile:
+    """Queues a worker consumes and how it runs them."""
+    queues: Tuple[str, ...]
+    pool: str
+    concurrency: int
+    prefetch_multiplier: int
+    description: str
+
+
+PROFILES = {
+    # Embedding and matrix scoring hold the GIL: one process per core, and no
+    # prefetching so a long batch does not sit on tasks other workers could run
+    "cpu": WorkerProfile(
+        queues=("enrichment",),
+        pool="prefork",
+        concurrency=os.cpu_count() or 2,
+        prefetch_multiplier=1,
+        description="enrichment queue on a prefork pool, one process per core"
+    ),
+    # Provider fetches and notifications mostly wait on the network
+    "io": WorkerProfile(
+        queues=("ingest", "notifications"),
+        pool="threads",
+        concurrency=16,
+        prefetch_multiplier=4,
+        description="ingest and notifications queues on a thread pool"
+    ),
+    # Single worker for development; consumes every queue
+    "all": WorkerProfile(
+        queues=("enrichment", "ingest", "notifications", "celery"),
+        pool="prefork",
+        concurrency=os.cpu_count() or 2,
+        prefetch_multiplier=1,
+        description="every queue on a prefork pool"
+    ),
+}
+
+
+def worker_argv(
+    profile: WorkerProfile,
+    concurrency: Optional[int] = None,
+    pool: Optional[str] = None,
+    loglevel: str = "info",
+    extra: Optional[List[str]] = None
+) -> List[str]:
+    """Build the ``celery worker`` arguments for a profile.
+
+    Args:
+        profile: Worker profile
+        concurrency: Override of the profile's concurrency
+        pool: Override of the profile's pool (e.g. gevent)
+        loglevel: Worker log level
+        extra: Further arguments passed through
+
+    Returns:
+        Arguments for celery_app.worker_main
+    """
+    return [
+        "worker",
+        f"--queues={','.join(profile.queues)}",
+        f"--pool={pool or profile.pool}",
+        f"--concurrency={concurrency or profile.concurrency}",
+        f"--prefetch-multiplier={profile.prefetch_multiplier}",
+        f"--loglevel={loglevel}",
+        *(extra or []),
+    ]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    argv = sys.argv[1:] if argv is None else argv
+    extra: List[str] = []
+    if "--" in argv:
+        split = argv.index("--")
+        argv, extra = argv[:split], argv[split + 1:]
+
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[0],
+        epilog="Profiles: " + "; ".join(
+            f"{name}: {profile.description}" for name, profile in PROFILES.items()
+        )
+    )
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="all")
+    parser.add_argument("--concurrency", type=int)
+    parser.add_argument("--pool", help="Override the profile's pool (prefork, threads, gevent, solo)")
+    parser.add_argument("--loglevel", default="info")
+    args = parser.parse_args(argv)
+
+    profile = PROFILES[args.profile]
+    celery_app.worker_main(worker_argv(
+        profile, args.concurrency, args.pool, args.loglevel, extra
+    ))
+
+
+if __name__ == "__main__":
+    main()
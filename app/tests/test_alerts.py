@@ -0,0 +1,158 @@
+"""Unit tests for alert routes."""
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+
+from app.database import Base, get_db
+from app.main import app
+from app.models.schemas import Alert, Listing, Preference, User
+
+
+USER_A = str(uuid4())
+USER_B = str(uuid4())
+
+
+@pytest.fixture
+def client(tmp_path):
+    """Client whose requests run against a throwaway SQLite database."""
+    path = tmp_path / "alerts.db"
+    sync_engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=sync_engine)
+
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    session_maker = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def override_get_db():
+        async with session_maker() as session:
+            yield session
+
+    previous = app.dependency_overrides.get(get_db)
+    app.dependency_overrides[get_db] = override_get_db
+    with Session(sync_engine) as db:
+        yield TestClient(app), db
+
+    if previous:
+        app.dependency_overrides[get_db] = previous
+    else:
+        app.dependency_overrides.pop(get_db, None)
+    sync_engine.dispose()
+
+
+@pytest.fixture
+def alerts(client):
+    """Seven alerts for one user, two sharing a timestamp, plus another user's alert."""
+    _, db = client
+    users = [User(id=USER_A, email="a@example.com"), User(id=USER_B, email="b@example.com")]
+    db.add_all(users)
+    db.add_all([
+        Preference(id="pref-a", user_id=USER_A, car_pref={}),
+        Preference(id="pref-b", user_id=USER_B, car_pref={}),
+    ])
+
+    start = datetime(2024, 1, 1)
+    for i in range(8):
+        vin = f"{i:017d}"
+        db.add(Listing(vin=vin, source="test", attrs={
+            "make": "Honda",
+            "year": 2020 + i,
+            "price": 20000.0 + i,
+            "photos": [f"https://example.com/{i}.jpg"],
+            "dealer": {"name": f"Dealer {i}", "city": "Austin"},
+            "raw_data": {"large": "x" * 1000},
+        }))
+        db.add(Alert(
+            id=f"alert-{i}",
+            preference_id="pref-b" if i == 7 else "pref-a",
+            vin=vin,
+            similarity_score=0.9,
+            created_at=start + timedelta(hours=min(i, 5))
+        ))
+    db.commit()
+    return [f"alert-{i}" for i in range(7)]
+
+
+class TestAlertsFeed:
+    """Test the keyset-paginated alerts feed."""
+
+    def test_cursor_walks_every_alert_once(self, client, alerts):
+        """Pages follow (created_at, id) order without gaps or repeats."""
+        http, _ = client
+        seen = []
+        cursor = None
+        while True:
+            params = {"user_id": USER_A, "limit": 2}
+            if cursor:
+                params["cursor"] = cursor
+            response = http.get("/api/alerts/feed", params=params)
+            assert response.status_code == 200
+            seen += [alert["id"] for alert in response.json()]
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+
+        # alert-5 and alert-6 share created_at, so the id breaks the tie
+        assert seen == ["alert-6", "alert-5", "alert-4", "alert-3", "alert-2", "alert-1", "alert-0"]
+
+    def test_projects_listing_fields(self, client, alerts):
+        """Listing fields are read from the attrs JSON paths."""
+        http, _ = client
+        response = http.get("/api/alerts/feed", params={"user_id": USER_A, "limit": 1})
+        listing = response.json()[0]["listing"]
+
+        assert listing["vin"] == "6".zfill(17)
+        assert listing["make"] == "Honda"
+        assert listing["year"] == 2026
+        assert listing["price"] == 20006.0
+        assert listing["photos"] == ["https://example.com/6.jpg"]
+        assert listing["dealer"]["name"] == "Dealer 6"
+
+    def test_invalid_cursor(self, client, alerts):
+        """A malformed cursor is rejected."""
+        http, _ = client
+        response = http.get("/api/alerts/feed", params={"cursor": "not-a-cursor"})
+        assert response.status_code == 400
+
+
+class TestAlertStats:
+    """Test /alerts/stats from SQL aggregates and from the counters."""
+
+    def test_sql_aggregates(self, client, alerts):
+        """Totals, unseen and per-day counts are computed in the database."""
+        http, db = client
+        db.query(Alert).filter(Alert.id == "alert-0").update({"viewed_at": datetime(2024, 1, 2)})
+        db.commit()
+
+        stats = http.get("/api/alerts/stats", params={"user_id": USER_A}).json()
+        assert stats == {"total_alerts": 7, "unseen_alerts": 6, "alerts_by_day": {"2024-01-01": 7}}
+
+        everyone = http.get("/api/alerts/stats").json()
+        assert everyone["total_alerts"] == 8
+
+    def test_counters_track_inserts_and_views(self, client, alerts, monkeypatch):
+        """Counters follow alert inserts and mark-viewed, matching the aggregates."""
+        from app.config import settings
+        from app.matching.backfill import insert_alerts
+
+        http, db = client
+        monkeypatch.setattr(settings, "alert_stats_counters", True)
+        db.add(Listing(vin="X" * 17, source="test", attrs={}))
+        db.add(Listing(vin="Y" * 17, source="test", attrs={}))
+        db.commit()
+
+        insert_alerts(db, "pref-a", [("X" * 17, 0.9), ("Y" * 17, 0.85)])
+        db.commit()
+        created = db.query(Alert).filter(Alert.vin == "X" * 17).one()
+
+        assert http.post(f"/api/alerts/{created.id}/mark-viewed").status_code == 200
+        # Viewing twice only counts once
+        assert http.post(f"/api/alerts/{created.id}/mark-viewed").status_code == 200
+
+        stats = http.get("/api/alerts/stats", params={"user_id": USER_A}).json()
+        assert stats["total_alerts"] == 2
+        assert stats["unseen_alerts"] == 1
+        assert sum(stats["alerts_by_day"].values()) == 2
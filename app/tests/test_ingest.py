@@ -0,0 +1,402 @@
+"""Unit tests for listing ingestion."""
+import asyncio
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.database import Base
+from app.ingest.archive import load_raw_listing
+from app.ingest import coordinator as coordinator_module, guard
+from app.ingest.guard import CircuitOpenError, get_guard_backend, send_with_retries
+from app.ingest.lifecycle import expire_stale_listings, price_history
+from app.ingest.sweep import haversine_miles, plan_tiles, user_locations
+from app.ingest.upsert import UpsertResult, bulk_upsert_listings, listing_content_hash
+from app.ingest.watermarks import WATERMARK_OVERLAP, advance_watermarks, changed_since
+from app.models.schemas import IngestWatermark, Listing, ListingRawArchive, Preference, User
+
+
+@pytest.fixture
+def db(tmp_path):
+    """Session on a throwaway SQLite database."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'ingest.db'}")
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+def make_listing(vin, price=30000, **extra):
+    """Transformed listing as produced by the source clients."""
+    return {
+        "vin": vin,
+        "source": "marketcheck",
+        "make": "Toyota",
+        "price": price,
+        "fetched_at": "2024-01-01T00:00:00",
+        **extra
+    }
+
+
+class TestBulkUpsert:
+    """Test the bulk listing upsert."""
+
+    def test_new_updated_and_unchanged(self, db):
+        """VINs are classified and only changed rows are rewritten."""
+        first = bulk_upsert_listings(db, [make_listing("A" * 17), make_listing("B" * 17)])
+        db.commit()
+        assert sorted(first.new_vins) == ["A" * 17, "B" * 17]
+
+        second = bulk_upsert_listings(db, [
+            make_listing("A" * 17, fetched_at="2024-02-01T00:00:00"),
+            make_listing("B" * 17, price=28000),
+            make_listing("C" * 17),
+        ])
+        db.commit()
+
+        assert second.unchanged_vins == ["A" * 17]
+        assert second.updated_vins == ["B" * 17]
+        assert second.new_vins == ["C" * 17]
+        assert db.get(Listing, "B" * 17).attrs["price"] == 28000
+        assert db.get(Listing, "B" * 17).price == 28000
+        assert db.query(Listing).count() == 3
+
+    def test_filter_columns(self, db):
+        """Filterable fields are copied into typed columns; blanks become NULL."""
+        bulk_upsert_listings(db, [
+            make_listing("A" * 17, body_type="SUV", drivetrain="AWD", year="2021", mileage=12000.0),
+            make_listing("B" * 17, price=0, body_type="", make=None),
+        ])
+        db.commit()
+
+        a, b = db.get(Listing, "A" * 17), db.get(Listing, "B" * 17)
+        assert (a.make, a.year, a.price, a.mileage) == ("Toyota", 2021, 30000.0, 12000)
+        assert (a.body_type, a.drivetrain) == ("suv", "AWD")
+        assert (b.make, b.price, b.body_type, b.year) == (None, None, None, None)
+
+    def test_duplicate_vins_in_batch(self, db):
+        """The last copy of a VIN within one batch wins."""
+        result = bulk_upsert_listings(db, [
+            make_listing("A" * 17, price=1),
+            make_listing("A" * 17, price=2),
+            {"source": "autodev"},
+        ])
+        db.commit()
+
+        assert result.new_vins == ["A" * 17]
+        assert db.get(Listing, "A" * 17).attrs["price"] == 2
+
+    def test_raw_data_is_archived_outside_attrs(self, db):
+        """Provider payloads are compressed into the archive and can be rehydrated."""
+        raw = {"vin": "A" * 17, "build": {"make": "Toyota"}, "extra": {"notes": "x" * 5000}}
+        bulk_upsert_listings(db, [make_listing("A" * 17, raw_data=raw)])
+        db.commit()
+
+        listing = db.get(Listing, "A" * 17)
+        assert "raw_data" not in listing.attrs
+        assert listing.attrs["make"] == "Toyota"
+
+        archived = db.query(ListingRawArchive).one()
+        assert archived.fetched_at == datetime(2024, 1, 1)
+        assert len(archived.payload) < 1000
+        assert load_raw_listing(db, "A" * 17) == raw
+
+        # An unchanged refetch does not archive another copy
+        refetched = make_listing("A" * 17, raw_data=raw, fetched_at="2024-01-02T00:00:00")
+        bulk_upsert_listings(db, [refetched])
+        db.commit()
+        assert db.query(ListingRawArchive).count() == 1
+
+
+class TestProviderGuard:
+    """Test retries, rate limiting and circuit breaking of provider requests."""
+
+    @pytest.fixture(autouse=True)
+    def local_guard(self, monkeypatch):
+        """Local guard state and recorded (instead of real) sleeps."""
+        from app.config import settings
+
+        monkeypatch.setattr(settings, "ingest_guard_backend", "local")
+        monkeypatch.setattr(settings, "ingest_rate_limits", {})
+        sleeps = []
+
+        async def fake_sleep(seconds):
+            sleeps.append(seconds)
+
+        monkeypatch.setattr(guard.asyncio, "sleep", fake_sleep)
+        return sleeps
+
+    @staticmethod
+    def client(responses):
+        """Client whose transport replays canned responses and counts calls."""
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return responses[min(len(calls), len(responses)) - 1]
+
+        return httpx.AsyncClient(transport=httpx.MockTransport(handler)), calls
+
+    def test_retry_after_is_honoured(self, local_guard):
+        """A 429 is retried after the delay the provider asked for."""
+        async def run():
+            client, calls = self.client([
+                httpx.Response(429, headers={"Retry-After": "2"}),
+                httpx.Response(200, json={"ok": True}),
+            ])
+            response = await send_with_retries("marketcheck", "key", lambda: client.get("https://x.test"))
+            return response, calls, await get_guard_backend().snapshot("marketcheck")
+
+        response, calls, metrics = asyncio.run(run())
+        assert response.status_code == 200
+        assert len(calls) == 2
+        assert local_guard == [2.0]
+        assert metrics["throttled"] == 1 and metrics["retries"] == 1
+        assert metrics["circuit"] == "closed"
+
+    def test_circuit_opens_and_sheds_load(self, monkeypatch):
+        """Repeated 5xx open the circuit; later requests never reach the provider."""
+        from app.config import settings
+
+        monkeypatch.setattr(settings, "ingest_breaker_threshold", 2)
+        monkeypatch.setattr(settings, "ingest_max_retries", 1)
+
+        async def run():
+            client, calls = self.client([httpx.Response(503)])
+            first = await send_with_retries("autodev", "key", lambda: client.get("https://x.test"))
+            with pytest.raises(CircuitOpenError):
+                await send_with_retries("autodev", "key", lambda: client.get("https://x.test"))
+            return first, calls, await get_guard_backend().snapshot("autodev")
+
+        first, calls, metrics = asyncio.run(run())
+        assert first.status_code == 503
+        assert len(calls) == 2
+        assert metrics["circuit"] == "open"
+        assert metrics["rejected"] == 1
+
+    def test_throttled_probe_closes_the_circuit(self, local_guard, monkeypatch):
+        """A 429 on the half-open probe proves the provider is up; its retry goes through."""
+        from app.config import settings
+
+        monkeypatch.setattr(settings, "ingest_breaker_threshold", 1)
+        monkeypatch.setattr(settings, "ingest_breaker_cooldown_seconds", 0.0)
+        monkeypatch.setattr(settings, "ingest_max_retries", 2)
+
+        async def run():
+            client, calls = self.client([
+                httpx.Response(429, headers={"Retry-After": "1"}),
+                httpx.Response(200),
+            ])
+            backend = get_guard_backend()
+            await backend.breaker_failure("autodev")
+            response = await send_with_retries("autodev", "key", lambda: client.get("https://x.test"))
+            return response, calls, await backend.snapshot("autodev")
+
+        response, calls, metrics = asyncio.run(run())
+        assert response.status_code == 200
+        assert len(calls) == 2
+        assert local_guard == [1.0]
+        assert metrics["circuit"] == "closed"
+        assert metrics.get("rejected", 0) == 0
+
+    def test_token_bucket_spaces_requests(self, local_guard, monkeypatch):
+        """Past the burst, each request waits for its token."""
+        from app.config import settings
+
+        monkeypatch.setattr(settings, "ingest_rate_limits", {"marketcheck": 10.0})
+        monkeypatch.setattr(settings, "ingest_rate_burst", 2)
+
+        async def run():
+            client, _ = self.client([httpx.Response(200)])
+            for _ in range(4):
+                await send_with_retries("marketcheck", "key", lambda: client.get("https://x.test"))
+
+        asyncio.run(run())
+        assert len(local_guard) == 2
+        assert local_guard[1] > local_guard[0] > 0
+
+
+class TestIngestSweep:
+    """Test planning the geographic sweep tiles."""
+
+    def test_tiles_cover_every_user_with_few_searches(self):
+        """Greedy cover picks central ZIPs and leaves no user outside a tile."""
+        locations = {
+            # Austin area, all within 25 miles of 78701
+            "78701": (30.27, -97.74, 5),
+            "78613": (30.50, -97.82, 2),
+            "78610": (30.08, -97.84, 1),
+            # Dallas, far from Austin
+            "75201": (32.79, -96.80, 3),
+        }
+        tiles = plan_tiles(locations, radius=25)
+
+        assert [tile.zip_code for tile in tiles] == ["78701", "75201"]
+        assert sum(tile.users for tile in tiles) == 11
+        for tile in tiles:
+            for zip_code in tile.zip_codes:
+                lat, lon, _ = locations[zip_code]
+                assert haversine_miles(tile.latitude, tile.longitude, lat, lon) <= 25
+
+    def test_user_locations(self, db):
+        """Only users with an active preference and a location are swept."""
+        db.add_all([
+            User(id="u1", email="1@example.com", settings={"zip_code": "78701", "latitude": 30.27, "longitude": -97.74}),
+            User(id="u2", email="2@example.com", settings={"zip_code": "78701", "latitude": 30.27, "longitude": -97.74}),
+            User(id="u3", email="3@example.com", settings={"zip_code": "99999"}),
+            User(id="u4", email="4@example.com", settings={"zip_code": "75201", "latitude": 32.79, "longitude": -96.80}),
+            Preference(user_id="u1", car_pref={}),
+            Preference(user_id="u2", car_pref={}),
+            Preference(user_id="u3", car_pref={}),
+            Preference(user_id="u4", car_pref={}, is_active=False),
+        ])
+        db.commit()
+
+        assert user_locations(db) == {"78701": (30.27, -97.74, 2)}
+
+
+class TestIncrementalIngest:
+    """Test changed-since watermarks and the coordinator's listing counts."""
+
+    def test_watermarks(self, db):
+        """Sources fetch in full first and when due, otherwise since their last fetch."""
+        start = datetime(2024, 1, 1)
+        assert changed_since(db, ["marketcheck"], "78701", 50, now=start) == {"marketcheck": None}
+
+        advance_watermarks(db, ["marketcheck", "autodev"], "78701", 50, start,
+                           full={"marketcheck": True, "autodev": True})
+        db.commit()
+        later = start + timedelta(hours=1)
+        advance_watermarks(db, ["marketcheck"], "78701", 50, later, full={"marketcheck": False})
+        db.commit()
+
+        since = changed_since(db, ["marketcheck", "autodev"], "78701", 50, now=later + timedelta(hours=1))
+        assert since == {"marketcheck": later - WATERMARK_OVERLAP, "autodev": start - WATERMARK_OVERLAP}
+        # Another area has its own watermark
+        assert changed_since(db, ["marketcheck"], "75201", 50, now=later) == {"marketcheck": None}
+        # The incremental fetch did not postpone the next full one
+        assert changed_since(db, ["marketcheck"], "78701", 50, now=start + timedelta(days=1, minutes=1)) == {
+            "marketcheck": None
+        }
+
+    def test_coordinator_counts_and_cut_offs(self, monkeypatch):
+        """Only sources that support it get the cut-off; counts come from the upserts."""
+        from app.config import settings
+
+        monkeypatch.setattr(settings, "ingest_page_size", 2)
+        received = {}
+
+        class Source:
+            SUPPORTS_CHANGED_SINCE = True
+
+            def __init__(self, name):
+                self.name = name
+
+            async def iter_listings(self, zip_code, radius, page_size, max_results, **options):
+                received[self.name] = options.get("changed_since")
+                for i in range(3):
+                    yield make_listing(f"{self.name[0].upper()}{i}".ljust(17, "0"))
+
+        class FullSource(Source):
+            SUPPORTS_CHANGED_SINCE = False
+
+        monkeypatch.setattr(coordinator_module, "_SOURCES", {
+            "delta": lambda: Source("delta"),
+            "whole": lambda: FullSource("whole"),
+        })
+
+        def save(listings):
+            vins = [listing["vin"] for listing in listings]
+            return UpsertResult(new_vins=vins[:1], updated_vins=vins[1:2], unchanged_vins=vins[2:])
+
+        cut_off = datetime(2024, 1, 1)
+        results = asyncio.run(coordinator_module.IngestCoordinator().ingest(
+            "78701", 50, save, since={"delta": cut_off, "whole": cut_off}
+        ))
+
+        assert received == {"delta": cut_off, "whole": None}
+        assert results["delta"] == results["whole"] == 3
+        # Batches of two and one per source
+        assert results["new_listings"] == 4
+        assert results["changed_listings"] == 2
+        assert results["unchanged_listings"] == 0
+        assert sorted(results["complete_sources"]) == ["delta", "whole"]
+        assert results["full_sources"] == ["whole"]
+        assert results["errors"] == []
+
+    def test_failed_source_keeps_saved_counts(self, monkeypatch):
+        """Pages saved before a source fails are still counted."""
+        from app.config import settings
+
+        monkeypatch.setattr(settings, "ingest_page_size", 2)
+
+        class FailingSource:
+            async def iter_listings(self, zip_code, radius, page_size, max_results, **options):
+                for i in range(3):
+                    yield make_listing(f"F{i}".ljust(17, "0"))
+                raise RuntimeError("provider went away")
+
+        monkeypatch.setattr(coordinator_module, "_SOURCES", {"failing": FailingSource})
+
+        def save(listings):
+            return UpsertResult(new_vins=[listing["vin"] for listing in listings])
+
+        results = asyncio.run(coordinator_module.IngestCoordinator().ingest("78701", 50, save))
+
+        # The first page was saved; the partial second one never was
+        assert results["failing"] == 2
+        assert results["new_listings"] == 2
+        assert results["complete_sources"] == []
+        assert results["errors"] == ["failing: provider went away"]
+
+
+class TestListingLifecycle:
+    """Test last-seen tracking, expiry and the price history."""
+
+    def test_price_history_records_changes_only(self, db):
+        """New listings and price/mileage changes append a point; other edits do not."""
+        vin = "P" * 17
+        bulk_upsert_listings(db, [make_listing(vin, price=30000, mileage=12000)])
+        bulk_upsert_listings(db, [make_listing(vin, price=30000, mileage=12000, trim="XLE")])
+        bulk_upsert_listings(db, [make_listing(vin, price=28500, mileage=12000, trim="XLE")])
+        bulk_upsert_listings(db, [make_listing(vin, price=28500, mileage=12000, trim="XLE")])
+        db.commit()
+
+        assert [point[1:] for point in price_history(db, vin)] == [(30000.0, 12000), (28500.0, 12000)]
+
+    def test_expiry_and_revival(self, db):
+        """Listings unseen since before the cut-off expire, and come back when fetched again."""
+        from app.config import settings
+
+        now = datetime(2024, 1, 10)
+        interval = timedelta(seconds=settings.ingest_full_fetch_interval_seconds)
+        stale = now - (settings.listing_expiry_full_fetches + 1) * interval
+        db.add_all([
+            Listing(vin="S" * 17, source="marketcheck", attrs={}, last_seen_at=stale),
+            Listing(vin="F" * 17, source="marketcheck", attrs={}, last_seen_at=now - interval),
+            # Never fetched in full from this source: kept
+            Listing(vin="O" * 17, source="autodev", attrs={}, last_seen_at=stale),
+            IngestWatermark(source="marketcheck", zip_code="78701", radius=50,
+                            fetched_since=now, full_fetch_at=now - timedelta(hours=1)),
+        ])
+        db.commit()
+
+        assert expire_stale_listings(db, now) == {"marketcheck": 1}
+        db.commit()
+        assert [vin for (vin,) in db.query(Listing.vin).filter(Listing.expired_at.isnot(None))] == ["S" * 17]
+
+        # Fetched again with the stored content: revived without being rewritten
+        content = make_listing("S" * 17)
+        db.query(Listing).filter(Listing.vin == "S" * 17).update(
+            {"content_hash": listing_content_hash(content)}
+        )
+        db.commit()
+        result = bulk_upsert_listings(db, [content])
+        db.commit()
+        db.expire_all()
+
+        assert result.unchanged_vins == ["S" * 17]
+        revived = db.get(Listing, "S" * 17)
+        assert revived.expired_at is None and revived.last_seen_at > now
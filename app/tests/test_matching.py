@@ -0,0 +1,711 @@
+"""Unit tests for preference matching."""
+import numpy as np
+import pytest
+
+from app.ingest.upsert import bulk_upsert_listings, listing_columns
+from app.matching.ann import IndexedPreferenceMatrix, IVFIndex
+from app.matching.backfill import insert_alerts, scan_listings
+from app.matching.embedding_cache import DiskEmbeddingBackend, EmbeddingCache
+from app.matching.matrix import PreferenceMatrix, normalize_embedding, passes_hard_filters
+from app.matching.rematch import rematch_changed_listings
+from app.models.schemas import Alert, AlertType, Listing, Preference
+from app.models.types import decode_embedding, encode_embedding
+
+
+DIM = 8
+
+
+def reference_match(preferences, listing_attrs, embedding, threshold=0.8):
+    """Per-preference loop the matrix has to agree with."""
+    matches = []
+    query = np.asarray(embedding)
+    for preference_id, car_pref, vector in preferences:
+        if car_pref.get("body_style") and listing_attrs.get("body_type"):
+            if car_pref["body_style"].lower() != listing_attrs["body_type"].lower():
+                continue
+        if car_pref.get("drivetrain") and listing_attrs.get("drivetrain"):
+            if car_pref["drivetrain"] != listing_attrs["drivetrain"]:
+                continue
+        if car_pref.get("budget_usd") and listing_attrs.get("price"):
+            if listing_attrs["price"] > car_pref["budget_usd"]:
+                continue
+        if car_pref.get("brand_exclusions") and listing_attrs.get("make"):
+            if listing_attrs["make"] in car_pref["brand_exclusions"]:
+                continue
+        vector = np.asarray(vector)
+        similarity = vector @ query / (np.linalg.norm(vector) * np.linalg.norm(query))
+        if similarity > threshold:
+            matches.append((preference_id, similarity))
+    matches.sort(key=lambda x: x[1], reverse=True)
+    return matches
+
+
+@pytest.fixture
+def preferences():
+    """Random preferences clustered around a shared direction."""
+    rng = np.random.default_rng(0)
+    base = rng.normal(size=DIM)
+    styles = ["SUV", "Sedan", "Coupe"]
+    drivetrains = ["AWD", "FWD", "RWD"]
+    prefs = []
+    for i in range(300):
+        car_pref = {
+            "body_style": styles[i % 3],
+            "drivetrain": drivetrains[(i // 3) % 3],
+            "budget_usd": [None, 30000, 50000][(i // 9) % 3],
+            "brand_exclusions": ["Tesla"] if i % 4 == 0 else [],
+        }
+        vector = base + rng.normal(scale=0.5, size=DIM)
+        prefs.append((f"pref-{i}", car_pref, vector.tolist()))
+    return prefs
+
+
+@pytest.fixture
+def db(tmp_path):
+    """Session on a throwaway SQLite database."""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+
+    from app.database import Base
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'matching.db'}")
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+class TestPreferenceMatrix:
+    """Test the vectorized preference matrix."""
+
+    def test_matches_reference_loop(self, preferences):
+        """Matrix results agree with the per-preference loop."""
+        matrix = PreferenceMatrix(dim=DIM, capacity=16)
+        for preference_id, car_pref, vector in preferences:
+            matrix.add(preference_id, car_pref, vector)
+
+        rng = np.random.default_rng(1)
+        listings = [
+            {"body_type": "suv", "drivetrain": "AWD", "price": 40000, "make": "Tesla"},
+            {"body_type": "Sedan", "price": 25000, "make": "Honda"},
+            {"drivetrain": "RWD"},
+            {"body_type": "Truck", "drivetrain": "4WD"},
+        ]
+        for attrs in listings:
+            embedding = (np.asarray(preferences[0][2]) + rng.normal(scale=0.3, size=DIM)).tolist()
+            expected = reference_match(preferences, attrs, embedding)
+            actual = matrix.match(attrs, embedding)
+
+            assert [pid for pid, _ in actual] == [pid for pid, _ in expected]
+            for (_, got), (_, want) in zip(actual, expected):
+                assert got == pytest.approx(want, abs=1e-5)
+
+    def test_remove_and_compact(self, preferences):
+        """Removed preferences stop matching and compaction keeps the rest."""
+        matrix = PreferenceMatrix(dim=DIM)
+        for preference_id, car_pref, vector in preferences:
+            matrix.add(preference_id, car_pref, vector)
+
+        embedding = preferences[0][2]
+        before = dict(matrix.match({}, embedding))
+        removed = [pid for pid, _, _ in preferences[::2]]
+        for preference_id in removed:
+            matrix.remove(preference_id)
+        matrix._compact()
+
+        after = dict(matrix.match({}, embedding))
+        assert len(matrix) == len(preferences) - len(removed)
+        assert not set(after) & set(removed)
+        assert after == pytest.approx({k: v for k, v in before.items() if k not in removed})
+
+    def test_zero_embedding_matches_nothing(self, preferences):
+        """A zero listing embedding never produces matches."""
+        matrix = PreferenceMatrix(dim=DIM)
+        for preference_id, car_pref, vector in preferences:
+            matrix.add(preference_id, car_pref, vector)
+
+        assert matrix.match({}, [0.0] * DIM) == []
+
+    def test_match_many_agrees_with_match(self, preferences):
+        """Batch scoring returns the same matches as one-by-one scoring."""
+        matrix = PreferenceMatrix(dim=DIM)
+        for preference_id, car_pref, vector in preferences:
+            matrix.add(preference_id, car_pref, vector)
+
+        rng = np.random.default_rng(2)
+        listings = [
+            {"body_type": "SUV", "price": 45000},
+            {"drivetrain": "FWD", "make": "Tesla"},
+            {},
+        ]
+        embeddings = [
+            (np.asarray(preferences[0][2]) + rng.normal(scale=0.3, size=DIM)).tolist()
+            for _ in listings
+        ] + [[0.0] * DIM]
+        listings.append({})
+
+        batch = matrix.match_many(listings, embeddings)
+        for attrs, embedding, matches in zip(listings, embeddings, batch):
+            single = matrix.match(attrs, embedding)
+            assert [pid for pid, _ in matches] == [pid for pid, _ in single]
+            assert [s for _, s in matches] == pytest.approx([s for _, s in single], abs=1e-5)
+
+    def test_quantized_matches_are_exact(self, preferences):
+        """int8 pre-scoring with re-ranking returns exactly the float32 matches."""
+        exact = PreferenceMatrix(dim=DIM)
+        quantized = PreferenceMatrix(dim=DIM, quantized=True)
+        for preference_id, car_pref, vector in preferences:
+            exact.add(preference_id, car_pref, vector)
+            unit, _ = normalize_embedding(vector)
+            quantized.add(preference_id, car_pref, unit, normalized=True)
+
+        rng = np.random.default_rng(3)
+        listings = [{"body_type": "SUV"}, {"price": 35000}, {}]
+        embeddings = [
+            (np.asarray(preferences[0][2]) + rng.normal(scale=0.3, size=DIM)).tolist()
+            for _ in listings
+        ]
+
+        batch = quantized.match_many(listings, embeddings)
+        for attrs, embedding, matches in zip(listings, embeddings, batch):
+            expected = exact.match(attrs, embedding)
+            for actual in (matches, quantized.match(attrs, embedding)):
+                assert [pid for pid, _ in actual] == [pid for pid, _ in expected]
+                assert [s for _, s in actual] == pytest.approx([s for _, s in expected], abs=1e-6)
+
+    def test_scalar_filters_agree_with_mask(self, preferences):
+        """passes_hard_filters and filter_mask make the same decisions."""
+        matrix = PreferenceMatrix(dim=DIM)
+        for preference_id, car_pref, vector in preferences:
+            matrix.add(preference_id, car_pref, vector)
+
+        attrs = {"body_type": "coupe", "drivetrain": "RWD", "price": 35000, "make": "Tesla"}
+        mask = matrix.filter_mask(attrs)
+        expected = [passes_hard_filters(car_pref, attrs) for _, car_pref, _ in preferences]
+        assert mask.tolist() == expected
+
+    def test_filter_index_tracks_changes(self, preferences):
+        """Indexed candidates equal the filter mask through adds, replaces, removes and compaction."""
+        rng = np.random.default_rng(5)
+        matrix = PreferenceMatrix(dim=DIM)
+        listings = [
+            {},
+            {"body_type": "suv", "price": 40000},
+            {"body_type": "Coupe", "drivetrain": "RWD", "price": 35000, "make": "Tesla"},
+            {"body_type": "Wagon", "drivetrain": "AWD", "price": 0},
+            {"drivetrain": "FWD", "price": 60000, "make": "Honda"},
+        ]
+
+        def check():
+            for attrs in listings:
+                expected = np.flatnonzero(matrix.filter_mask(attrs))
+                assert matrix.candidates(attrs).tolist() == expected.tolist()
+
+        # Enough rows for bucket merges and matrix compaction to kick in
+        for round_ in range(8):
+            for preference_id, car_pref, vector in preferences:
+                matrix.add(f"{preference_id}-{round_}", car_pref, vector)
+            check()
+        for preference_id, car_pref, vector in preferences[::2]:
+            matrix.add(f"{preference_id}-0", {**car_pref, "budget_usd": 45000}, vector)
+        check()
+        for preference_id in rng.permutation(matrix.ids)[:1800]:
+            matrix.remove(str(preference_id))
+        check()
+
+
+class TestEmbeddingCache:
+    """Test the content-addressed embedding cache."""
+
+    def test_disk_roundtrip_and_counters(self, tmp_path):
+        """Stored embeddings come back as float32 values and count as hits."""
+        backend = DiskEmbeddingBackend(str(tmp_path / "emb.sqlite3"), ttl_seconds=60, max_entries=10)
+        cache = EmbeddingCache(backend, "text-embedding-ada-002")
+
+        assert cache.get_many(["a", "b"]) == [None, None]
+        cache.set_many(["a"], [[0.25, -1.5, 3.0]])
+
+        assert cache.get_many(["a", "b"]) == [[0.25, -1.5, 3.0], None]
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 3
+
+    def test_key_depends_on_model(self, tmp_path):
+        """The same text under another model is a different entry."""
+        backend = DiskEmbeddingBackend(str(tmp_path / "emb.sqlite3"), ttl_seconds=60, max_entries=10)
+        EmbeddingCache(backend, "model-a").set_many(["text"], [[1.0]])
+
+        assert EmbeddingCache(backend, "model-b").get_many(["text"]) == [None]
+
+    def test_lru_eviction(self, tmp_path):
+        """Least recently used entries are evicted beyond max_entries."""
+        backend = DiskEmbeddingBackend(str(tmp_path / "emb.sqlite3"), ttl_seconds=60, max_entries=2)
+        backend.EVICT_EVERY = 1
+        cache = EmbeddingCache(backend, "m")
+
+        cache.set_many(["a"], [[1.0]])
+        cache.set_many(["b"], [[2.0]])
+        cache.get_many(["a"])
+        cache.set_many(["c"], [[3.0]])
+
+        assert cache.get_many(["a", "b", "c"]) == [[1.0], None, [3.0]]
+
+
+class TestEmbeddingStorage:
+    """Test the binary embedding column format."""
+
+    def test_float32_roundtrip_is_exact_and_zero_copy(self):
+        """float32 blobs decode to a view over the stored bytes."""
+        vector = np.random.default_rng(0).normal(size=1536).astype(np.float32)
+        blob = encode_embedding(vector)
+        decoded = decode_embedding(blob)
+
+        assert len(blob) == 4 + 1536 * 4
+        assert np.array_equal(decoded, vector)
+        assert not decoded.flags.owndata
+
+    @pytest.mark.parametrize("storage,tolerance", [("float16", 1e-3), ("int8", 1e-2)])
+    def test_compact_formats_are_close(self, storage, tolerance):
+        """float16 and int8 blobs keep the vector's direction."""
+        vector = np.random.default_rng(1).normal(size=1536).astype(np.float32)
+        decoded = decode_embedding(encode_embedding(vector, storage))
+
+        cosine = decoded @ vector / (np.linalg.norm(decoded) * np.linalg.norm(vector))
+        assert decoded.dtype == np.float32
+        assert cosine > 1 - tolerance
+
+    def test_column_reads_blobs_and_legacy_json(self, db):
+        """The column decodes both new blobs and old JSON float lists."""
+        import json
+        from sqlalchemy import text
+
+        db.add(Listing(vin="A" * 17, source="test", attrs={}, embedding=[0.5] * 1536))
+        db.add(Listing(vin="B" * 17, source="test", attrs={}))
+        db.commit()
+        db.execute(
+            text("UPDATE listings SET embedding = :legacy WHERE vin = :vin"),
+            {"legacy": json.dumps([0.25] * 1536), "vin": "B" * 17}
+        )
+        db.commit()
+        db.expire_all()
+
+        blob, legacy = db.query(Listing).order_by(Listing.vin).all()
+        assert isinstance(blob.embedding, np.ndarray)
+        assert np.allclose(blob.embedding, 0.5)
+        assert np.allclose(legacy.embedding, 0.25)
+
+
+class TestBackfill:
+    """Test matching a new preference against existing listings."""
+
+    def test_scan_agrees_with_reference_and_skips_existing_alerts(self, db, preferences):
+        """Top-k scan honours the hard filters; existing alerts are not duplicated."""
+        rng = np.random.default_rng(4)
+        styles = ["SUV", "Sedan"]
+        listings = []
+        for i in range(200):
+            attrs = {
+                "body_type": styles[i % 2],
+                "price": 20000 + 1000 * (i % 30),
+                "make": "Tesla" if i % 5 == 0 else "Honda"
+            }
+            vector = np.asarray(preferences[0][2]) + rng.normal(scale=0.5, size=DIM)
+            unit, norm = normalize_embedding(vector)
+            # Every third row predates write-time normalization
+            if i % 3 == 0:
+                unit, norm = vector, None
+            listing = Listing(
+                vin=f"{i:017d}", source="test", attrs=attrs, embedding=unit, embedding_norm=norm,
+                **listing_columns(attrs)
+            )
+            listings.append((listing.vin, attrs, vector))
+            db.add(listing)
+        db.add(Preference(id="pref", user_id="user", car_pref={}))
+        db.commit()
+
+        car_pref = {"body_style": "suv", "budget_usd": 40000, "brand_exclusions": ["Tesla"]}
+        embedding = preferences[0][2]
+        expected = reference_match(listings, {}, embedding)
+        expected = [
+            (vin, score) for vin, score in expected
+            if passes_hard_filters(car_pref, dict(listings[int(vin)][1]))
+        ][:5]
+
+        matches = scan_listings(db, car_pref, embedding, limit=5)
+        assert [vin for vin, _ in matches] == [vin for vin, _ in expected]
+        assert [s for _, s in matches] == pytest.approx([s for _, s in expected], abs=1e-5)
+
+        first = insert_alerts(db, "pref", matches[:2])
+        db.commit()
+        second = insert_alerts(db, "pref", matches)
+        db.commit()
+        assert len(first) == 2
+        assert len(second) == len(matches) - 2
+        assert db.query(Alert).count() == len(matches)
+
+
+class TestVectorSearch:
+    """Test paging through nearest-neighbour candidates."""
+
+    def test_pages_past_the_first_limit(self, db, monkeypatch):
+        """Candidates beyond the first page and the HNSW cap are still returned, nearest first."""
+        from sqlalchemy import select
+
+        from app.matching import vector_search
+
+        queries = []
+        monkeypatch.setattr(vector_search.settings, "vector_search_limit", 2)
+        monkeypatch.setattr(vector_search, "HNSW_MAX_EF_SEARCH", 4)
+        monkeypatch.setattr(vector_search, "_set_ef_search", lambda session, limit: queries.append(limit))
+        for i in range(10):
+            db.add(Listing(vin=f"{i:017d}", source="test", attrs={}, price=10 - i))
+        db.commit()
+
+        distance = Listing.price
+        query = select(Listing.vin, distance.label("distance")).where(distance < 9)
+        accept = lambda row: int(row.vin) % 2 == 1
+
+        rows = vector_search._nearest_rows(db, query, distance, accept)
+        assert [row.distance for row in rows] == [1, 3, 5, 7]
+        assert queries == [2, 4]
+
+        # A limit stops paging once enough rows pass
+        queries.clear()
+        rows = vector_search._nearest_rows(db, query, distance, accept, limit=1)
+        assert [row.distance for row in rows] == [1]
+        assert queries == [2]
+
+
+class TestRematch:
+    """Test re-matching listings whose hard-filter fields changed."""
+
+    def test_match_delta_is_the_difference_of_matches(self, preferences):
+        """Only preferences the old values ruled out and the new ones do not are returned."""
+        matrix = PreferenceMatrix(dim=DIM)
+        for preference_id, car_pref, vector in preferences:
+            matrix.add(preference_id, car_pref, vector)
+
+        embedding = preferences[5][2]
+        old = {"body_type": "SUV", "drivetrain": "AWD", "price": 45000, "make": "Honda"}
+        new = {**old, "price": 28000}
+        before = {preference_id for preference_id, _ in reference_match(preferences, old, embedding)}
+        expected = [match for match in reference_match(preferences, new, embedding) if match[0] not in before]
+
+        delta = matrix.match_delta(old, new, embedding)
+        assert expected
+        assert [preference_id for preference_id, _ in delta] == [preference_id for preference_id, _ in expected]
+        assert matrix.match_delta(new, old, embedding) == []
+
+    def test_price_drop_raises_typed_alerts_once(self, db, preferences):
+        """A price cut under budget alerts with the stored embedding, once per pair and type."""
+        matrix = PreferenceMatrix(dim=DIM)
+        for preference_id, car_pref, vector in preferences:
+            matrix.add(preference_id, car_pref, vector)
+
+        vin = "1HGCM82633A004352"
+        listing = {"vin": vin, "source": "test", "body_type": "SUV", "drivetrain": "AWD",
+                   "price": 45000, "make": "Honda"}
+        bulk_upsert_listings(db, [listing])
+        db.get(Listing, vin).embedding = normalize_embedding(preferences[5][2])[0]
+        db.commit()
+
+        unchanged_filters = bulk_upsert_listings(db, [{**listing, "trim": "EX"}])
+        dropped = bulk_upsert_listings(db, [{**listing, "trim": "EX", "price": 28000}])
+        db.commit()
+        assert unchanged_filters.filter_changes == {}
+        assert dropped.filter_changes[vin]["price"] == 45000
+
+        created = rematch_changed_listings(db, matrix, dropped.filter_changes)
+        db.commit()
+        again = rematch_changed_listings(db, matrix, dropped.filter_changes)
+
+        expected = matrix.match_delta(dropped.filter_changes[vin], {**listing, "price": 28000}, preferences[5][2])
+        assert len(created) == len(expected) > 0 and again == []
+        alerts = db.query(Alert.preference_id, Alert.alert_type).all()
+        assert sorted(alerts) == sorted((preference_id, AlertType.PRICE_DROP.value) for preference_id, _ in expected)
+
+
+class TestEnrichmentBatch:
+    """Test failure handling of the batch enrichment task."""
+
+    @pytest.fixture
+    def task_env(self, db, preferences, monkeypatch):
+        """Batch task on the test database, with canned embeddings and recorded dispatches."""
+        from sqlalchemy.orm import Session
+
+        from app.tasks import celery_app as tasks
+
+        matrix = PreferenceMatrix(dim=DIM)
+        for preference_id, car_pref, vector in preferences:
+            matrix.add(preference_id, car_pref, vector)
+
+        env = {"failures": 0, "requeued": [], "embed_calls": 0}
+
+        def generate_embeddings(texts):
+            env["embed_calls"] += 1
+            if env["embed_calls"] <= env["failures"]:
+                raise RuntimeError("embeddings unavailable")
+            return [preferences[0][2] for _ in texts]
+
+        monkeypatch.setattr(tasks, "get_session", lambda: Session(db.get_bind()))
+        monkeypatch.setattr(tasks, "generate_embeddings", generate_embeddings)
+        monkeypatch.setattr(tasks, "get_preference_matrix", lambda session: matrix)
+        monkeypatch.setattr(tasks.send_alerts, "delay", lambda alert_id: None)
+        monkeypatch.setattr(tasks.enrich_and_match, "delay", env["requeued"].append)
+
+        vins = [f"{i:017d}" for i in range(3)]
+        for vin in vins:
+            db.add(Listing(vin=vin, source="test", attrs={"body_type": "SUV"}))
+        db.commit()
+        env["vins"] = vins
+        return tasks, env
+
+    def test_failed_batch_is_retried(self, db, task_env):
+        """A transient failure rolls back and the retry enriches every VIN."""
+        tasks, env = task_env
+        env["failures"] = 1
+
+        tasks.enrich_and_match_batch.apply(args=[env["vins"]])
+        db.expire_all()
+
+        assert env["embed_calls"] == 2
+        assert db.query(Listing).filter(Listing.enriched_at.is_(None)).count() == 0
+        assert db.query(Alert).count() > 0
+        assert env["requeued"] == []
+
+    def test_exhausted_retries_fall_back_to_single_vins(self, db, task_env):
+        """A batch that keeps failing hands each VIN to enrich_and_match."""
+        tasks, env = task_env
+        env["failures"] = tasks.enrich_and_match_batch.max_retries + 1
+
+        tasks.enrich_and_match_batch.apply(args=[env["vins"]])
+        db.expire_all()
+
+        assert sorted(env["requeued"]) == env["vins"]
+        assert db.query(Listing).filter(Listing.enriched_at.is_(None)).count() == 3
+
+    def test_vector_backend_matches_through_index(self, db, task_env, monkeypatch):
+        """With pgvector the batch uses the same indexed query as single-VIN enrichment."""
+        tasks, env = task_env
+        queried = []
+
+        def find_matching_preferences_indexed(session, attrs, embedding):
+            queried.append(attrs)
+            return [("pref-0", 0.99)]
+
+        monkeypatch.setattr(tasks, "supports_vector_search", lambda session: True)
+        monkeypatch.setattr(tasks, "find_matching_preferences_indexed", find_matching_preferences_indexed)
+        monkeypatch.setattr(tasks, "get_preference_matrix", None)
+
+        tasks.enrich_and_match_batch.apply(args=[env["vins"]])
+
+        assert len(queried) == 3
+        assert sorted(db.query(Alert.vin).filter(Alert.preference_id == "pref-0").all()) == [
+            (vin,) for vin in env["vins"]
+        ]
+
+    def test_failed_embeddings_request_raises(self, tmp_path, monkeypatch):
+        """OpenAI errors and zero vectors raise instead of returning placeholders, and nothing is cached."""
+        from types import SimpleNamespace
+
+        from app.tasks import celery_app as tasks
+
+        cache = EmbeddingCache(DiskEmbeddingBackend(str(tmp_path / "emb.sqlite3"), 60, 10), "m")
+        responses = [RuntimeError("rate limited"), [[0.0] * DIM, [1.0] * DIM]]
+
+        def create(model, input):
+            response = responses.pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return SimpleNamespace(data=[
+                SimpleNamespace(index=i, embedding=embedding) for i, embedding in enumerate(response)
+            ])
+
+        monkeypatch.setattr(tasks, "openai_client", SimpleNamespace(embeddings=SimpleNamespace(create=create)))
+        monkeypatch.setattr(tasks, "get_embedding_cache", lambda: cache)
+
+        with pytest.raises(RuntimeError):
+            tasks.generate_embeddings(["a", "b"])
+        with pytest.raises(ValueError):
+            tasks.generate_embeddings(["a", "b"])
+        assert cache.get_many(["a", "b"]) == [None, None]
+
+
+class TestPreferenceEmbedding:
+    """Test failure handling of the preference embedding task."""
+
+    def test_failed_embedding_is_retried_before_publishing(self, db, preferences, monkeypatch):
+        """Nothing is stored, published or backfilled until an embedding is generated."""
+        from sqlalchemy.orm import Session
+
+        from app.tasks import celery_app as tasks
+
+        calls = {"embed": 0, "failures": 2, "published": [], "backfilled": []}
+
+        def generate_embedding(text):
+            calls["embed"] += 1
+            if calls["embed"] <= calls["failures"]:
+                raise RuntimeError("embeddings unavailable")
+            return preferences[0][2]
+
+        monkeypatch.setattr(tasks, "get_session", lambda: Session(db.get_bind()))
+        monkeypatch.setattr(tasks, "generate_embedding", generate_embedding)
+        monkeypatch.setattr(tasks, "publish_preference_change", calls["published"].append)
+        monkeypatch.setattr(tasks.backfill_preference_matches, "delay", calls["backfilled"].append)
+        db.add(Preference(id="pref-0", user_id="user", car_pref={"body_type": "SUV"}))
+        db.commit()
+
+        tasks.embed_preference.apply(args=["pref-0"])
+        db.expire_all()
+
+        assert calls["embed"] == 3
+        assert db.get(Preference, "pref-0").embedding_norm > 0
+        assert calls["published"] == calls["backfilled"] == ["pref-0"]
+
+        # A preference that never gets an embedding is left unembedded and unpublished
+        calls.update(embed=0, failures=tasks.embed_preference.max_retries + 1, published=[], backfilled=[])
+        db.get(Preference, "pref-0").embedding = None
+        db.commit()
+        tasks.embed_preference.apply(args=["pref-0"])
+        db.expire_all()
+
+        assert db.get(Preference, "pref-0").embedding is None
+        assert calls["published"] == calls["backfilled"] == []
+
+
+class TestMatrixSync:
+    """Test keeping a worker's matrix in step with the preferences table."""
+
+    def test_watermark_deltas(self, db, preferences):
+        """New, edited and deactivated preferences are applied without a full reload."""
+        from datetime import datetime, timedelta
+
+        from app.matching.loader import (
+            MatrixSyncState, apply_preference_changes, refresh_preference_matrix
+        )
+
+        start = datetime(2024, 1, 1)
+        for i, (preference_id, car_pref, vector) in enumerate(preferences[:3]):
+            unit, norm = normalize_embedding(vector)
+            db.add(Preference(
+                id=preference_id, user_id="user", car_pref=car_pref,
+                embedding=unit, embedding_norm=norm, updated_at=start
+            ))
+        db.commit()
+
+        matrix = PreferenceMatrix(dim=DIM)
+        state = MatrixSyncState()
+        refresh_preference_matrix(db, matrix, state)
+        assert sorted(matrix.ids) == ["pref-0", "pref-1", "pref-2"]
+        assert state.watermark == start
+
+        later = start + timedelta(minutes=1)
+        db.get(Preference, "pref-0").car_pref = {"budget_usd": 1000}
+        db.get(Preference, "pref-0").updated_at = later
+        db.get(Preference, "pref-1").is_active = False
+        db.get(Preference, "pref-1").updated_at = later
+        unit, norm = normalize_embedding(preferences[3][2])
+        db.add(Preference(
+            id="pref-3", user_id="user", car_pref={}, embedding=unit, embedding_norm=norm, updated_at=later
+        ))
+        db.commit()
+
+        apply_preference_changes(db, matrix, state)
+        assert sorted(matrix.ids) == ["pref-0", "pref-2", "pref-3"]
+        assert state.watermark == later
+        # pref-0 now carries its edited budget
+        matches = matrix.match({"price": 5000}, preferences[0][2], threshold=-1)
+        assert "pref-0" not in [pid for pid, _ in matches]
+
+        # A second pass finds nothing new to load
+        slots = dict(matrix._slots)
+        apply_preference_changes(db, matrix, state)
+        assert matrix._slots == slots
+
+
+class TestIVFIndex:
+    """Test the local ANN index."""
+
+    def test_indexed_matrix_agrees_with_brute_force(self, preferences):
+        """With every list probed the index returns the exact matches."""
+        index = IVFIndex(DIM, n_lists=8, nprobe=8, min_train_size=100)
+        indexed = IndexedPreferenceMatrix(index)
+        matrix = PreferenceMatrix(dim=DIM)
+        for preference_id, car_pref, vector in preferences:
+            indexed.add(preference_id, car_pref, vector)
+            matrix.add(preference_id, car_pref, vector)
+        assert index.is_trained
+
+        attrs = {"body_type": "SUV", "price": 40000}
+        embedding = preferences[3][2]
+        expected = matrix.match(attrs, embedding)
+        assert [pid for pid, _ in indexed.match(attrs, embedding)] == [pid for pid, _ in expected]
+
+    def test_indexed_match_delta_agrees_with_brute_force(self, preferences):
+        """The indexed matrix re-matches a price change like the in-memory one."""
+        index = IVFIndex(DIM, n_lists=8, nprobe=8, min_train_size=100)
+        indexed = IndexedPreferenceMatrix(index)
+        matrix = PreferenceMatrix(dim=DIM)
+        for preference_id, car_pref, vector in preferences:
+            indexed.add(preference_id, car_pref, vector)
+            matrix.add(preference_id, car_pref, vector)
+
+        old = {"body_type": "SUV", "drivetrain": "AWD", "price": 45000, "make": "Honda"}
+        new = {**old, "price": 28000}
+        embedding = preferences[5][2]
+        expected = matrix.match_delta(old, new, embedding)
+        assert expected
+        assert [pid for pid, _ in indexed.match_delta(old, new, embedding)] == [pid for pid, _ in expected]
+
+    def test_persistence_and_deletes(self, preferences, tmp_path):
+        """Deletes survive a save/load cycle and new vectors land in the delta."""
+        index = IVFIndex(DIM, n_lists=4, nprobe=4, min_train_size=50)
+        index.add([pid for pid, _, _ in preferences], [vector for _, _, vector in preferences])
+        index.remove(["pref-0"])
+        index.save(str(tmp_path / "index"))
+
+        loaded = IVFIndex.load(str(tmp_path / "index"))
+        assert len(loaded) == len(preferences) - 1
+        assert "pref-0" not in loaded
+
+        loaded.add(["extra"], [preferences[0][2]])
+        top_id, top_score = loaded.search(preferences[0][2], k=1)[0]
+        assert top_id == "extra"
+        assert top_score == pytest.approx(1.0, abs=1e-5)
+
+    def test_reembedded_preference_replaces_persisted_vector(self, db, preferences, tmp_path, monkeypatch):
+        """A preference re-embedded after the last save is reloaded, and only the writer saves."""
+        from datetime import datetime
+
+        from app.matching import loader
+
+        monkeypatch.setattr(loader.settings, "ann_index_path", str(tmp_path / "index"))
+        class SmallIndex(IVFIndex):
+            def __init__(self, dim, *args, **kwargs):
+                super().__init__(DIM, *args, **kwargs)
+
+        monkeypatch.setattr(loader, "IVFIndex", SmallIndex)
+        for preference_id, car_pref, vector in preferences[:3]:
+            unit, norm = normalize_embedding(vector)
+            db.add(Preference(
+                id=preference_id, user_id="user", car_pref=car_pref,
+                embedding=unit, embedding_norm=norm, updated_at=datetime(2024, 1, 1)
+            ))
+        db.commit()
+        assert loader.update_ann_index(db) == 3
+        snapshot = loader.index_snapshot()
+
+        preference = db.get(Preference, "pref-0")
+        preference.embedding, preference.embedding_norm = normalize_embedding(preferences[9][2])
+        preference.updated_at = datetime(2024, 1, 2)
+        db.commit()
+
+        # A worker reconciling against the stale snapshot reads the new vector but does not save
+        matrix = loader.create_preference_matrix()
+        loader.refresh_preference_matrix(db, matrix)
+        assert matrix.index.search(preferences[9][2], k=1)[0][0] == "pref-0"
+        assert loader.index_snapshot() == snapshot
+
+        loader.update_ann_index(db)
+        saved = IVFIndex.load(str(tmp_path / "index"))
+        assert saved.versions["pref-0"] == datetime(2024, 1, 2).isoformat()
+        assert saved.search(preferences[9][2], k=1)[0][0] == "pref-0"
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""Move raw provider payloads out of listings.attrs into listing_raw_archive."""
+import argparse
+import sys
+from pathlib import Path
+
+from sqlalchemy.orm import Session, load_only
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.database import create_sync_engine  # noqa: E402
+from app.ingest.archive import RAW_DATA_FIELD, archive_raw_listings, split_raw_data  # noqa: E402
+from app.models.schemas import Listing  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--database-url", help="Defaults to DATABASE_URL from the app settings")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    engine = create_sync_engine(args.database_url)
+    moved = 0
+    last_vin = ""
+    with Session(engine) as db:
+        while True:
+            listings = db.query(Listing).options(
+                load_only(Listing.vin, Listing.attrs)
+            ).filter(Listing.vin > last_vin).order_by(
+                Listing.vin
+            ).limit(args.batch_size).all()
+            if not listings:
+                break
+
+            carrying = [listing for listing in listings if RAW_DATA_FIELD in listing.attrs]
+            archive_raw_listings(db, [{**listing.attrs, "vin": listing.vin} for listing in carrying])
+            for listing in carrying:
+                listing.attrs = split_raw_data(listing.attrs)[0]
+            db.commit()
+
+            moved += len(carrying)
+            last_vin = listings[-1].vin
+            db.expunge_all()
+
+    print(f"Moved raw payloads of {moved} listings to listing_raw_archive")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""Recall/latency benchmark of the IVF index against brute-force search."""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.matching.ann import IVFIndex  # noqa: E402
+
+
+def make_dataset(n: int, dim: int, clusters: int, seed: int = 0) -> np.ndarray:
+    """Clustered unit vectors, roughly how preference embeddings group."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    data = centers[rng.integers(0, clusters, n)] + rng.normal(scale=0.6, size=(n, dim)).astype(np.float32)
+    return data / np.linalg.norm(data, axis=1, keepdims=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--n", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--n-lists", type=int, default=256)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32])
+    args = parser.parse_args()
+
+    print(f"Building dataset: {args.n} x {args.dim}")
+    data = make_dataset(args.n + args.queries, args.dim, clusters=args.n_lists)
+    vectors, queries = data[:args.n], data[args.n:]
+    ids = [str(i) for i in range(args.n)]
+
+    start = time.perf_counter()
+    index = IVFIndex(args.dim, n_lists=args.n_lists)
+    index.add(ids, vectors)
+    print(f"Index build: {time.perf_counter() - start:.1f}s")
+
+    # Persist and reload so the timings below are against the memory-mapped index
+    path = os.path.join(tempfile.mkdtemp(), "index")
+    index.save(path)
+    index = IVFIndex.load(path)
+
+    start = time.perf_counter()
+    truth = []
+    for q in queries:
+        scores = vectors @ q
+        truth.append(set(np.argpartition(-scores, args.k)[:args.k].astype(str)))
+    brute_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    print(f"Brute force: {brute_ms:.2f} ms/query")
+
+    for nprobe in args.nprobe:
+        start = time.perf_counter()
+        results = [index.search(q, k=args.k, nprobe=nprobe) for q in queries]
+        ivf_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        recall = np.mean([
+            len({item_id for item_id, _ in result} & expected) / args.k
+            for result, expected in zip(results, truth)
+        ])
+        print(
+            f"IVF nprobe={nprobe:3d}: {ivf_ms:.2f} ms/query, "
+            f"recall@{args.k}={recall:.3f}, speedup {brute_ms / ivf_ms:.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""Size/latency comparison of JSON and binary embedding storage in SQLite."""
+import argparse
+import json
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.models.types import decode_embedding, encode_embedding  # noqa: E402
+
+
+def bench_format(vectors: np.ndarray, storage: str, repeat: int):
+    """Store vectors in an in-memory table, then time reading them back.
+
+    Returns:
+        (bytes per row, seconds per full read + decode, worst cosine similarity
+        between stored and original vectors)
+    """
+    if storage == "json":
+        values = [json.dumps(v.tolist()) for v in vectors]
+        decode = lambda value: np.array(json.loads(value), dtype=np.float32)  # noqa: E731
+    else:
+        values = [encode_embedding(v, storage) for v in vectors]
+        decode = decode_embedding
+
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE embeddings (id INTEGER PRIMARY KEY, embedding BLOB)")
+    conn.executemany("INSERT INTO embeddings (embedding) VALUES (?)", [(v,) for v in values])
+
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        decoded = [decode(row[0]) for row in conn.execute("SELECT embedding FROM embeddings")]
+        best = min(best, time.perf_counter() - start)
+
+    restored = np.stack(decoded)
+    cosine = np.sum(restored * vectors, axis=1) / (
+        np.linalg.norm(restored, axis=1) * np.linalg.norm(vectors, axis=1)
+    )
+    size = sum(len(v) for v in values) / len(values)
+    return size, best, float(cosine.min())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--n", type=int, default=10_000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(scale=0.025, size=(args.n, args.dim)).astype(np.float32)
+
+    print(f"{args.n} embeddings x {args.dim} dims")
+    print(f"{'format':>8} {'bytes/row':>10} {'read+decode':>12} {'min cosine':>11}")
+    baseline = None
+    for storage in ["json", "float32", "float16", "int8"]:
+        size, seconds, cosine = bench_format(vectors, storage, args.repeat)
+        baseline = baseline or seconds
+        print(
+            f"{storage:>8} {size:>10.0f} {seconds * 1000:>9.0f} ms {cosine:>11.6f}"
+            f"  ({baseline / seconds:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Benchmark of hard-filter pruning with the preference filter index vs. the full mask."""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.matching.matrix import PreferenceMatrix  # noqa: E402
+
+
+BODY_STYLES = ["SUV", "Sedan", "Truck", "Coupe", "Hatchback", "Minivan", "Wagon", "Convertible"]
+DRIVETRAINS = ["AWD", "FWD", "RWD", "4WD"]
+BRANDS = ["Toyota", "Honda", "Ford", "Tesla", "BMW", "Kia", "Hyundai", "Subaru", "Mazda", "Jeep"]
+
+
+def make_preferences(n: int, rng: np.random.Generator):
+    """CarPreference dicts with most fields set, as the chat extraction produces."""
+    for i in range(n):
+        yield f"pref-{i}", {
+            "body_style": BODY_STYLES[rng.integers(len(BODY_STYLES))] if rng.random() < 0.9 else None,
+            "drivetrain": DRIVETRAINS[rng.integers(len(DRIVETRAINS))] if rng.random() < 0.7 else None,
+            "budget_usd": int(rng.integers(15, 90)) * 1000 if rng.random() < 0.85 else None,
+            "brand_exclusions": list(rng.choice(BRANDS, size=rng.integers(0, 3), replace=False)),
+        }
+
+
+def make_listings(n: int, rng: np.random.Generator):
+    return [
+        {
+            "body_type": BODY_STYLES[rng.integers(len(BODY_STYLES))],
+            "drivetrain": DRIVETRAINS[rng.integers(len(DRIVETRAINS))],
+            "price": float(rng.integers(10, 100)) * 1000,
+            "make": BRANDS[rng.integers(len(BRANDS))],
+        }
+        for _ in range(n)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--n", type=int, default=1_000_000)
+    parser.add_argument("--dim", type=int, default=64, help="Embedding dimension of the test matrix")
+    parser.add_argument("--listings", type=int, default=200)
+    parser.add_argument("--updates", type=int, default=10_000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vector = np.ones(args.dim, dtype=np.float32) / np.sqrt(args.dim)
+    matrix = PreferenceMatrix(dim=args.dim, capacity=args.n)
+
+    start = time.perf_counter()
+    for preference_id, car_pref in make_preferences(args.n, rng):
+        matrix.add(preference_id, car_pref, vector, normalized=True)
+    print(f"Build: {args.n} preferences in {time.perf_counter() - start:.1f}s")
+
+    listings = make_listings(args.listings, rng)
+
+    start = time.perf_counter()
+    masked = [np.flatnonzero(matrix.filter_mask(attrs)) for attrs in listings]
+    mask_ms = (time.perf_counter() - start) * 1000 / len(listings)
+
+    start = time.perf_counter()
+    indexed = [matrix.candidates(attrs) for attrs in listings]
+    index_ms = (time.perf_counter() - start) * 1000 / len(listings)
+
+    assert all(np.array_equal(a, b) for a, b in zip(masked, indexed))
+    kept = np.mean([len(rows) for rows in indexed]) / args.n
+    print(f"Candidates per listing: {kept:.1%} of preferences")
+    print(f"Full mask:    {mask_ms:.2f} ms/listing")
+    print(f"Filter index: {index_ms:.2f} ms/listing ({mask_ms / index_ms:.1f}x)")
+
+    # Score only the candidates vs. every row (what match() does after filtering)
+    query = vector
+    start = time.perf_counter()
+    for rows in indexed:
+        matrix._vectors[rows] @ query
+    pruned_ms = (time.perf_counter() - start) * 1000 / len(listings)
+    start = time.perf_counter()
+    for _ in listings:
+        matrix._vectors[:args.n] @ query
+    full_ms = (time.perf_counter() - start) * 1000 / len(listings)
+    print(f"Scoring: {full_ms:.2f} ms/listing over all rows, {pruned_ms:.2f} ms over candidates")
+
+    ids = matrix.ids
+    start = time.perf_counter()
+    for i, (_, car_pref) in zip(rng.integers(0, args.n, args.updates), make_preferences(args.updates, rng)):
+        matrix.add(ids[i], car_pref, vector, normalized=True)
+    update_us = (time.perf_counter() - start) * 1e6 / args.updates
+    print(f"Incremental replace: {update_us:.1f} us/preference")
+
+
+if __name__ == "__main__":
+    main()
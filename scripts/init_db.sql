@@ -1,11 +1,19 @@
 -- Initialize database with pgvector extension
 CREATE EXTENSION IF NOT EXISTS vector;
 
--- Create index method for vector similarity search
-CREATE INDEX IF NOT EXISTS idx_listing_embedding_ivfflat 
-ON listings USING ivfflat (embedding vector_cosine_ops)
-WITH (lists = 100);
-
-CREATE INDEX IF NOT EXISTS idx_preference_embedding_ivfflat 
-ON preferences USING ivfflat (embedding vector_cosine_ops)
-WITH (lists = 50); 
\ No newline at end of file
+-- Convert embedding columns created as JSON before pgvector support
+ALTER TABLE listings ALTER COLUMN embedding TYPE vector(1536)
+USING embedding::text::vector;
+
+ALTER TABLE preferences ALTER COLUMN embedding TYPE vector(1536)
+USING embedding::text::vector;
+
+-- HNSW indexes for cosine similarity search (active listings only)
+CREATE INDEX IF NOT EXISTS idx_listing_active_embedding_hnsw
+ON listings USING hnsw (embedding vector_cosine_ops)
+WITH (m = 16, ef_construction = 64)
+WHERE expired_at IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_preference_embedding_hnsw
+ON preferences USING hnsw (embedding vector_cosine_ops)
+WITH (m = 16, ef_construction = 64);
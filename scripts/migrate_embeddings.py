@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Rewrite legacy JSON embeddings as binary blobs (non-Postgres databases).
+
+On Postgres the embedding columns are pgvector vectors (scripts/init_db.sql)
+and there is nothing to do.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.models.types import encode_embedding  # noqa: E402
+
+
+# (table, primary key column)
+TABLES = [("preferences", "id"), ("listings", "vin")]
+
+
+def migrate_table(engine, table: str, key: str, storage: str, batch_size: int) -> int:
+    """Re-encode one table's JSON embeddings, walking it in key order.
+
+    Returns:
+        Number of rows rewritten
+    """
+    migrated = 0
+    last_key = ""
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                text(
+                    f"SELECT {key}, embedding FROM {table} "
+                    f"WHERE embedding IS NOT NULL AND {key} > :last_key "
+                    f"ORDER BY {key} LIMIT :limit"
+                ),
+                {"last_key": last_key, "limit": batch_size}
+            ).all()
+            if not rows:
+                return migrated
+
+            updates = [
+                {"key": row_key, "embedding": encode_embedding(json.loads(value), storage)}
+                for row_key, value in rows
+                if isinstance(value, str)
+            ]
+            if updates:
+                conn.execute(
+                    text(f"UPDATE {table} SET embedding = :embedding WHERE {key} = :key"),
+                    updates
+                )
+            migrated += len(updates)
+            last_key = rows[-1][0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--database-url", help="Defaults to DATABASE_URL from the app settings")
+    parser.add_argument("--storage", choices=["float32", "float16", "int8"], default=None)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    if args.database_url is None or args.storage is None:
+        from app.config import settings
+        args.database_url = args.database_url or settings.database_url
+        args.storage = args.storage or settings.embedding_storage_dtype
+
+    # Use the synchronous driver for the dialect
+    url = make_url(args.database_url)
+    url = url.set(drivername=url.get_backend_name())
+    if url.get_backend_name() == "postgresql":
+        print("Postgres stores embeddings as pgvector columns; nothing to migrate.")
+        return
+
+    engine = create_engine(url)
+    for table, key in TABLES:
+        count = migrate_table(engine, table, key, args.storage, args.batch_size)
+        print(f"{table}: {count} embeddings rewritten as {args.storage}")
+
+
+if __name__ == "__main__":
+    main()
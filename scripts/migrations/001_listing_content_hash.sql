@@ -0,0 +1,2 @@
+-- Content fingerprint used by the bulk listing upsert to skip unchanged rows
+ALTER TABLE listings ADD COLUMN content_hash VARCHAR(64);
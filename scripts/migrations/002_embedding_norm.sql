@@ -0,0 +1,4 @@
+-- Norm of each embedding before it was stored unit-length; NULL for rows
+-- embedded before normalization at write time (normalized when loaded)
+ALTER TABLE preferences ADD COLUMN embedding_norm FLOAT;
+ALTER TABLE listings ADD COLUMN embedding_norm FLOAT;
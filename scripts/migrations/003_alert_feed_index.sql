@@ -0,0 +1,2 @@
+-- Keyset pagination of a user's alert feed walks (preference_id, created_at)
+CREATE INDEX IF NOT EXISTS idx_alert_preference_created ON alerts (preference_id, created_at);
@@ -0,0 +1,26 @@
+-- Per-user alert counters behind ALERT_STATS_COUNTERS, seeded from existing alerts
+CREATE TABLE IF NOT EXISTS alert_counters (
+    user_id VARCHAR(36) PRIMARY KEY REFERENCES users(id),
+    total_alerts INTEGER NOT NULL DEFAULT 0,
+    unseen_alerts INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS alert_daily_counts (
+    user_id VARCHAR(36) NOT NULL REFERENCES users(id),
+    day DATE NOT NULL,
+    alerts INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, day)
+);
+
+INSERT INTO alert_counters (user_id, total_alerts, unseen_alerts)
+SELECT p.user_id, COUNT(*), COUNT(*) FILTER (WHERE a.viewed_at IS NULL)
+FROM alerts a JOIN preferences p ON p.id = a.preference_id
+GROUP BY p.user_id
+ON CONFLICT (user_id) DO UPDATE
+SET total_alerts = EXCLUDED.total_alerts, unseen_alerts = EXCLUDED.unseen_alerts;
+
+INSERT INTO alert_daily_counts (user_id, day, alerts)
+SELECT p.user_id, date_trunc('day', a.created_at)::date, COUNT(*)
+FROM alerts a JOIN preferences p ON p.id = a.preference_id
+GROUP BY p.user_id, date_trunc('day', a.created_at)::date
+ON CONFLICT (user_id, day) DO UPDATE SET alerts = EXCLUDED.alerts;
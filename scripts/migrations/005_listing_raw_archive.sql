@@ -0,0 +1,10 @@
+-- Raw provider payloads move out of listings.attrs into a compressed archive.
+-- Run scripts/archive_raw_data.py afterwards to move payloads already stored in attrs.
+CREATE TABLE IF NOT EXISTS listing_raw_archive (
+    vin VARCHAR(17) NOT NULL,
+    fetched_at TIMESTAMP NOT NULL,
+    source VARCHAR(50) NOT NULL,
+    codec VARCHAR(8) NOT NULL,
+    payload BYTEA NOT NULL,
+    PRIMARY KEY (vin, fetched_at)
+);
@@ -0,0 +1,25 @@
+-- Typed, indexed copies of the listing fields used by the hard filters,
+-- populated from attrs by ingest. Empty strings and zero prices stay NULL.
+ALTER TABLE listings ADD COLUMN make VARCHAR(50);
+ALTER TABLE listings ADD COLUMN model VARCHAR(100);
+ALTER TABLE listings ADD COLUMN year INTEGER;
+ALTER TABLE listings ADD COLUMN price FLOAT;
+ALTER TABLE listings ADD COLUMN mileage INTEGER;
+ALTER TABLE listings ADD COLUMN body_type VARCHAR(50);
+ALTER TABLE listings ADD COLUMN drivetrain VARCHAR(20);
+
+UPDATE listings SET
+    make = NULLIF(attrs->>'make', ''),
+    model = NULLIF(attrs->>'model', ''),
+    year = NULLIF(attrs->>'year', '')::FLOAT::INTEGER,
+    price = NULLIF(NULLIF(attrs->>'price', '')::FLOAT, 0),
+    mileage = NULLIF(NULLIF(attrs->>'mileage', '')::FLOAT::INTEGER, 0),
+    body_type = LOWER(NULLIF(attrs->>'body_type', '')),
+    drivetrain = NULLIF(attrs->>'drivetrain', '');
+
+CREATE INDEX IF NOT EXISTS ix_listings_make ON listings (make);
+CREATE INDEX IF NOT EXISTS ix_listings_year ON listings (year);
+CREATE INDEX IF NOT EXISTS ix_listings_price ON listings (price);
+CREATE INDEX IF NOT EXISTS ix_listings_mileage ON listings (mileage);
+CREATE INDEX IF NOT EXISTS ix_listings_body_type ON listings (body_type);
+CREATE INDEX IF NOT EXISTS ix_listings_drivetrain ON listings (drivetrain);
@@ -0,0 +1,4 @@
+-- Watermark matcher workers use to pick up changed preferences.
+-- Updates made outside the application must set updated_at as well.
+ALTER TABLE preferences ADD COLUMN updated_at TIMESTAMP NOT NULL DEFAULT (NOW() AT TIME ZONE 'utc');
+CREATE INDEX IF NOT EXISTS ix_preferences_updated_at ON preferences (updated_at);
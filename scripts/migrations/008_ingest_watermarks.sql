@@ -0,0 +1,9 @@
+-- Per-(source, search area) watermarks for incremental ingestion
+CREATE TABLE IF NOT EXISTS ingest_watermarks (
+    source VARCHAR(50) NOT NULL,
+    zip_code VARCHAR(10) NOT NULL,
+    radius INTEGER NOT NULL,
+    fetched_since TIMESTAMP NOT NULL,
+    full_fetch_at TIMESTAMP,
+    PRIMARY KEY (source, zip_code, radius)
+);
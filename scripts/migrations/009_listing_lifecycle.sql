@@ -0,0 +1,28 @@
+-- Listing lifecycle: when each listing was last fetched, expiry of listings
+-- that stopped appearing, and an append-only price/mileage history.
+ALTER TABLE listings ADD COLUMN last_seen_at TIMESTAMP;
+UPDATE listings SET last_seen_at = updated_at;
+ALTER TABLE listings ALTER COLUMN last_seen_at SET NOT NULL;
+ALTER TABLE listings ADD COLUMN expired_at TIMESTAMP;
+
+CREATE INDEX IF NOT EXISTS ix_listings_last_seen_at ON listings (last_seen_at);
+
+-- The ANN index only covers active listings
+CREATE INDEX IF NOT EXISTS idx_listing_active_embedding_hnsw ON listings
+    USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64)
+    WHERE expired_at IS NULL;
+DROP INDEX IF EXISTS idx_listing_embedding_hnsw;
+
+CREATE TABLE IF NOT EXISTS listing_price_history (
+    vin VARCHAR(17) NOT NULL,
+    observed_at TIMESTAMP NOT NULL,
+    price FLOAT,
+    mileage INTEGER,
+    PRIMARY KEY (vin, observed_at)
+);
+
+-- Starting point of every existing listing's history
+INSERT INTO listing_price_history (vin, observed_at, price, mileage)
+SELECT vin, updated_at, price, mileage FROM listings
+WHERE price IS NOT NULL OR mileage IS NOT NULL
+ON CONFLICT DO NOTHING;
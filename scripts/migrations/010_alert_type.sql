@@ -0,0 +1,5 @@
+-- Alerts get a type; a listing can raise one alert of each type per preference
+ALTER TABLE alerts ADD COLUMN alert_type VARCHAR(20) NOT NULL DEFAULT 'match';
+
+ALTER TABLE alerts DROP CONSTRAINT IF EXISTS uq_alert_preference_vin;
+ALTER TABLE alerts ADD CONSTRAINT uq_alert_preference_vin_type UNIQUE (preference_id, vin, alert_type);